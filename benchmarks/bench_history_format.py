@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark history snapshot size and load time: JSON vs compressed binary.
+
+For each history size, writes the same clipboard-like items as a legacy JSON
+snapshot and as binary snapshots with each available codec, then prints the
+file size and the median time to load all items and only the newest 10.
+
+Usage: python benchmarks/bench_history_format.py [--sizes 100,1000,10000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add src to path for imports (development mode)
+src_path = Path(__file__).parent.parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from myclip.clipboard import snapshot  # noqa: E402
+from myclip.clipboard.item import HistoryItem  # noqa: E402
+
+PARTIAL_LIMIT = 10
+
+
+def make_corpus(size: int, seed: int = 0) -> list[str]:
+    """Generate clipboard-like items: log lines, JSON, code, URLs and words."""
+    rng = random.Random(seed)
+    levels = ["INFO", "WARNING", "ERROR", "DEBUG"]
+    names = ["user", "order", "session", "request", "payment", "item", "config"]
+    items = []
+    for i in range(size):
+        kind = rng.random()
+        if kind < 0.3:
+            lines = [
+                f"2024-05-{rng.randint(1, 28):02d}"
+                f" {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+                f" {rng.choice(levels)} [{rng.choice(names)}] handled {rng.choice(names)}"
+                f" id={rng.randint(1, 99999)} in {rng.randint(1, 900)}ms"
+                for _ in range(rng.randint(1, 40))
+            ]
+            items.append("\n".join(lines))
+        elif kind < 0.5:
+            record = {
+                name: {"id": rng.randint(1, 9999), "status": rng.choice(levels).lower()}
+                for name in rng.sample(names, rng.randint(1, len(names)))
+            }
+            items.append(json.dumps(record, indent=2))
+        elif kind < 0.7:
+            name = rng.choice(names)
+            items.append(
+                f"def load_{name}(self, {name}_id: int) -> dict:\n"
+                f'    """Load a {name} by ID."""\n'
+                f"    return self._db.get_{name}({name}_id) or {{}}\n"
+            )
+        elif kind < 0.85:
+            items.append(f"https://github.com/example/{rng.choice(names)}/pull/{i}")
+        else:
+            items.append(" ".join(rng.choice(names) for _ in range(rng.randint(1, 8))))
+    return items
+
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    codecs = [("binary zlib", snapshot.CODEC_ZLIB)]
+    if snapshot.zstd is not None:
+        codecs.append(("binary zstd", snapshot.CODEC_ZSTD))
+
+    print(f"{'items':>8} {'format':>12} {'size KB':>9} {'load ms':>9} {'newest ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            items = [HistoryItem.from_text(text) for text in make_corpus(size)]
+
+            json_path = Path(tmp) / "history.json"
+            json_path.write_text(json.dumps([item.to_dict() for item in items]))
+
+            def load_json(limit=None):
+                data = json.loads(json_path.read_text())
+                return [HistoryItem.from_dict(entry) for entry in data[:limit]]
+
+            load = median_ms(load_json, args.repeat)
+            newest = median_ms(lambda: load_json(PARTIAL_LIMIT), args.repeat)
+            kb = json_path.stat().st_size / 1024
+            print(f"{size:>8} {'json':>12} {kb:>9.1f} {load:>9.2f} {newest:>10.2f}")
+
+            for name, codec in codecs:
+                path = Path(tmp) / f"history.{codec}.bin"
+                snapshot.write(path, items, codec)
+                load = median_ms(lambda: snapshot.read(path), args.repeat)
+                newest = median_ms(lambda: snapshot.read(path, PARTIAL_LIMIT), args.repeat)
+                kb = path.stat().st_size / 1024
+                print(f"{size:>8} {name:>12} {kb:>9.1f} {load:>9.2f} {newest:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark fuzzy search latency at increasing history sizes.
+
+Prints p50/p99 query latency of SearchEngine.search() and, for comparison,
+the unindexed search_items() over raw text. The "typing" rows replay each
+query one character at a time, with and without reuse of the previous
+query's scores.
+
+Usage: python benchmarks/bench_search.py [--sizes 100,10000,100000]
+"""
+
+import argparse
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+# Add src to path for imports (development mode)
+src_path = Path(__file__).parent.parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from myclip.clipboard.digest import item_id  # noqa: E402
+from myclip.clipboard.history import search_items  # noqa: E402
+from myclip.clipboard.search import SearchEngine  # noqa: E402
+
+QUERIES = ["ab", "log", "error", "kubectl get", "def search items", "https://github"]
+RESULT_LIMIT = 50
+
+
+def make_corpus(size: int, seed: int = 0) -> list[str]:
+    """Generate clipboard-like items: words, code, URLs, some multi-KB blobs."""
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9)))
+        for _ in range(2000)
+    ] + ["error", "log", "kubectl", "get", "def", "search", "items", "https://github.com"]
+    items = []
+    for i in range(size):
+        length = rng.choice([3, 8, 20, 60, 200]) if rng.random() > 0.02 else 2000
+        items.append(f"{i} " + " ".join(rng.choice(words) for _ in range(length)))
+    return items
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    """Return (p50, p99) in milliseconds."""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered) * 1000, p99 * 1000
+
+
+def measure(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            fn(query)
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def measure_typing(engine: SearchEngine, refine: bool) -> tuple[float, float]:
+    samples = []
+    for query in QUERIES:
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            engine.search(query[:end], RESULT_LIMIT, refine=refine)
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'method':>14} {'p50 ms':>9} {'p99 ms':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        items = make_corpus(size)
+        engine = SearchEngine()
+        for text in reversed(items):
+            engine.add(item_id(text), text)
+        engine.search("warm up", RESULT_LIMIT)
+
+        p50, p99 = measure(lambda q: engine.search(q, RESULT_LIMIT), args.repeat)
+        print(f"{size:>8} {'SearchEngine':>14} {p50:>9.2f} {p99:>9.2f}")
+        p50, p99 = measure_typing(engine, refine=False)
+        print(f"{size:>8} {'typing':>14} {p50:>9.2f} {p99:>9.2f}")
+        p50, p99 = measure_typing(engine, refine=True)
+        print(f"{size:>8} {'typing+refine':>14} {p50:>9.2f} {p99:>9.2f}")
+        repeat = args.repeat if size <= 10000 else 1
+        p50, p99 = measure(lambda q: search_items(q, items), repeat)
+        print(f"{size:>8} {'search_items':>14} {p50:>9.2f} {p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the history, search and persistence hot paths.
+
+Runs headless (no macOS frameworks needed) against a temporary HOME and
+prints the median time per operation of each case. With --check the results
+are compared to the stored baseline and the exit status is 1 if any case
+got slower than the tolerance allows; --save replaces the baseline.
+
+Cases:
+    add           ClipboardHistory.add() at history sizes x item sizes, below and at
+                  the item limit (archiving the oldest item)
+    search_items  search_items() at corpus sizes x query lengths and modes
+    load          load_history_readonly(), newest 10 and all items, large history
+    delete        delete_history_item() on the same history
+    truncate      truncate_text() and format_preview() on multi-MB items
+
+Usage: python benchmarks/bench_suite.py [--quick] [--only add,search] [--check | --save]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# History files live under HOME, which is read on import: isolate the run
+os.environ["HOME"] = tempfile.mkdtemp(prefix="myclip-bench-")
+
+# Add src to path for imports (development mode)
+src_path = Path(__file__).parent.parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+from myclip import config  # noqa: E402
+from myclip.clipboard import history as history_module  # noqa: E402
+from myclip.clipboard import journal  # noqa: E402
+from myclip.clipboard.history import (  # noqa: E402
+    ClipboardHistory,
+    delete_history_item,
+    load_history_readonly,
+    search_items,
+)
+from myclip.ui.text import format_preview, truncate_text  # noqa: E402
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+
+# A case regresses if it is this much slower than its baseline...
+DEFAULT_TOLERANCE = 0.5
+# ...and by at least this many milliseconds, which filters out timer noise
+NOISE_FLOOR_MS = 0.1
+ROUNDS = 3
+
+WORDS = [
+    "error", "log", "kubectl", "get", "def", "search", "items", "https://github.com",
+    "user", "order", "session", "request", "payment", "config", "import", "return",
+]
+
+
+def make_text(rng: random.Random, size: int) -> str:
+    """Clipboard-like text of about size bytes: words and short lines."""
+    parts = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) if rng.random() < 0.5 else "".join(
+            rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))
+        )
+        parts.append(word)
+        parts.append("\n" if rng.random() < 0.1 else " ")
+        length += len(word) + 1
+    return "".join(parts)[:size]
+
+
+def median_ms(fn, repeat: int) -> float:
+    """Median time of fn in milliseconds, the best of ROUNDS rounds of repeat calls.
+
+    Taking the best round filters out interference from other processes and
+    background threads.
+    """
+    rounds = []
+    gc.collect()
+    gc.disable()  # Like timeit: collections depend on what ran before
+    try:
+        for _ in range(ROUNDS):
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            rounds.append(statistics.median(samples))
+    finally:
+        gc.enable()
+    return min(rounds) * 1000
+
+
+def reset_history_files() -> None:
+    for path in (
+        journal.HISTORY_FILE,
+        journal.SNAPSHOT_FILE,
+        journal.JOURNAL_FILE,
+        journal.COMPACTING_FILE,
+        journal.LOCK_FILE,
+    ):
+        path.unlink(missing_ok=True)
+
+
+def build_history(size: int, item_bytes: int, seed: int = 0) -> ClipboardHistory:
+    """Create a history of size items on disk and load it again."""
+    reset_history_files()
+    rng = random.Random(seed)
+    history = ClipboardHistory(max_items=size + 1000, backend="json", max_total_bytes=10**12)
+    for i in range(size):
+        history.add(f"{i} {make_text(rng, item_bytes)}")
+    history.close()
+    # Loading compacts the journal in the background; let that finish first
+    ClipboardHistory(max_items=size + 1000, backend="json", max_total_bytes=10**12).close()
+    return ClipboardHistory(max_items=size + 1000, backend="json", max_total_bytes=10**12)
+
+
+def bench_add(quick: bool) -> dict[str, float]:
+    results = {}
+    sizes = [100, 1000] if quick else [100, 1000, 10000]
+    item_sizes = [100, 10_000] if quick else [100, 10_000, 1_000_000]
+    for size in sizes:
+        for item_bytes in item_sizes:
+            if size * item_bytes > 200_000_000:
+                continue  # Bounded by the byte budget in practice
+            history = build_history(size, min(item_bytes, 1000))
+            rng = random.Random(1)
+            texts = [f"new {i} {make_text(rng, item_bytes)}" for i in range(50 * ROUNDS)]
+            position = iter(texts)
+            results[f"add/{size}items/{item_bytes}B"] = median_ms(
+                lambda: history.add(next(position)), 50
+            )
+            # At the item limit, each add moves the oldest item to the archive
+            history.set_limits(len(history))
+            texts = [f"full {i} {make_text(rng, item_bytes)}" for i in range(50 * ROUNDS)]
+            position = iter(texts)
+            results[f"add/{size}items/{item_bytes}B/archiving"] = median_ms(
+                lambda: history.add(next(position)), 50
+            )
+            history.close()
+    return results
+
+
+def bench_search(quick: bool) -> dict[str, float]:
+    results = {}
+    rng = random.Random(2)
+    sizes = [1000, 10000] if quick else [1000, 10000, 50000]
+    for size in sizes:
+        items = [make_text(rng, rng.choice([20, 80, 300, 2000])) for _ in range(size)]
+        for query in ["lo", "kubectl", "search items config", "'kubectl get", "/user \\w+ log"]:
+            mode = {"'": "exact_", "/": "regex_"}.get(query[0], "")
+            results[f"search_items/{size}items/{mode}q{len(query)}"] = median_ms(
+                lambda: search_items(query, items, 50), 1
+            )
+    return results
+
+
+def bench_load_delete(quick: bool) -> dict[str, float]:
+    results = {}
+    size = 2000 if quick else 20000
+    history = build_history(size, 500)
+    history.close()
+    config.MAX_HISTORY_ITEMS = size + 1000
+
+    def load_newest():
+        view = load_history_readonly()
+        list(view[:10])
+        view.close()
+
+    def load_all():
+        view = load_history_readonly()
+        list(view)
+        view.close()
+
+    results[f"load/{size}items/newest10"] = median_ms(load_newest, 5)
+    results[f"load/{size}items/all"] = median_ms(load_all, 1)
+
+    keys = [item.key for item in journal.load_items(config.MAX_HISTORY_ITEMS)[-20 * ROUNDS :]]
+    position = iter(keys)
+    results[f"delete/{size}items"] = median_ms(
+        lambda: delete_history_item(next(position)), 20
+    )
+    return results
+
+
+def bench_truncate(quick: bool) -> dict[str, float]:
+    results = {}
+    rng = random.Random(3)
+    for megabytes in [1] if quick else [1, 8]:
+        text = make_text(rng, megabytes * 1024 * 1024)
+        results[f"truncate_text/{megabytes}MB"] = median_ms(
+            lambda: truncate_text(text, config.ITEM_PREVIEW_LENGTH), 5
+        )
+        lines = text.count("\n") + 1
+        results[f"format_preview/{megabytes}MB"] = median_ms(
+            lambda: format_preview(text, lines), 5
+        )
+        results[f"format_preview/{megabytes}MB/count_lines"] = median_ms(
+            lambda: format_preview(text), 5
+        )
+    return results
+
+
+SUITES = {
+    "add": bench_add,
+    "search": bench_search,
+    "load": bench_load_delete,
+    "truncate": bench_truncate,
+}
+
+
+def check(results: dict[str, float], baseline: dict[str, float], tolerance: float) -> bool:
+    """Print the comparison with the baseline. Returns False on a regression."""
+    ok = True
+    for name, ms in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<42} {ms:>10.3f} ms  (no baseline)")
+            continue
+        regressed = ms > base * (1 + tolerance) and ms - base > NOISE_FLOOR_MS
+        ok = ok and not regressed
+        status = "REGRESSION" if regressed else "ok"
+        print(f"{name:<42} {ms:>10.3f} ms  baseline {base:>10.3f} ms  {status}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for CI")
+    parser.add_argument("--only", help=f"comma-separated suites: {','.join(SUITES)}")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="compare with the baseline")
+    mode.add_argument("--save", action="store_true", help="store results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    history_module.log.disabled = True  # Spill warnings etc. would flood the output
+    results = {}
+    for name in args.only.split(",") if args.only else SUITES:
+        results.update(SUITES[name](args.quick))
+
+    if args.save:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update({name: round(ms, 4) for name, ms in results.items()})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Saved {len(results)} results to {args.baseline}")
+    elif args.check:
+        baseline = json.loads(args.baseline.read_text())
+        if not check(results, baseline, args.tolerance):
+            sys.exit(1)
+    else:
+        for name, ms in results.items():
+            print(f"{name:<42} {ms:>10.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
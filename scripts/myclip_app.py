@@ -16,10 +16,19 @@ def main() -> None:
     # Check if we should run the popup (called with --popup flag or env var)
     if "--popup" in sys.argv or os.environ.get("MYCLIP_POPUP") == "1":
         from myclip.ui.popup_runner import run_popup
-        run_popup()
+        run_popup(persistent="--persistent" in sys.argv)
+    elif "--trace-report" in sys.argv:
+        from myclip.trace import main as trace_report
+        trace_report([arg for arg in sys.argv[1:] if arg != "--trace-report"])
+    elif "--startup-profile" in sys.argv:
+        from myclip.startup import profile
+        profile()
     else:
+        from myclip.startup import Phases
+        phases = Phases()
         from myclip.app import App
-        app = App()
+        phases.mark("imports")
+        app = App(phases)
         app.run()
 
 
@@ -1,11 +1,29 @@
 """Entry point for running MyClip as a module."""
 
-from .app import App
+import sys
 
 
 def main() -> None:
-    """Main entry point."""
-    app = App()
+    """Main entry point.
+
+    With --trace-report, summarize the trace file instead; with
+    --startup-profile, print how long starting takes and quit.
+    """
+    if "--trace-report" in sys.argv:
+        from .trace import main as trace_report
+
+        trace_report([arg for arg in sys.argv[1:] if arg != "--trace-report"])
+        return
+    from .startup import Phases, profile
+
+    if "--startup-profile" in sys.argv:
+        profile()
+        return
+    phases = Phases()
+    from .app import App
+
+    phases.mark("imports")
+    app = App(phases)
     app.run()
 
 
@@ -2,51 +2,59 @@
 
 from __future__ import annotations
 
+import functools
 import logging
-import os
-import subprocess
 import sys
-import threading
+from collections.abc import Callable
 from pathlib import Path
 
-from . import user_config
-from .clipboard import ClipboardHistory, ClipboardMonitor
-from .hotkeys import HotkeyManager
-from .ui import TrayIcon
+from . import config, user_config
+from .clipboard import ClipboardHistory
+from .core import Core, PopupWorker
+from .startup import Phases
 
 LOG_PATH = Path.home() / "Library/Logs/MyClip.log"
-LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s: %(message)s",
-    datefmt="%H:%M:%S",
-    handlers=[
-        logging.FileHandler(LOG_PATH),
-        logging.StreamHandler(sys.stdout),
-    ],
-)
 log = logging.getLogger(__name__)
 
 
+def setup_logging() -> None:
+    """Log to LOG_PATH and stdout."""
+    LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s: %(message)s",
+        datefmt="%H:%M:%S",
+        handlers=[
+            logging.FileHandler(LOG_PATH),
+            logging.StreamHandler(sys.stdout),
+        ],
+    )
+
+
 def is_frozen() -> bool:
     """Check if running as a PyInstaller bundle."""
     return getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS")
 
 
+def popup_args() -> list[str]:
+    """Command line of the popup worker process."""
+    if is_frozen():
+        # Running as PyInstaller bundle - call self with --popup flag
+        return [sys.executable, "--popup", "--persistent"]
+    # Running in development - use python -m
+    return [sys.executable, "-m", "myclip.ui.popup_runner", "--persistent"]
+
+
+@functools.cache
 def get_version() -> str:
     """Get the app version from Info.plist (bundled) or package metadata."""
     if is_frozen():
         try:
-            app_path = Path(sys.executable).parent.parent
-            plist_path = app_path / "Info.plist"
-            if plist_path.exists():
-                result = subprocess.run(
-                    ["defaults", "read", str(plist_path), "CFBundleShortVersionString"],
-                    capture_output=True,
-                    text=True,
-                )
-                if result.returncode == 0:
-                    return result.stdout.strip()
+            import plistlib
+
+            plist_path = Path(sys.executable).parent.parent / "Info.plist"
+            with open(plist_path, "rb") as f:
+                return str(plistlib.load(f)["CFBundleShortVersionString"])
         except Exception:
             pass
     # Fallback to version module
@@ -57,63 +65,74 @@ def get_version() -> str:
         return "dev"
 
 
+def hotkey_manager(on_hotkey: Callable[[], None]):
+    """Create the hotkey listener; imports Quartz, so only once the app runs."""
+    from .hotkeys import HotkeyManager
+
+    return HotkeyManager(on_hotkey)
+
+
 class App:
-    """Main application class that wires all components together."""
+    """Main application class that wires all components together.
 
-    def __init__(self):
-        self._history = ClipboardHistory()
-        self._monitor = ClipboardMonitor(self._history)
-        self._hotkey_manager = HotkeyManager(self._show_popup)
-        self._tray: TrayIcon | None = None
-        self._popup_process: subprocess.Popen | None = None
-        self._popup_lock = threading.Lock()
+    phases, if given, times the start (see startup.py), e.g. from the entry
+    point on, so it includes importing this module.
+    """
 
-    def run(self) -> None:
-        """Run the application."""
+    def __init__(self, phases: Phases | None = None):
+        self._phases = phases if phases is not None else Phases()
+        setup_logging()
         user_config.ensure_config_exists()
+        self._phases.mark("setup")
+        self._history = ClipboardHistory()
+        self._phases.mark("history")
+        self._core = Core(self._history, PopupWorker(popup_args()), hotkeys=hotkey_manager)
+        self._tray = None
+
+    def start(self) -> None:
+        """Start monitoring, the popup worker and hotkeys, and create the tray icon."""
         log.info(f"MyClip v{get_version()} starting...")
 
         # Start background services
-        self._monitor.start()
-        self._hotkey_manager.start()
+        user_config.subscribe(self._apply_config)
+        self._core.start()
+        self._phases.mark("monitoring", at=self._core.wait_monitoring())
+        self._phases.mark("hotkeys")
+
+        # Create tray icon on main thread (required for macOS); imports rumps
+        from .ui import TrayIcon
 
-        # Create and run tray icon on main thread (required for macOS)
         self._tray = TrayIcon(
             on_show_history=self._show_popup,
             on_quit=self._quit,
             version=get_version(),
         )
+        self._phases.mark("menu_bar")
+        self._phases.record()
 
+    def run(self) -> None:
+        """Run the application."""
+        self.start()
         # This blocks - runs the macOS event loop
         self._tray.run()
 
+    def stop(self) -> None:
+        """Stop background services, without quitting the event loop."""
+        self._core.stop()
+
+    def _apply_config(self, _config: dict) -> None:
+        """Apply settings that can change while running after a config reload."""
+        self._core.set_poll_intervals(
+            config.MIN_POLL_INTERVAL_SECONDS, config.MAX_POLL_INTERVAL_SECONDS
+        )
+        self._history.set_limits(
+            config.MAX_HISTORY_ITEMS, config.MAX_TOTAL_BYTES, config.MAX_ITEM_BYTES
+        )
+
     def _show_popup(self) -> None:
-        """Show the popup window in a subprocess to avoid GUI conflicts."""
-        with self._popup_lock:
-            # Skip if popup is already running
-            if self._popup_process is not None and self._popup_process.poll() is None:
-                return
-            # Launch popup in background thread
-            thread = threading.Thread(target=self._launch_popup_process, daemon=True)
-            thread.start()
-
-    def _launch_popup_process(self) -> None:
-        """Launch the popup window as a subprocess."""
-        with self._popup_lock:
-            if is_frozen():
-                # Running as PyInstaller bundle - call self with --popup flag
-                self._popup_process = subprocess.Popen(
-                    [sys.executable, "--popup"],
-                    env={**os.environ, "MYCLIP_POPUP": "1"},
-                )
-            else:
-                # Running in development - use python -m
-                self._popup_process = subprocess.Popen(
-                    [sys.executable, "-m", "myclip.ui.popup_runner"]
-                )
-        self._popup_process.wait()
+        """Ask the warm popup worker process to show the popup window."""
+        self._core.show_popup()
 
     def _quit(self) -> None:
         """Quit the application."""
-        self._hotkey_manager.stop()
-        self._monitor.stop()
+        self.stop()
@@ -1,6 +1,19 @@
 """Clipboard monitoring and history management."""
 
+from .backends import ClipboardBackend, default_backend
+from .content import ClipboardContent
+from .digest import item_id
 from .history import ClipboardHistory, search_items
+from .item import HistoryItem
 from .monitor import ClipboardMonitor
 
-__all__ = ["ClipboardHistory", "ClipboardMonitor", "search_items"]
+__all__ = [
+    "ClipboardBackend",
+    "ClipboardContent",
+    "ClipboardHistory",
+    "ClipboardMonitor",
+    "HistoryItem",
+    "default_backend",
+    "item_id",
+    "search_items",
+]
@@ -0,0 +1,326 @@
+"""Cold storage for items that fall out of the clipboard history.
+
+Items dropped to stay within the history limits are appended to a segment
+per day, ARCHIVE_DIR/YYYY-MM-DD.jsonl.gz, holding one JSON record per line:
+the item with its full text and the time it was archived. Each batch is
+written as its own gzip member, so a segment is only ever appended to.
+
+Nothing reads the archive at startup or when adding items. It is searched
+only when the history itself gives too few results, a segment at a time,
+newest first. Deleting an archived item appends a tombstone instead of
+rewriting segments; it hides the copies archived before it. Old segments
+are pruned by age and by the total size of the archive.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Container, Iterable, Sequence
+from pathlib import Path
+
+from .. import config, trace
+from . import blobs
+from .content import BLOB_KINDS
+from .item import HistoryItem
+from .search import filter_matches, normalize_query, search_key
+from .trigram import compile_matcher, parse_query
+
+log = logging.getLogger(__name__)
+
+# Storage location, one segment per day plus the tombstones of deleted items
+ARCHIVE_DIR = Path(os.path.expanduser("~/.myclip_archive"))
+DELETED_FILE = ARCHIVE_DIR / "deleted.jsonl"
+
+_SEGMENT_NAME = re.compile(r"^\d{4}-\d{2}-\d{2}\.jsonl\.gz$")
+
+# Decompressed segments kept for the following searches, in bytes of text
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def segments() -> list[Path]:
+    """Return the archive's segments, newest first."""
+    try:
+        paths = [path for path in ARCHIVE_DIR.iterdir() if _SEGMENT_NAME.match(path.name)]
+    except FileNotFoundError:
+        return []
+    return sorted(paths, key=lambda path: path.name, reverse=True)
+
+
+def oldest_time() -> float | None:
+    """Return the start of the oldest segment's day, or None if the archive is empty."""
+    paths = segments()
+    if not paths:
+        return None
+    return time.mktime(time.strptime(paths[-1].name[:10], "%Y-%m-%d"))
+
+
+def read_segment(path: Path) -> list[tuple[HistoryItem, float]]:
+    """Read a segment's items and archive times, oldest first.
+
+    A batch still being written, or cut short by a crash, ends the segment
+    early instead of failing it.
+    """
+    records = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8", errors="surrogatepass") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records.append((HistoryItem.from_dict(record), record["t"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except (OSError, EOFError, zlib.error) as e:
+        log.warning(f"Archive segment {path.name} is truncated or unreadable: {e}")
+    return records
+
+
+def read_tombstones() -> dict[str, float]:
+    """Return item ID -> time of its last deletion from the archive."""
+    tombstones = {}
+    try:
+        with open(DELETED_FILE, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    tombstones[record["id"]] = max(record["t"], tombstones.get(record["id"], 0))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return tombstones
+
+
+def delete(key: str) -> None:
+    """Hide the archived copies of an item (for use in subprocess)."""
+    line = json.dumps({"id": key, "t": time.time()}) + "\n"
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    fd = os.open(DELETED_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def prune(max_age_days: int | None = None, max_bytes: int | None = None) -> int:
+    """Remove segments older than max_age_days, then the oldest beyond max_bytes.
+
+    0 disables either limit. Returns the number of segments removed.
+    """
+    if max_age_days is None:
+        max_age_days = config.ARCHIVE_MAX_AGE_DAYS
+    if max_bytes is None:
+        max_bytes = config.ARCHIVE_MAX_BYTES
+    oldest_kept = time.strftime("%Y-%m-%d", time.localtime(time.time() - max_age_days * 86400))
+    removed = 0
+    total = 0
+    for path in segments():
+        try:
+            total += path.stat().st_size
+            expired = max_age_days > 0 and path.name[:10] < oldest_kept
+            if expired or (max_bytes > 0 and total > max_bytes):
+                path.unlink()
+                removed += 1
+        except OSError as e:
+            log.warning(f"Failed to prune archive segment {path.name}: {e}")
+    if removed:
+        log.info(f"Pruned {removed} archive segments")
+    return removed
+
+
+class Archive:
+    """Writes archived items in the background and caches segments for searching.
+
+    on_written, if given, is called from the writer thread with the items
+    written, e.g. to remove their spill files.
+    """
+
+    def __init__(self, on_written: Callable[[list[HistoryItem]], None] | None = None):
+        self._on_written = on_written
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Serializes appends to segments
+        self._queue: list[tuple[HistoryItem, float]] = []
+        self._writer: threading.Thread | None = None
+        # Path -> ((mtime_ns, size), (items, archive times, search keys), text chars),
+        # least recently used first
+        self._cache: OrderedDict[Path, tuple[tuple[int, int], tuple, int]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_bytes = 0
+
+    def append(self, items: Iterable[HistoryItem]) -> None:
+        """Queue items for archiving. Spilled items are read back when written."""
+        now = time.time()
+        with self._lock:
+            self._queue.extend((item, now) for item in items)
+            if self._queue and self._writer is None:
+                self._writer = threading.Thread(target=self._write_queued, daemon=True)
+                self._writer.start()
+
+    def flush(self) -> None:
+        """Write queued items now."""
+        with self._write_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if batch:
+                with trace.span("archive.write", items=len(batch)):
+                    self._write(batch)
+        if batch and self._on_written is not None:
+            self._on_written([item for item, _ in batch])
+
+    def _write(self, batch: list[tuple[HistoryItem, float]]) -> None:
+        days: dict[str, list[str]] = {}
+        for item, archived in batch:
+            record = HistoryItem(
+                item.key, item.full_text(), item.line, item.lines, item.size, kind=item.kind
+            )
+            if item.kind in BLOB_KINDS:
+                blobs.touch(item.key)  # Keep the payload as long as the segment
+            day = time.strftime("%Y-%m-%d", time.localtime(archived))
+            line = json.dumps({**record.to_dict(), "t": archived}, ensure_ascii=False)
+            days.setdefault(day, []).append(line + "\n")
+        ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+        for day, lines in days.items():
+            data = "".join(lines).encode("utf-8", "surrogatepass")
+            with open(ARCHIVE_DIR / f"{day}.jsonl.gz", "ab") as f:
+                f.write(gzip.compress(data))
+        prune()
+
+    def wait(self) -> None:
+        """Wait for items being written in the background."""
+        writer = self._writer
+        if writer is not None:
+            writer.join()
+        self.flush()
+
+    def _write_queued(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queue:
+                    self._writer = None
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning(f"Failed to archive history items: {e}")
+
+    def search(
+        self, query: str, limit: int | None, exclude: Container[str] = ()
+    ) -> list[HistoryItem]:
+        """Search the whole archive at once; see ArchiveSearch."""
+        search = ArchiveSearch(self, query, limit, exclude)
+        while not search.step():
+            pass
+        return search.results()
+
+    def _segment(self, path: Path) -> tuple[list[HistoryItem], list[float], list[str]]:
+        """Return a segment's items and archive times, newest first, and search keys."""
+        with self._cache_lock:
+            return self._read_cached(path)
+
+    def _read_cached(self, path: Path) -> tuple[list[HistoryItem], list[float], list[str]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return [], [], []
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            self._cache.move_to_end(path)
+            return cached[1]
+        records = read_segment(path)[::-1]
+        items = [item for item, _ in records]
+        entry = (items, [archived for _, archived in records], [search_key(i.text) for i in items])
+        if cached is not None:
+            self._cache_bytes -= cached[2]
+        size = sum(len(item.text) for item in items)
+        self._cache[path] = (stamp, entry, size)
+        self._cache_bytes += size
+        while self._cache_bytes > CACHE_MAX_BYTES and len(self._cache) > 1:
+            _, (_, _, evicted) = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted
+        return entry
+
+
+class ArchiveSearch:
+    """Search of the archive that reads one segment per step() call, newest first.
+
+    Has IncrementalSearch's interface, so the popup can interleave it with
+    event handling. Items in exclude (those still in the history) and items
+    deleted after they were archived are skipped, as are older copies of an
+    item archived more than once. Within a segment, fuzzy matches are
+    ordered by score and exact or regex matches newest first.
+    """
+
+    def __init__(
+        self, archive: Archive, query: str, limit: int | None, exclude: Container[str] = ()
+    ):
+        self.query = query
+        self._archive = archive
+        self._limit = limit
+        self._exclude = exclude
+        self._seen: set[str] = set()
+        self._tombstones = read_tombstones()
+        self._mode, text = parse_query(query)
+        if self._mode == "fuzzy":
+            self._text = normalize_query(text)
+            self._predicate = None
+        else:
+            self._text = text
+            self._predicate = compile_matcher(self._mode, text)[0]
+        empty = not self._text or (self._mode != "fuzzy" and self._predicate is None)
+        self._segments: Sequence[Path] = () if empty else segments()
+        self._position = 0
+        self._matches: list[HistoryItem] = []
+
+    @property
+    def done(self) -> bool:
+        return self._position >= len(self._segments) or (
+            self._limit is not None and len(self._matches) >= self._limit
+        )
+
+    @property
+    def refined(self) -> bool:
+        return False
+
+    def step(self) -> bool:
+        """Search the next segment. Returns True once done."""
+        if self.done:
+            return True
+        items, times, keys = self._archive._segment(self._segments[self._position])
+        self._position += 1
+        # Drop duplicates, excluded and deleted items before matching
+        positions = []
+        for position, item in enumerate(items):
+            key = item.key
+            if key in self._seen or key in self._exclude:
+                continue
+            if times[position] >= self._tombstones.get(key, 0):
+                self._seen.add(key)
+                positions.append(position)
+        remaining = None if self._limit is None else self._limit - len(self._matches)
+        if self._mode == "fuzzy":
+            from rapidfuzz import fuzz, process
+
+            found = process.extract(
+                self._text,
+                [keys[position] for position in positions],
+                scorer=fuzz.partial_ratio,
+                limit=remaining,
+                score_cutoff=config.FUZZY_SCORE_THRESHOLD,
+            )
+            self._matches.extend(items[positions[index]] for _, _, index in found)
+        else:
+            candidates = [items[position] for position in positions]
+            self._matches.extend(filter_matches(candidates, self._predicate, remaining))
+        return self.done
+
+    def results(self) -> list[HistoryItem]:
+        """Matches found so far."""
+        return list(self._matches)
@@ -0,0 +1,170 @@
+"""Clipboard access backends.
+
+A backend reads and writes clipboard content and offers a cheap change token,
+so the monitor only reads the content when the clipboard actually changed.
+Backends that only handle text need just read_text() and write_text().
+"""
+
+from __future__ import annotations
+
+from .content import KIND_FILES, KIND_IMAGE, KIND_RTF, KIND_TEXT, ClipboardContent
+
+
+class ClipboardBackend:
+    """Base class for clipboard backends."""
+
+    def change_token(self) -> int | None:
+        """Return a value that changes whenever the clipboard changes.
+
+        None means the backend cannot tell, and the content must be read to
+        detect a change.
+        """
+        return None
+
+    def read_text(self) -> str | None:
+        """Return the clipboard text, or None if it holds no text."""
+        raise NotImplementedError
+
+    def write_text(self, text: str) -> None:
+        """Replace the clipboard content with text."""
+        raise NotImplementedError
+
+    def read_content(self) -> ClipboardContent | None:
+        """Return the clipboard content in the richest kind supported, or None if empty."""
+        text = self.read_text()
+        return ClipboardContent(KIND_TEXT, text) if text is not None else None
+
+    def write_content(self, content: ClipboardContent) -> None:
+        """Replace the clipboard content, as text if the kind is not supported."""
+        self.write_text(content.text)
+
+
+class PasteboardBackend(ClipboardBackend):
+    """macOS general pasteboard, using NSPasteboard's changeCount as token.
+
+    Reads copied files, images and rich text besides plain text. Text wins
+    over an image, since apps such as spreadsheets put both on the pasteboard
+    when copying text; images are stored as PNG.
+    """
+
+    def __init__(self):
+        import AppKit
+
+        self._appkit = AppKit
+        self._pasteboard = AppKit.NSPasteboard.generalPasteboard()
+        self._string_type = AppKit.NSPasteboardTypeString
+        self._file_url_type = AppKit.NSPasteboardTypeFileURL
+        self._png_type = AppKit.NSPasteboardTypePNG
+        self._tiff_type = AppKit.NSPasteboardTypeTIFF
+        self._rtf_type = AppKit.NSPasteboardTypeRTF
+
+    def change_token(self) -> int | None:
+        return self._pasteboard.changeCount()
+
+    def read_text(self) -> str | None:
+        text = self._pasteboard.stringForType_(self._string_type)
+        return str(text) if text is not None else None
+
+    def write_text(self, text: str) -> None:
+        self._pasteboard.clearContents()
+        self._pasteboard.setString_forType_(text, self._string_type)
+
+    def read_content(self) -> ClipboardContent | None:
+        types = self._pasteboard.types() or ()
+        if self._file_url_type in types:
+            urls = self._pasteboard.readObjectsForClasses_options_(
+                [self._appkit.NSURL], {self._appkit.NSPasteboardURLReadingFileURLsOnlyKey: True}
+            )
+            paths = [str(url.path()) for url in urls or ()]
+            if paths:
+                return ClipboardContent(KIND_FILES, "\n".join(paths))
+        text = self.read_text()
+        if text is not None:
+            if self._rtf_type in types:
+                rtf = self._pasteboard.dataForType_(self._rtf_type)
+                if rtf is not None:
+                    return ClipboardContent(KIND_RTF, text, bytes(rtf))
+            return ClipboardContent(KIND_TEXT, text)
+        png = self._read_png(types)
+        return ClipboardContent(KIND_IMAGE, "", png) if png is not None else None
+
+    def _read_png(self, types) -> bytes | None:
+        if self._png_type in types:
+            data = self._pasteboard.dataForType_(self._png_type)
+            if data is not None:
+                return bytes(data)
+        if self._tiff_type in types:
+            data = self._pasteboard.dataForType_(self._tiff_type)
+            image = self._appkit.NSBitmapImageRep.imageRepWithData_(data) if data else None
+            if image is not None:
+                png = image.representationUsingType_properties_(
+                    self._appkit.NSBitmapImageFileTypePNG, {}
+                )
+                if png is not None:
+                    return bytes(png)
+        return None
+
+    def write_content(self, content: ClipboardContent) -> None:
+        appkit = self._appkit
+        self._pasteboard.clearContents()
+        if content.kind == KIND_FILES:
+            urls = [appkit.NSURL.fileURLWithPath_(path) for path in content.text.splitlines()]
+            self._pasteboard.writeObjects_(urls)
+            return
+        if content.data is not None and content.kind in (KIND_IMAGE, KIND_RTF):
+            data = appkit.NSData.dataWithBytes_length_(content.data, len(content.data))
+            kind_type = self._png_type if content.kind == KIND_IMAGE else self._rtf_type
+            self._pasteboard.setData_forType_(data, kind_type)
+        if content.text:
+            self._pasteboard.setString_forType_(content.text, self._string_type)
+
+
+class PyperclipBackend(ClipboardBackend):
+    """Portable fallback via pyperclip. Has no change token."""
+
+    def __init__(self):
+        import pyperclip
+
+        self._pyperclip = pyperclip
+
+    def read_text(self) -> str | None:
+        return self._pyperclip.paste()
+
+    def write_text(self, text: str) -> None:
+        self._pyperclip.copy(text)
+
+
+class MemoryBackend(ClipboardBackend):
+    """In-memory clipboard for tests and headless runs."""
+
+    def __init__(self, text: str | None = None):
+        self._content = ClipboardContent(KIND_TEXT, text) if text is not None else None
+        self._change_count = 0
+        self.reads = 0  # Number of read calls, to verify probing
+
+    def change_token(self) -> int | None:
+        return self._change_count
+
+    def read_text(self) -> str | None:
+        self.reads += 1
+        content = self._content
+        return content.text if content is not None and content.kind != KIND_IMAGE else None
+
+    def write_text(self, text: str) -> None:
+        self.write_content(ClipboardContent(KIND_TEXT, text))
+
+    def read_content(self) -> ClipboardContent | None:
+        self.reads += 1
+        return self._content
+
+    def write_content(self, content: ClipboardContent) -> None:
+        self._content = content
+        self._change_count += 1
+
+
+def default_backend() -> ClipboardBackend:
+    """Return the native pasteboard backend if available, else pyperclip."""
+    try:
+        return PasteboardBackend()
+    except ImportError:
+        return PyperclipBackend()
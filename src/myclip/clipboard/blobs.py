@@ -0,0 +1,115 @@
+"""Store for the binary payloads of clipboard items, named by their item's ID.
+
+Images (PNG) are content-addressed: their file is named by their digest,
+which is also the ID of their history item, so copying the same screenshot
+twice stores it once. Rich text (RTF) is stored under the ID of its plain
+text, so a new copy of the same text replaces the payload. For images a
+small PNG thumbnail is computed in the background when they are stored, so
+the popup can show image rows without decoding the full image; the
+thumbnails are a cache capped in total size.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections.abc import Iterable
+from io import BytesIO
+from pathlib import Path
+
+from . import durable
+
+log = logging.getLogger(__name__)
+
+# Storage location, one file per payload, and the thumbnail cache in it
+BLOB_DIR = Path(os.path.expanduser("~/.myclip_blobs"))
+THUMBNAIL_DIR = BLOB_DIR / "thumbnails"
+
+# Longest side of a thumbnail in pixels, and the total size of the cache
+THUMBNAIL_MAX_PX = 256
+THUMBNAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def path(key: str) -> Path:
+    return BLOB_DIR / key
+
+
+def write(key: str, data: bytes, thumbnail: bool = False, replace: bool = False) -> None:
+    """Store data under key, unless already there (or replace); with thumbnail, also make one."""
+    target = path(key)
+    if target.exists() and not replace:
+        touch(key)
+    else:
+        BLOB_DIR.mkdir(parents=True, exist_ok=True)
+        durable.write_bytes(target, data)
+    if thumbnail and not thumbnail_path(key).exists():
+        threading.Thread(target=_make_thumbnail, args=(key, data), daemon=True).start()
+
+
+def read(key: str) -> bytes | None:
+    """Read a payload, or None if it is gone."""
+    try:
+        return path(key).read_bytes()
+    except OSError as e:
+        log.warning(f"Failed to read blob {key}: {e}")
+        return None
+
+
+def touch(key: str) -> None:
+    """Mark a payload as in use now, protecting it from prune(before=...)."""
+    try:
+        os.utime(path(key))
+    except OSError:
+        pass
+
+
+def prune(keep: Iterable[str], before: float | None = None) -> None:
+    """Remove payloads not in keep (last used before `before`, if given)."""
+    if not BLOB_DIR.exists():
+        return
+    keep = set(keep)
+    for entry in BLOB_DIR.iterdir():
+        if entry.name in keep or not entry.is_file():
+            continue
+        try:
+            if before is None or entry.stat().st_mtime < before:
+                entry.unlink()
+                thumbnail_path(entry.name).unlink(missing_ok=True)
+        except OSError as e:
+            log.warning(f"Failed to remove blob {entry.name}: {e}")
+
+
+def thumbnail_path(key: str) -> Path:
+    """Where the thumbnail of an image is cached; it may not exist."""
+    return THUMBNAIL_DIR / f"{key}.png"
+
+
+def _make_thumbnail(key: str, data: bytes) -> None:
+    try:
+        from PIL import Image
+
+        with Image.open(BytesIO(data)) as image:
+            image.thumbnail((THUMBNAIL_MAX_PX, THUMBNAIL_MAX_PX))
+            buffer = BytesIO()
+            image.save(buffer, "PNG", optimize=True)
+        THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+        durable.write_bytes(thumbnail_path(key), buffer.getvalue())
+    except Exception as e:
+        log.warning(f"Failed to make thumbnail for blob {key}: {e}")
+        return
+    _trim_thumbnails()
+
+
+def _trim_thumbnails() -> None:
+    """Remove the least recently made thumbnails beyond THUMBNAIL_CACHE_MAX_BYTES."""
+    try:
+        entries = [(entry.stat(), entry) for entry in THUMBNAIL_DIR.glob("*.png")]
+    except OSError:
+        return
+    total = sum(stat.st_size for stat, _ in entries)
+    for stat, entry in sorted(entries, key=lambda pair: pair[0].st_mtime):
+        if total <= THUMBNAIL_CACHE_MAX_BYTES:
+            break
+        entry.unlink(missing_ok=True)
+        total -= stat.st_size
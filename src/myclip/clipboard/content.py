@@ -0,0 +1,68 @@
+"""Typed clipboard content: text, images, rich text and file lists."""
+
+from __future__ import annotations
+
+from .digest import blob_id, item_id
+
+KIND_TEXT = "text"
+KIND_IMAGE = "image"  # PNG data
+KIND_RTF = "rtf"  # RTF data and its plain text
+KIND_FILES = "files"  # File paths, one per line
+
+# Kinds whose payload is kept in the blob store
+BLOB_KINDS = frozenset((KIND_IMAGE, KIND_RTF))
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class ClipboardContent:
+    """What a clipboard backend read, or is to write.
+
+    text is the plain text: the text itself, the plain version of rich text,
+    the paths of a file list (one per line), or "" for an image. data is the
+    binary payload of images (PNG) and rich text (RTF).
+    """
+
+    __slots__ = ("kind", "text", "data")
+
+    def __init__(self, kind: str, text: str, data: bytes | None = None):
+        self.kind = kind
+        self.text = text
+        self.data = data
+
+    @property
+    def key(self) -> str:
+        """The ID of the history item holding this content.
+
+        Text and rich text are identified by their text, so the same text
+        copied from a rich and a plain text app is one item, holding the
+        formatting of the newest copy, if any. Images are identified by their
+        payload, which also names their blob; file lists by their paths.
+        """
+        if self.kind in (KIND_TEXT, KIND_RTF):
+            return item_id(self.text)
+        if self.data is not None:
+            return blob_id(self.data)
+        return blob_id(f"{self.kind}\0{self.text}".encode("utf-8", "surrogatepass"))
+
+    def __bool__(self) -> bool:
+        """False for empty content, e.g. blank text."""
+        return bool(self.data) if self.kind == KIND_IMAGE else bool(self.text.strip())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ClipboardContent):
+            return NotImplemented
+        return (self.kind, self.text, self.data) == (other.kind, other.text, other.data)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        size = 0 if self.data is None else len(self.data)
+        return f"ClipboardContent({self.kind!r}, {self.text[:30]!r}, data={size}B)"
+
+
+def png_size(data: bytes) -> tuple[int, int] | None:
+    """Return the width and height of PNG data from its header, without decoding it."""
+    if len(data) < 24 or not data.startswith(PNG_SIGNATURE):
+        return None
+    return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
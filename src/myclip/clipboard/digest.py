@@ -0,0 +1,20 @@
+"""Content digests used to identify clipboard history items and blobs."""
+
+from __future__ import annotations
+
+import hashlib
+
+
+def digest(text: str) -> bytes:
+    """Return the 16-byte BLAKE2 digest of an item's text."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def item_id(text: str) -> str:
+    """Return the stable ID of an item: its hex content digest."""
+    return digest(text).hex()
+
+
+def blob_id(data: bytes) -> str:
+    """Return the hex digest naming a binary payload in the blob store."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
@@ -0,0 +1,57 @@
+"""Crash-safe replacement of files.
+
+Renaming a temp file over the target is atomic, but after a power loss the
+renamed file can still be empty unless its data reached the disk before the
+rename, and the rename itself is only durable once the directory is synced.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+from pathlib import Path
+
+
+def fsync(fd: int) -> None:
+    """Flush a file to the disk itself; on macOS, fsync() alone stops at the drive's cache."""
+    if hasattr(fcntl, "F_FULLFSYNC"):
+        try:
+            fcntl.fcntl(fd, fcntl.F_FULLFSYNC)
+            return
+        except OSError:
+            pass  # Not supported by the file system
+    os.fsync(fd)
+
+
+def sync_dir(directory: Path) -> None:
+    """Make renames and removals in directory durable."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def temp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def replace(tmp: Path, path: Path) -> None:
+    """Rename a synced temp file to path, durably."""
+    os.replace(tmp, path)
+    sync_dir(path.parent)
+
+
+def write_bytes(path: Path, data: bytes) -> None:
+    """Replace path with data atomically and durably, via a temp file."""
+    tmp = temp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        fsync(f.fileno())
+    replace(tmp, path)
@@ -2,124 +2,451 @@
 
 from __future__ import annotations
 
-import json
-import os
+import logging
 import threading
-from pathlib import Path
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
 
-from rapidfuzz import fuzz, process
+from .. import config, trace
+from . import archive, blobs, journal, spill, sqlite_store
+from .archive import Archive
+from .content import BLOB_KINDS, KIND_IMAGE, KIND_TEXT, ClipboardContent
+from .journal import HistoryJournal, HistoryView
+from .item import HistoryItem
+from .search import SearchEngine, SearchSnapshot, filter_matches
+from .sqlite_store import SqliteStore
+from .trigram import compile_matcher, parse_query
 
-from ..config import FUZZY_SCORE_THRESHOLD, MAX_HISTORY_ITEMS
+log = logging.getLogger(__name__)
 
 
-def search_items(query: str, items: list[str]) -> list[str]:
-    """Search items using fuzzy matching. Returns matching items sorted by score."""
+def search_items(query: str, items: list[str], limit: int | None = None) -> list[str]:
+    """Search items using fuzzy matching. Returns matching items sorted by score.
+
+    With a limit, only the best `limit` matches are returned. Exact and regex
+    queries (see trigram.py) return matches in item order, without an index.
+    """
     if not query or not query.strip():
-        return items
+        return items[:limit]
 
     if not items:
         return []
 
+    mode, text = parse_query(query)
+    if mode != "fuzzy":
+        return filter_matches(items, compile_matcher(mode, text)[0], limit)
+
+    from rapidfuzz import fuzz, process
+
     results = process.extract(
         query,
         items,
         scorer=fuzz.partial_ratio,
-        limit=None,
-        score_cutoff=FUZZY_SCORE_THRESHOLD,
+        limit=limit,
+        score_cutoff=config.FUZZY_SCORE_THRESHOLD,
     )
     return [item for item, score, _ in results]
 
-# Storage location
-HISTORY_FILE = Path(os.path.expanduser("~/.myclip_history.json"))
-
 
 class ClipboardHistory:
-    """Thread-safe clipboard history storage with fuzzy search and persistence."""
+    """Thread-safe clipboard history storage with fuzzy search and persistence.
+
+    The default "json" backend keeps items in memory and persists them through
+    a journal. Items are HistoryItems whose display metadata is computed once
+    in add(); the payloads of images and rich text go to the blob store. Rich
+    text is keyed by its plain text, so a copy of the same text, rich or
+    plain, replaces it. History is bounded by item count and by
+    max_total_bytes; items larger than max_item_bytes are spilled to disk,
+    keeping only a prefix in memory. Journal records are written to disk in
+    the background, and changes other processes (the popup) journal are
+    merged in before each operation.
 
-    def __init__(self, max_items: int = MAX_HISTORY_ITEMS):
-        self._items: list[str] = []
+    Writers serialize on a lock and, after each change, drop the published
+    snapshot: a tuple of the items and the search engine's corpus. get_all()
+    and search() rebuild it on their first call after a change, so add()
+    does not copy the history, and otherwise read it without taking the lock,
+    so a long search never holds up add(). Items dropped to stay within the
+    limits go to the archive, if enabled, which search() falls back to when
+    the history has too few matches. The "sqlite" backend keeps items in a
+    database and answers every operation with indexed queries instead; it
+    applies the item count limit only and does not archive.
+    """
+
+    def __init__(
+        self,
+        max_items: int | None = None,
+        backend: str | None = None,
+        max_total_bytes: int | None = None,
+        max_item_bytes: int | None = None,
+    ):
+        if max_items is None:
+            max_items = config.MAX_HISTORY_ITEMS
+        if backend is None:
+            backend = config.HISTORY_BACKEND
+        # Item ID -> item, oldest first, so dedup and move-to-front are O(1)
+        self._items: OrderedDict[str, HistoryItem] = OrderedDict()
         self._max_items = max_items
+        self._max_total_bytes = (
+            config.MAX_TOTAL_BYTES if max_total_bytes is None else max_total_bytes
+        )
+        self._max_item_bytes = config.MAX_ITEM_BYTES if max_item_bytes is None else max_item_bytes
+        self._total_bytes = 0
         self._lock = threading.Lock()
-        self._load()
+        self._search = SearchEngine()
+        # Published with the lock held, read without it; None once a change dropped them
+        self._snapshot: tuple[HistoryItem, ...] | None = ()
+        self._search_snapshot: SearchSnapshot | None = None
+        self._length = 0
+        self._journal = HistoryJournal(max_items)
+        self._archive: Archive | None = None
+        if config.ARCHIVE_ENABLED and backend != "sqlite":
+            self._archive = Archive(self._release_spilled)
+        self._db: SqliteStore | None = None
+        if backend == "sqlite":
+            self._open_db()
+        else:
+            self._load()
 
     def _load(self) -> None:
-        """Load history from disk."""
+        """Load history from disk, archiving items beyond a limit lowered since the last run."""
         try:
-            if HISTORY_FILE.exists():
-                data = json.loads(HISTORY_FILE.read_text())
-                if isinstance(data, list):
-                    self._items = data[: self._max_items]
+            self._items = self._journal.load()
         except Exception:
-            self._items = []
+            self._items = OrderedDict()
+        self._index_all()
+        with self._lock:
+            self._trim()
+            self._publish()
+        if self._archive is not None:
+            self._archive.wait()  # It reads spill files of the items it archives
+        spill.prune(key for key, item in self._items.items() if item.spilled)
+        self._prune_blobs()
+
+    def _prune_blobs(self) -> None:
+        """Remove payloads of items neither in history nor possibly in the archive."""
+        keep = [key for key, item in self._items.items() if item.kind in BLOB_KINDS]
+        before = archive.oldest_time() if self._archive is not None else None
+        blobs.prune(keep, time.time() if before is None else before)
+
+    def _index_all(self) -> None:
+        """Rebuild the search engine and byte count from the items."""
+        self._search.clear()
+        self._total_bytes = 0
+        for key, item in self._items.items():
+            self._search.add(key, item)
+            self._total_bytes += item.size
+
+    def _publish(self) -> None:
+        """Drop the snapshots of the items after a change. Called with the lock held.
 
-    def _save(self) -> None:
-        """Save history to disk."""
+        Readers rebuild them when they next need them (see _items_snapshot()).
+        """
+        self._snapshot = None
+        self._search_snapshot = None
+        self._length = len(self._items)
+
+    def _items_snapshot(self) -> tuple[HistoryItem, ...]:
+        """The published tuple of the items, newest first, rebuilt if dropped."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = tuple(reversed(self._items.values()))
+                snapshot = self._snapshot
+        return snapshot
+
+    def _corpus_snapshot(self) -> SearchSnapshot:
+        """The published search corpus, rebuilt if dropped or its settings changed."""
+        snapshot = self._search_snapshot
+        if snapshot is None or snapshot.stale:
+            with self._lock:
+                snapshot = self._search_snapshot = self._search.snapshot()
+        return snapshot
+
+    def _catch_up(self) -> None:
+        """Merge changes of other processes, taking the lock only if there are any."""
+        if self._journal.changed():
+            with self._lock:
+                self._sync()
+                self._publish()
+
+    def _sync(self) -> None:
+        """Merge the records other processes journaled. Called with the lock held."""
         try:
-            HISTORY_FILE.write_text(json.dumps(self._items))
-        except Exception:
-            pass
+            self._merge(self._journal.sync())
+        except OSError as e:
+            log.warning(f"Failed to check history journal for changes: {e}")
 
-    def add(self, text: str) -> None:
-        """Add an item to history. Moves duplicates to top, trims to max size."""
-        if not text or not text.strip():
+    def _merge(self, records: list[dict] | None) -> None:
+        """Apply records journaled by other processes, or reload if they are gone."""
+        if records is None:
+            log.info("History changed on disk beyond the journal, reloading")
+            self._items = self._journal.reload()
+            self._index_all()
+            self._trim()
             return
+        if not records:
+            return
+        before = set(self._items)
+        journal.replay(self._items, records)
+        for key in before.difference(self._items):
+            self._search.remove(key)
+        for record in records:
+            item = self._items.get(record.get("id"))
+            if record.get("op") == "add" and item is not None:
+                self._search.add(item.key, item)
+        self._total_bytes = sum(item.size for item in self._items.values())
 
-        with self._lock:
-            # Remove duplicate if exists
-            if text in self._items:
-                self._items.remove(text)
+    def _open_db(self) -> None:
+        """Open the SQLite store, migrating the JSON history into a new database."""
+        self._db = SqliteStore(self._max_items)
+        if len(self._db) == 0:
+            items = journal.load_items(self._max_items)
+            if items:
+                self._db.import_items([item.full_text() for item in items])
+
+    def add(self, content: str | ClipboardContent) -> None:
+        """Add text or other content to history. Moves duplicates to top, trims to max size.
+
+        The sqlite backend stores the text of content only, and skips images.
+        """
+        if isinstance(content, str):
+            content = ClipboardContent(KIND_TEXT, content)
+        if not content:
+            return
 
-            # Add to front (newest first)
-            self._items.insert(0, text)
+        with trace.span("history.add", kind=content.kind):
+            if self._db is None:
+                self._add(content)
+            elif content.kind != KIND_IMAGE:
+                self._db.add(content.text)
 
-            # Trim to max size
-            if len(self._items) > self._max_items:
-                self._items = self._items[: self._max_items]
+    def _add(self, content: ClipboardContent) -> None:
+        key = content.key
+        if content.data is not None:
+            try:
+                # Rewrites the file if it was pruned since the item was copied. Rich
+                # text shares its key with copies of the text in other formatting.
+                image = content.kind == KIND_IMAGE
+                blobs.write(key, content.data, thumbnail=image, replace=not image)
+            except OSError as e:
+                log.warning(f"Failed to store clipboard {content.kind}, keeping text only: {e}")
+                if content.kind == KIND_IMAGE:
+                    return
+                content = ClipboardContent(KIND_TEXT, content.text)
+                key = content.key
+        with self._lock:
+            item = self._items.get(key)
+        if item is None or item.spilled or item.kind != content.kind:
+            item = HistoryItem.from_content(content, key)
+            if item.kind != KIND_IMAGE and item.size > self._max_item_bytes:
+                try:
+                    # Rewrites the file if another process deleted the item
+                    item = item.spill()
+                except OSError as e:
+                    log.warning(f"Failed to spill large item to disk, keeping it in memory: {e}")
+        with self._lock:
+            self._sync()
+            # Add or move duplicate to the newest end
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous.size
+            self._items[key] = item
+            self._total_bytes += item.size
+            self._search.add(key, item)
+
+            self._trim()
+            self._journal.append(journal.add_record(item))
+            self._publish()
 
-            self._save()
+    def set_limits(
+        self,
+        max_items: int,
+        max_total_bytes: int | None = None,
+        max_item_bytes: int | None = None,
+    ) -> None:
+        """Change the history limits, dropping the oldest items beyond them.
 
-    def get_all(self) -> list[str]:
-        """Get all items in history (newest first)."""
+        A new max_item_bytes applies to items added from now on.
+        """
+        if self._db is not None:
+            self._db.set_max_items(max_items)
+            return
         with self._lock:
-            return self._items.copy()
+            self._sync()
+            self._max_items = max_items
+            if max_total_bytes is not None:
+                self._max_total_bytes = max_total_bytes
+            if max_item_bytes is not None:
+                self._max_item_bytes = max_item_bytes
+            self._journal.set_max_items(max_items)
+            self._trim()
+            self._publish()
+
+    def _trim(self) -> None:
+        """Drop the oldest items beyond the limits. Called with the lock held.
 
-    def search(self, query: str) -> list[str]:
-        """Search items using fuzzy matching. Returns matching items sorted by score."""
+        The newest item is always kept. Removals are journaled as deletes, so
+        history loads without them and never archives them twice. Dropped
+        items are archived, their spill files removed once written.
+        """
+        dropped = []
+        while len(self._items) > 1 and (
+            len(self._items) > self._max_items or self._total_bytes > self._max_total_bytes
+        ):
+            oldest, item = self._items.popitem(last=False)
+            self._total_bytes -= item.size
+            self._search.remove(oldest)
+            self._journal.append({"op": "delete", "id": oldest})
+            if self._archive is not None:
+                dropped.append(item)
+            elif item.spilled:
+                spill.discard(oldest)
+        if dropped:
+            self._archive.append(dropped)
+
+    def _release_spilled(self, items: list[HistoryItem]) -> None:
+        """Remove the spill files of archived items that were not copied again."""
         with self._lock:
-            return search_items(query, self._items.copy())
+            for item in items:
+                if item.spilled and item.key not in self._items:
+                    spill.discard(item.key)
+
+    def get_all(self) -> Sequence[HistoryItem]:
+        """Get all items in history (newest first), as an immutable snapshot."""
+        if self._db is not None:
+            return [HistoryItem.from_text(text) for text in self._db.recent()]
+        self._catch_up()
+        return self._items_snapshot()
+
+    def search(self, query: str, limit: int | None = None) -> list[HistoryItem]:
+        """Search items using fuzzy matching. Returns matching items sorted by score.
+
+        Queries starting with ' or / match exact substrings or a regex instead,
+        newest first. With fewer than limit matches, the archive is searched
+        for more, which follow those from the history.
+        """
+        with trace.span("history.search", query_len=len(query)) as fields:
+            results = self._find(query, limit)
+            fields["results"] = len(results)
+        return results
+
+    def _find(self, query: str, limit: int | None) -> list[HistoryItem]:
+        if self._db is not None:
+            if not query or not query.strip():
+                texts = self._db.recent(limit)
+            elif parse_query(query)[0] != "fuzzy":
+                texts = search_items(query, self._db.recent(), limit)
+            else:
+                texts = search_items(query, self._db.candidates(query), limit)
+            return [HistoryItem.from_text(text) for text in texts]
+        self._catch_up()
+        if parse_query(query)[0] != "fuzzy":
+            # Narrowing by the index is quick; checking the candidates runs unlocked
+            with self._lock:
+                candidates, predicate = self._search.lookup(query)
+            results = filter_matches(candidates, predicate, limit)
+        else:
+            results = self._corpus_snapshot().search(query, limit)
+        if self._archive is None or not query.strip():
+            return results
+        if limit is not None and len(results) >= limit:
+            return results
+        remaining = None if limit is None else limit - len(results)
+        keys = {item.key for item in self._items_snapshot()}
+        return results + self._archive.search(query, remaining, keys)
 
     def clear(self) -> None:
         """Clear all history."""
+        if self._db is not None:
+            self._db.clear()
+            return
         with self._lock:
+            self._sync()
             self._items.clear()
-            self._save()
+            self._total_bytes = 0
+            self._search.clear()
+            self._journal.append({"op": "clear"})
+            self._publish()
+        if self._archive is not None:
+            self._archive.wait()  # Reads spill files and marks the payloads to keep
+        spill.prune(())
+        self._prune_blobs()
+
+    def flush(self) -> None:
+        """Write pending history changes to disk now."""
+        if self._db is None:
+            self._journal.flush()
+
+    def set_flush_scheduler(self, schedule: Callable[[], None] | None) -> None:
+        """Have schedule() arrange flush() calls instead of the journal's own thread."""
+        if self._db is None:
+            self._journal.set_flush_scheduler(schedule)
+
+    def stats(self) -> dict:
+        """Return persistence counters: queued journal records and flush durations."""
+        if self._db is not None:
+            return {}
+        return self._journal.stats()
+
+    def close(self) -> None:
+        """Write pending history changes and wait for background work to finish."""
+        self._journal.close()
+        if self._archive is not None:
+            self._archive.wait()
+        if self._db is not None:
+            self._db.close()
 
     def __len__(self) -> int:
-        with self._lock:
-            return len(self._items)
+        if self._db is not None:
+            return len(self._db)
+        self._catch_up()
+        return self._length
+
 
+def load_history_readonly(limit: int | None = None) -> HistoryView:
+    """Load history from disk, newest first (for use in subprocess).
 
-def load_history_readonly() -> list[str]:
-    """Load history from disk (for use in subprocess)."""
+    Items are decoded from the memory-mapped snapshot as they are accessed;
+    close() the view when done. Spilled items hold only a prefix; see
+    HistoryItem.full_text().
+    """
     try:
-        if HISTORY_FILE.exists():
-            data = json.loads(HISTORY_FILE.read_text())
-            if isinstance(data, list):
-                return data
+        if config.HISTORY_BACKEND == "sqlite":
+            return HistoryView(
+                [HistoryItem.from_text(text) for text in sqlite_store.load_items(limit)]
+            )
+        view = journal.load_view(config.MAX_HISTORY_ITEMS)
+        if limit is not None and limit < len(view):
+            items = view[:limit]
+            view.close()
+            return HistoryView(items)
+        return view
     except Exception:
-        pass
-    return []
+        return HistoryView([])
 
 
-def delete_history_item(item: str) -> bool:
-    """Delete an item from history file (for use in subprocess)."""
+def delete_history_item(key: str) -> bool:
+    """Delete an item from history by its ID (for use in subprocess).
+
+    Archived copies of the item are deleted as well. Returns whether the item
+    was in the history.
+    """
     try:
-        if HISTORY_FILE.exists():
-            data = json.loads(HISTORY_FILE.read_text())
-            if isinstance(data, list) and item in data:
-                data.remove(item)
-                HISTORY_FILE.write_text(json.dumps(data))
-                return True
+        if config.HISTORY_BACKEND == "sqlite":
+            return sqlite_store.delete_item(key)
+        view = journal.load_view(config.MAX_HISTORY_ITEMS)
+        try:
+            found = view.discard(key) is not None
+        finally:
+            view.close()
+        if config.ARCHIVE_ENABLED:
+            archive.delete(key)
+        if found:
+            journal.append_record({"op": "delete", "id": key})
+            spill.discard(key)
+            return True
     except Exception:
         pass
     return False
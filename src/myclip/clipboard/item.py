@@ -0,0 +1,154 @@
+"""History items with display metadata.
+
+The metadata the popup shows for an item (a collapsed one-line text, the line
+count and the size) is computed once when the item is copied and stored with
+it, so listing and previewing never scan the full text again.
+
+Items are typed by the kind of content copied (see content.py). The text of
+an image item is a description such as "Image 1920×1080", which is what
+search matches; its pixels are in the blob store.
+"""
+
+from __future__ import annotations
+
+import os
+
+from . import blobs, spill
+from .content import (
+    BLOB_KINDS,
+    KIND_FILES,
+    KIND_IMAGE,
+    KIND_TEXT,
+    ClipboardContent,
+    png_size,
+)
+from .digest import item_id
+
+# Characters of the collapsed one-line text kept for list rows
+DISPLAY_LINE_CHARS = 200
+
+
+def collapse_line(text: str, max_len: int = DISPLAY_LINE_CHARS) -> str:
+    """Collapse whitespace to single spaces, looking only at the start of text."""
+    return " ".join(text[: max_len * 4].split())[:max_len]
+
+
+class HistoryItem:
+    """A clipboard history entry.
+
+    text is the full text, or only its first SPILL_PREFIX_CHARS characters if
+    the item is spilled to disk; full_text() returns the whole of it either way.
+    content() returns what to put back on the clipboard, whatever the kind.
+    """
+
+    __slots__ = ("key", "text", "line", "lines", "size", "spilled", "kind")
+
+    def __init__(
+        self,
+        key: str,
+        text: str,
+        line: str,
+        lines: int,
+        size: int,
+        spilled: bool = False,
+        kind: str = KIND_TEXT,
+    ):
+        self.key = key
+        self.text = text
+        self.line = line  # Collapsed one-line text for list rows
+        self.lines = lines
+        self.size = size  # Of the full text (of the image data for images), in bytes
+        self.spilled = spilled
+        self.kind = kind
+
+    @classmethod
+    def from_text(cls, text: str, key: str | None = None) -> HistoryItem:
+        """Create an item, computing its ID (unless given) and display metadata."""
+        return cls(
+            key if key is not None else item_id(text),
+            text,
+            collapse_line(text),
+            text.count("\n") + 1,
+            len(text.encode("utf-8", "surrogatepass")),
+        )
+
+    @classmethod
+    def from_content(cls, content: ClipboardContent, key: str | None = None) -> HistoryItem:
+        """Create an item for clipboard content. Its payload is stored separately."""
+        if key is None:
+            key = content.key
+        if content.kind == KIND_IMAGE:
+            size = png_size(content.data)
+            text = "Image" if size is None else f"Image {size[0]}×{size[1]}"
+            return cls(key, text, text, 1, len(content.data), kind=KIND_IMAGE)
+        item = cls.from_text(content.text, key)
+        item.kind = content.kind
+        if content.kind == KIND_FILES:
+            names = ", ".join(os.path.basename(path) for path in content.text.splitlines())
+            item.line = collapse_line(names)
+        return item
+
+    def spill(self) -> HistoryItem:
+        """Write the text to a spill file and return the item holding only a prefix."""
+        spill.write(self.key, self.text)
+        return HistoryItem(
+            self.key,
+            self.text[: spill.SPILL_PREFIX_CHARS],
+            self.line,
+            self.lines,
+            self.size,
+            spilled=True,
+            kind=self.kind,
+        )
+
+    def full_text(self) -> str:
+        """Return the full text, reading it back from disk if spilled."""
+        if self.spilled:
+            text = spill.read(self.key)
+            if text is not None:
+                return text
+        return self.text
+
+    def content(self) -> ClipboardContent:
+        """Return the content to put on the clipboard, reading it back from disk if needed.
+
+        If the payload of an image or rich text is gone, the text is returned.
+        """
+        if self.kind in BLOB_KINDS:
+            data = blobs.read(self.key)
+            if data is not None:
+                text = "" if self.kind == KIND_IMAGE else self.full_text()
+                return ClipboardContent(self.kind, text, data)
+        if self.kind == KIND_FILES:
+            return ClipboardContent(KIND_FILES, self.text)
+        return ClipboardContent(KIND_TEXT, self.full_text())
+
+    def to_dict(self) -> dict:
+        """Serialize for the journal and snapshot, omitting what is implied."""
+        data = {"id": self.key, "text": self.text, "lines": self.lines, "size": self.size}
+        if self.line != self.text:
+            data["line"] = self.line
+        if self.spilled:
+            data["spilled"] = True
+        if self.kind != KIND_TEXT:
+            data["kind"] = self.kind
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> HistoryItem:
+        """Deserialize from to_dict() output, or from a bare text record of older versions."""
+        text = data["text"]
+        if "size" not in data:
+            return cls.from_text(text, data.get("id"))
+        return cls(
+            data["id"],
+            text,
+            data.get("line", text),
+            data["lines"],
+            data["size"],
+            data.get("spilled", False),
+            data.get("kind", KIND_TEXT),
+        )
+
+    def __repr__(self) -> str:
+        return f"HistoryItem({self.key!r}, {self.line[:30]!r}, size={self.size})"
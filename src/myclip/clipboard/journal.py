@@ -0,0 +1,664 @@
+"""Append-only journal persistence for clipboard history.
+
+History lives in two files: a compressed binary snapshot (see snapshot.py)
+holding the full item list and a JSON-lines journal of add/delete/clear
+records appended after it. A copy costs one small append; the journal is
+periodically folded into a fresh snapshot by a background thread. Replaying a
+journal is idempotent, so a crash at any point of a compaction leaves a
+history that loads to the same state.
+
+Both the main process and the popup append to the journal. Appends and the
+journal rotation of a compaction take an advisory lock, and every record is
+stamped with the next value of a generation counter kept in the lock file, so
+a process can tell that others changed the history and replay just their
+records instead of overwriting them. A compaction also takes the lock to put
+the new snapshot in place of the old one and the journal it folded in, and
+readers hold it shared while they open the snapshot and read the journals,
+so they never combine the new snapshot with the old journal or vice versa.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+
+from .. import config, trace
+from . import durable, snapshot
+from .digest import item_id
+from .item import HistoryItem
+
+log = logging.getLogger(__name__)
+
+# Storage location
+HISTORY_FILE = Path(os.path.expanduser("~/.myclip_history.json"))  # Legacy snapshot
+SNAPSHOT_FILE = HISTORY_FILE.with_suffix(".bin")
+JOURNAL_FILE = HISTORY_FILE.with_suffix(".journal")
+# Journal being folded into the snapshot by a running (or crashed) compaction
+COMPACTING_FILE = HISTORY_FILE.with_suffix(".journal.old")
+# Advisory lock for journal writes, holding the generation counter
+LOCK_FILE = HISTORY_FILE.with_suffix(".lock")
+# Where a snapshot that cannot be read is moved aside
+UNREADABLE_SNAPSHOT_FILE = HISTORY_FILE.with_suffix(".bin.unreadable")
+
+# Compact once this many records have been appended since the last snapshot
+COMPACT_AFTER_RECORDS = 100
+
+
+def read_legacy_snapshot() -> list[str | dict]:
+    """Read the JSON snapshot of older versions, or an empty list if missing or invalid.
+
+    Entries are HistoryItem dicts, or bare texts in the oldest files.
+    """
+    try:
+        if HISTORY_FILE.exists():
+            data = json.loads(HISTORY_FILE.read_text())
+            if isinstance(data, list):
+                return data
+    except Exception as e:
+        log.warning(f"Failed to read history snapshot {HISTORY_FILE}: {e}")
+    return []
+
+
+def read_journal(path: Path) -> list[dict]:
+    """Read journal records, skipping a torn trailing line from a crash."""
+    records = []
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log.warning(f"Failed to read history journal {path}: {e}")
+    return records
+
+
+def add_record(item: HistoryItem) -> dict:
+    """Return the journal record adding an item."""
+    return {"op": "add", **item.to_dict()}
+
+
+def snapshot_entries(
+    limit: int | None = None, strict: bool = False
+) -> OrderedDict[str, HistoryItem]:
+    """Read the newest limit items of the snapshot as ID -> item, oldest first.
+
+    Falls back to the legacy JSON snapshot until it has been migrated. An
+    unreadable snapshot reads as empty, or raises if strict.
+    """
+    if SNAPSHOT_FILE.exists() or not HISTORY_FILE.exists():
+        try:
+            items = snapshot.read(SNAPSHOT_FILE, limit)
+        except FileNotFoundError:
+            items = []
+        except Exception as e:
+            if strict:
+                raise
+            log.warning(f"Failed to read history snapshot {SNAPSHOT_FILE}: {e}")
+            items = []
+        return OrderedDict((item.key, item) for item in reversed(items))
+
+    entries = OrderedDict()
+    for entry in reversed(read_legacy_snapshot()[:limit]):
+        try:
+            if isinstance(entry, str):
+                item = HistoryItem.from_text(entry)
+            else:
+                item = HistoryItem.from_dict(entry)
+        except (KeyError, TypeError) as e:
+            log.warning(f"Skipping invalid history snapshot entry: {e}")
+            continue
+        entries[item.key] = item
+    return entries
+
+
+def replay(
+    entries: OrderedDict[str, HistoryItem],
+    records: Iterable[dict],
+    max_items: int | None = None,
+) -> None:
+    """Apply journal records in place to entries (ID -> item, oldest first)."""
+    for record in records:
+        op = record.get("op")
+        if op == "add":
+            item = _record_item(record)
+            if item is None:
+                continue
+            entries[item.key] = item
+            entries.move_to_end(item.key)
+            if max_items is not None and len(entries) > max_items:
+                entries.popitem(last=False)
+        elif op == "delete":
+            entries.pop(_record_key(record), None)
+        elif op == "clear":
+            entries.clear()
+
+
+def _record_item(record: dict) -> HistoryItem | None:
+    """Return the item of an add record, or None if it is invalid."""
+    if not isinstance(record.get("text"), str):
+        return None
+    try:
+        return HistoryItem.from_dict(record)
+    except (KeyError, TypeError):
+        return None
+
+
+def _record_key(record: dict) -> str | None:
+    """Return the ID of the item an add or delete record refers to."""
+    key = record.get("id")
+    if key is None and isinstance(record.get("text"), str):
+        key = item_id(record["text"])  # Records written before item IDs
+    return key if isinstance(key, str) else None
+
+
+def load_entries(
+    max_items: int | None = None, strict: bool = False
+) -> OrderedDict[str, HistoryItem]:
+    """Load the current history as ID -> item, oldest first.
+
+    Combines the snapshot with any journals not yet compacted. An unreadable
+    snapshot reads as empty, or raises if strict.
+    """
+    entries = snapshot_entries(max_items, strict)
+    for path in (COMPACTING_FILE, JOURNAL_FILE):
+        replay(entries, read_journal(path), max_items)
+    if max_items is not None:
+        while len(entries) > max_items:
+            entries.popitem(last=False)
+    return entries
+
+
+class HistoryView(Sequence):
+    """Read-only history, newest first, that decodes snapshot items on access.
+
+    Items changed since the last compaction come from the journal; the rest
+    are read from the memory-mapped snapshot the first time they are accessed.
+    """
+
+    def __init__(
+        self,
+        recent: list[HistoryItem],
+        reader: snapshot.SnapshotReader | None = None,
+        positions: Sequence[int] = (),
+    ):
+        self._recent = recent
+        self._reader = reader
+        self._positions = positions  # Snapshot indexes of the remaining items
+        self._decoded: dict[int, HistoryItem] = {}
+
+    def __len__(self) -> int:
+        return len(self._recent) + len(self._positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < len(self._recent):
+            return self._recent[index]
+        position = self._positions[index - len(self._recent)]
+        item = self._decoded.get(position)
+        if item is None:
+            item = self._decoded[position] = self._reader.item(position)
+        return item
+
+    def discard(self, key: str) -> int | None:
+        """Remove the item with the given ID. Returns its former index, if found."""
+        for index, item in enumerate(self._recent):
+            if item.key == key:
+                del self._recent[index]
+                return index
+        raw_key = bytes.fromhex(key)
+        for index, position in enumerate(self._positions):
+            if self._reader.key(position) == raw_key:
+                self._positions = list(self._positions)
+                del self._positions[index]
+                return len(self._recent) + index
+        return None
+
+    def close(self) -> None:
+        """Unmap the snapshot. Items already returned stay valid."""
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+            self._positions = ()
+
+
+def load_view(max_items: int | None = None) -> HistoryView:
+    """Load the current history lazily, for read-only use (e.g. in the popup).
+
+    Gives the same items as load_items(), but only the journal is parsed up
+    front. Snapshot items the journal touches are found by their IDs in the
+    index, without decoding any item.
+    """
+    if HISTORY_FILE.exists() and not SNAPSHOT_FILE.exists():
+        return HistoryView(load_items(max_items))  # Legacy snapshot not migrated yet
+    with locked(shared=True):
+        try:
+            reader = snapshot.SnapshotReader(SNAPSHOT_FILE)
+        except FileNotFoundError:
+            reader = None
+        except Exception as e:
+            log.warning(f"Failed to read history snapshot {SNAPSHOT_FILE}: {e}")
+            reader = None
+        records = read_journal(COMPACTING_FILE) + read_journal(JOURNAL_FILE)
+    count = len(reader) if reader is not None else 0
+    if max_items is not None:
+        count = min(count, max_items)
+    touched = set()
+    for record in records:
+        key = _record_key(record)
+        if key is not None:
+            try:
+                touched.add(bytes.fromhex(key))
+            except ValueError:
+                pass
+    found = {}  # Raw ID -> snapshot position of the items the journal touches
+    if touched:
+        for position in range(count):
+            raw_key = reader.key(position)
+            if raw_key in touched:
+                found[raw_key] = position
+
+    # Replay as replay() does, tracking the snapshot part by positions: those
+    # in removed were deleted or moved to the journal part, those from cutoff
+    # on were trimmed.
+    entries = OrderedDict()
+    removed = set()
+    cutoff = alive = count
+
+    def remove_from_snapshot(key: str) -> None:
+        nonlocal alive
+        position = found.get(bytes.fromhex(key))
+        if position is not None and position < cutoff and position not in removed:
+            removed.add(position)
+            alive -= 1
+
+    for record in records:
+        op = record.get("op")
+        if op == "add":
+            item = _record_item(record)
+            if item is None:
+                continue
+            remove_from_snapshot(item.key)
+            entries[item.key] = item
+            entries.move_to_end(item.key)
+            if max_items is not None and alive + len(entries) > max_items:
+                if alive:
+                    while cutoff - 1 in removed:
+                        cutoff -= 1
+                    cutoff -= 1
+                    alive -= 1
+                else:
+                    entries.popitem(last=False)
+        elif op == "delete":
+            key = _record_key(record)
+            if key is not None and entries.pop(key, None) is None:
+                remove_from_snapshot(key)
+        elif op == "clear":
+            entries.clear()
+            cutoff = alive = 0
+
+    if removed:
+        positions = [position for position in range(cutoff) if position not in removed]
+    else:
+        positions = range(cutoff)
+    return HistoryView(list(reversed(entries.values())), reader, positions)
+
+
+def load_items(max_items: int | None = None) -> list[HistoryItem]:
+    """Load the current history as a list of items, newest first."""
+    with locked(shared=True):
+        entries = load_entries(max_items)
+    return list(reversed(entries.values()))
+
+
+@contextmanager
+def locked(shared: bool = False) -> Iterator[int]:
+    """Hold the history lock, yielding the lock file descriptor.
+
+    Writers hold it exclusively, readers of the files shared. It is not
+    reentrant: a process holding it must not take it again.
+    """
+    fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield fd
+    finally:
+        os.close(fd)  # Releases the lock
+
+
+def read_generation(fd: int | None = None) -> int:
+    """Return the generation of the last record appended (0 if none)."""
+    if fd is None:
+        try:
+            fd_to_close = fd = os.open(LOCK_FILE, os.O_RDONLY)
+        except FileNotFoundError:
+            return 0
+    else:
+        fd_to_close = None
+    try:
+        data = os.pread(fd, 32, 0)
+    finally:
+        if fd_to_close is not None:
+            os.close(fd_to_close)
+    try:
+        return int(data)
+    except ValueError:
+        return 0
+
+
+def _append_locked(fd: int, records: list[dict]) -> int:
+    """Append records stamped with the next generations in one write.
+
+    Called with the lock held. Returns the generation of the last record.
+    """
+    generation = read_generation(fd)
+    lines = []
+    for record in records:
+        generation += 1
+        lines.append(json.dumps({**record, "gen": generation}) + "\n")
+    # Advance the counter first: a crash in between leaves a gap, which makes
+    # readers reload, rather than two records with the same generation
+    os.pwrite(fd, f"{generation:020d}\n".encode(), 0)
+    journal_fd = os.open(JOURNAL_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(journal_fd, "".join(lines).encode())
+    finally:
+        os.close(journal_fd)
+    return generation
+
+
+def append_record(record: dict) -> int:
+    """Append a single record to the journal with one write. Returns its generation."""
+    with locked() as fd:
+        return _append_locked(fd, [record])
+
+
+def records_between(first: int, last: int) -> list[dict] | None:
+    """Return the journal records of generations first..last in order.
+
+    None means some were already compacted away (or the counter was reset),
+    so the history has to be reloaded instead.
+    """
+    if last < first - 1:
+        return None
+    if last < first:
+        return []  # Nothing new: no need to read the journals
+    records = [
+        record
+        for path in (COMPACTING_FILE, JOURNAL_FILE)
+        for record in read_journal(path)
+        if isinstance(record.get("gen"), int) and first <= record["gen"] <= last
+    ]
+    records.sort(key=lambda record: record["gen"])
+    if [record["gen"] for record in records] != list(range(first, last + 1)):
+        return None
+    return records
+
+
+def write_snapshot(
+    entries: OrderedDict[str, HistoryItem],
+    limit: int | None = None,
+    folded: Path | None = None,
+) -> None:
+    """Write entries (oldest first) newest first as the snapshot, atomically.
+
+    Removes the legacy JSON snapshot, which the new one replaces, and the
+    journal folded into it, if given. The snapshot is encoded without the
+    lock; it replaces the old one and the folded journal under it.
+    """
+    items = list(reversed(entries.values()))[:limit]
+    tmp = snapshot.write_temp(SNAPSHOT_FILE, items)
+    with locked():
+        # Durable before the files it replaces are removed
+        durable.replace(tmp, SNAPSHOT_FILE)
+        HISTORY_FILE.unlink(missing_ok=True)
+        if folded is not None:
+            folded.unlink(missing_ok=True)
+
+
+def migrate_legacy_snapshot(max_items: int | None = None) -> None:
+    """Convert a JSON snapshot of an older version to the binary format."""
+    if HISTORY_FILE.exists() and not SNAPSHOT_FILE.exists():
+        write_snapshot(snapshot_entries(max_items, strict=True))
+        log.info(f"Migrated history snapshot {HISTORY_FILE} to {SNAPSHOT_FILE}")
+
+
+class HistoryJournal:
+    """Journal writer with write-behind and background compaction.
+
+    append() only queues a record; a flusher thread writes queued records in
+    one batch at most every FLUSH_INTERVAL_MS, so callers never wait for the
+    disk, unless set_flush_scheduler() hands that job to someone else.
+    close() (or flush()) writes whatever is still queued.
+
+    Tracks the generation this process has seen, so sync() can return the
+    records other processes appended in the meantime.
+    """
+
+    def __init__(self, max_items: int):
+        self._max_items = max_items
+        self._pending = 0  # Records written since the last compaction
+        self._generation = 0  # Last generation applied to the caller's state
+        # Records of other processes found while flushing, None if some are lost
+        self._foreign: list[dict] | None = []
+        self._queue: list[dict] = []  # Records not written yet
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Held while writing to disk
+        self._compact_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._closing = threading.Event()
+        self._flusher: threading.Thread | None = None
+        self._schedule: Callable[[], None] | None = None
+        self._compactor: threading.Thread | None = None
+        self._flushes = 0
+        self._last_flush = 0.0  # time.monotonic() of the last flush
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+
+    def load(self) -> OrderedDict[str, HistoryItem]:
+        """Load history entries from disk and schedule compaction of a leftover journal.
+
+        Entries are not limited to max_items: the caller trims (and archives)
+        any beyond it.
+        """
+        try:
+            migrate_legacy_snapshot()
+        except Exception as e:
+            log.warning(f"Failed to migrate history snapshot: {e}")
+        with locked() as fd:
+            self._generation = read_generation(fd)
+            pending = len(read_journal(COMPACTING_FILE)) + len(read_journal(JOURNAL_FILE))
+            try:
+                entries = load_entries(strict=True)
+            except Exception as e:
+                # Keep the file for recovery instead of treating it as empty history
+                log.error(
+                    f"Cannot read history snapshot, moving it to {UNREADABLE_SNAPSHOT_FILE}: {e}"
+                )
+                os.replace(SNAPSHOT_FILE, UNREADABLE_SNAPSHOT_FILE)
+                entries = load_entries()
+        with self._lock:
+            self._pending = pending
+        if pending:
+            self._start_compaction()
+        return entries
+
+    def set_max_items(self, max_items: int) -> None:
+        """Change the limit applied when compacting."""
+        self._max_items = max_items
+
+    def append(self, record: dict) -> None:
+        """Queue a record to be written by the flusher thread (or flush scheduler)."""
+        with self._lock:
+            self._queue.append(record)
+            schedule = self._schedule
+            if schedule is None and self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        if schedule is not None:
+            schedule()
+        else:
+            self._dirty.set()
+
+    def set_flush_scheduler(self, schedule: Callable[[], None] | None) -> None:
+        """Call schedule() after each append instead of waking the flusher thread.
+
+        schedule must arrange for flush() to be called soon, e.g. on an event
+        loop that owns the app's background work; the debouncing is then its job.
+        """
+        with self._lock:
+            self._schedule = schedule
+            pending = bool(self._queue)
+        if schedule is not None and pending:
+            schedule()
+
+    def flush(self) -> None:
+        """Write all queued records now, in one batch."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            start = time.monotonic()
+            try:
+                with locked() as fd:
+                    current = read_generation(fd)
+                    foreign = []
+                    if current != self._generation:  # Another process appended
+                        foreign = records_between(self._generation + 1, current)
+                    self._generation = _append_locked(fd, batch)
+            except Exception as e:
+                log.warning(f"Failed to write history journal, will retry: {e}")
+                with self._lock:
+                    self._queue[:0] = batch
+                    self._last_flush = time.monotonic()
+                self._dirty.set()
+                return
+            end = time.monotonic()
+            trace.record("journal.flush", start, end, records=len(batch))
+            elapsed_ms = (end - start) * 1000
+            with self._lock:
+                if foreign is None or self._foreign is None:
+                    self._foreign = None
+                else:
+                    self._foreign.extend(foreign)
+                self._flushes += 1
+                self._last_flush = time.monotonic()
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._pending += len(batch)
+                due = self._pending >= COMPACT_AFTER_RECORDS
+        if due:
+            self._start_compaction()
+
+    def stats(self) -> dict:
+        """Return write-behind counters: queued records, flushes and their durations."""
+        with self._lock:
+            return {
+                "queue_depth": len(self._queue),
+                "flushes": self._flushes,
+                "last_flush_ms": self._last_flush_ms,
+                "max_flush_ms": self._max_flush_ms,
+            }
+
+    def changed(self) -> bool:
+        """Whether sync() may have records to return, checked without reading the journal."""
+        return self._foreign != [] or read_generation() != self._generation
+
+    def sync(self) -> list[dict] | None:
+        """Return the records other processes appended since the last sync().
+
+        None means they are gone and the history must be reloaded. Does not
+        wait for a flush in progress; that flush collects them instead.
+        """
+        with self._lock:
+            foreign, self._foreign = self._foreign, []
+        if foreign is None:
+            return None
+        if read_generation() == self._generation:
+            return foreign
+        if not self._flush_lock.acquire(blocking=False):
+            return foreign
+        try:
+            with locked() as fd:
+                current = read_generation(fd)
+                records = records_between(self._generation + 1, current)
+                self._generation = current
+        finally:
+            self._flush_lock.release()
+        return None if records is None else foreign + records
+
+    def reload(self) -> OrderedDict[str, HistoryItem]:
+        """Load history entries from disk, catching up with all generations, like load()."""
+        self.flush()
+        with self._flush_lock, locked() as fd:
+            self._generation = read_generation(fd)
+            with self._lock:
+                self._foreign = []
+            return load_entries()
+
+    def compact(self) -> None:
+        """Fold the journal into a new snapshot."""
+        # One compaction at a time: they share the snapshot's temp file
+        with self._compact_lock, trace.span("journal.compact"):
+            # New appends go to a fresh journal while the old one is folded. The
+            # lock ensures no other process is still appending to the old one.
+            with self._lock, locked():
+                if JOURNAL_FILE.exists() and not COMPACTING_FILE.exists():
+                    os.replace(JOURNAL_FILE, COMPACTING_FILE)
+                self._pending = 0
+            # Never replace a snapshot that cannot be read, e.g. from a newer version
+            entries = snapshot_entries(self._max_items, strict=True)
+            replay(entries, read_journal(COMPACTING_FILE), self._max_items)
+            write_snapshot(entries, self._max_items, folded=COMPACTING_FILE)
+
+    def close(self) -> None:
+        """Write queued records and wait for a running compaction to finish."""
+        self._closing.set()
+        self._dirty.set()
+        thread = self._flusher
+        if thread is not None:
+            thread.join(timeout=5.0)
+        self.flush()
+        thread = self._compactor
+        if thread is not None:
+            thread.join(timeout=5.0)
+
+    def _flush_loop(self) -> None:
+        while not self._closing.is_set():
+            self._dirty.wait()
+            # Let records accumulate until FLUSH_INTERVAL_MS after the last flush
+            delay = self._last_flush + config.FLUSH_INTERVAL_MS / 1000 - time.monotonic()
+            if delay > 0:
+                self._closing.wait(delay)
+            self._dirty.clear()
+            self.flush()
+
+    def _start_compaction(self) -> None:
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._compact_safely, daemon=True)
+            self._compactor.start()
+
+    def _compact_safely(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            log.warning(f"History compaction failed: {e}")
@@ -2,59 +2,120 @@
 
 from __future__ import annotations
 
-import threading
-import time
+from .. import config
+from .backends import ClipboardBackend, default_backend
+from .content import ClipboardContent
+from .history import ClipboardHistory
 
-import pyperclip
 
-from ..config import POLL_INTERVAL_SECONDS
-from .history import ClipboardHistory
+class PollScheduler:
+    """Adaptive poll interval: fast after activity, exponential backoff when idle."""
+
+    def __init__(
+        self,
+        min_interval: float | None = None,
+        max_interval: float | None = None,
+        backoff: float = 2.0,
+    ):
+        self._backoff = backoff
+        self.set_intervals(
+            config.MIN_POLL_INTERVAL_SECONDS if min_interval is None else min_interval,
+            config.MAX_POLL_INTERVAL_SECONDS if max_interval is None else max_interval,
+        )
+
+    @property
+    def interval(self) -> float:
+        """The delay before the next poll."""
+        return self._interval
+
+    def set_intervals(self, min_interval: float, max_interval: float) -> None:
+        """Change the interval bounds, restarting from the minimum."""
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self._interval = min_interval
+
+    def reset(self) -> None:
+        """Drop back to the minimum interval after activity."""
+        self._interval = self.min_interval
+
+    def advance(self) -> float:
+        """Return the delay before the next poll and back off for the one after."""
+        interval = self._interval
+        self._interval = min(self._interval * self._backoff, self.max_interval)
+        return interval
 
 
 class ClipboardMonitor:
-    """Background thread that polls clipboard for changes."""
+    """Polls the clipboard for changes, adding new content to history.
+
+    Each poll only probes the backend's change token; the clipboard content is
+    read when the token changes (or on every poll if the backend has none).
+    A loop (see core.Core) calls step() and waits the delay it returns, which
+    a PollScheduler sets; wake() resets it, e.g. on a hotkey.
+    """
 
-    def __init__(self, history: ClipboardHistory):
+    def __init__(
+        self,
+        history: ClipboardHistory,
+        backend: ClipboardBackend | None = None,
+        scheduler: PollScheduler | None = None,
+    ):
         self._history = history
-        self._last_value: str | None = None
-        self._running = False
-        self._thread: threading.Thread | None = None
-
-    def start(self) -> None:
-        """Start monitoring the clipboard in a background thread."""
-        if self._running:
-            return
-
-        self._running = True
-        self._thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self._thread.start()
-
-    def stop(self) -> None:
-        """Stop monitoring the clipboard."""
-        self._running = False
-        if self._thread:
-            self._thread.join(timeout=2.0)
-            self._thread = None
-
-    def _monitor_loop(self) -> None:
-        """Main monitoring loop that polls clipboard for changes."""
-        # Initialize with current clipboard content
-        try:
-            self._last_value = pyperclip.paste()
-        except Exception:
-            self._last_value = None
+        self._backend = backend if backend is not None else default_backend()
+        self._scheduler = scheduler if scheduler is not None else PollScheduler()
+        self._last_value: ClipboardContent | None = None
+        self._last_token: int | None = None
+        self._polls = 0
+        self._hits = 0
+
+    def wake(self) -> None:
+        """Poll at the fastest rate for a while; the caller polls now."""
+        self._scheduler.reset()
+
+    def set_poll_intervals(self, min_interval: float, max_interval: float) -> None:
+        """Change the poll interval bounds, taking effect after the next poll."""
+        self._scheduler.set_intervals(min_interval, max_interval)
+
+    def stats(self) -> dict:
+        """Return poll counters: polls made, changes found, current interval."""
+        return {
+            "polls": self._polls,
+            "hits": self._hits,
+            "interval": self._scheduler.interval,
+        }
+
+    def poll(self) -> bool:
+        """Check the clipboard once. Returns True if a new value was added."""
+        self._polls += 1
+        token = self._backend.change_token()
+        if token is not None and token == self._last_token:
+            return False
+        self._last_token = token
 
-        while self._running:
-            try:
-                current_value = pyperclip.paste()
+        current_value = self._backend.read_content()
 
-                # Check if clipboard content has changed
-                if current_value and current_value != self._last_value:
-                    self._history.add(current_value)
-                    self._last_value = current_value
+        # Check if clipboard content has changed
+        if current_value and current_value != self._last_value:
+            self._history.add(current_value)
+            self._last_value = current_value
+            self._hits += 1
+            return True
+        return False
 
-            except Exception:
-                # Ignore clipboard access errors
-                pass
+    def prime(self) -> None:
+        """Take the current clipboard content as known, so it is not added as new."""
+        try:
+            self._last_token = self._backend.change_token()
+            self._last_value = self._backend.read_content()
+        except Exception:
+            self._last_value = None
 
-            time.sleep(POLL_INTERVAL_SECONDS)
+    def step(self) -> float:
+        """Poll once and return the seconds to wait before the next poll."""
+        try:
+            if self.poll():
+                self._scheduler.reset()
+        except Exception:
+            # Ignore clipboard access errors
+            pass
+        return self._scheduler.advance()
@@ -0,0 +1,472 @@
+"""Fuzzy search engine over clipboard history.
+
+Each item gets a search key computed once when it is added: whitespace
+collapsed, lowercased and capped at SEARCH_KEY_LENGTH characters, so queries
+never rescan the full text of long items. Large corpora are scored with
+rapidfuzz's multi-threaded process.cdist when numpy is available, and a query
+that extends the previous one re-scores only the items that can still match.
+
+Queries starting with ' (exact substring) or / (regular expression) are
+answered from a trigram index instead; see trigram.py.
+
+rapidfuzz and numpy are imported on the first search rather than with this
+module, which is on the app's startup path.
+"""
+
+from __future__ import annotations
+
+import functools
+import heapq
+from collections.abc import Callable, Sequence
+
+from .. import config
+from .item import HistoryItem
+from .trigram import TrigramIndex, compile_matcher, parse_query
+
+# Corpus size from which cdist (parallel scoring) is used instead of extract
+CDIST_MIN_ITEMS = 5000
+
+
+@functools.cache
+def _numpy():
+    """numpy, or None if not installed. Importing it takes about 100 ms."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def search_key(text: str, max_len: int | None = None) -> str:
+    """Normalize text for matching: collapse whitespace, lowercase, cap length."""
+    if max_len is None:
+        max_len = config.SEARCH_KEY_LENGTH
+    # Bound the work for huge items before splitting
+    return " ".join(text[: max_len * 2].split()).lower()[:max_len]
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query the same way as search keys, without the length cap."""
+    return " ".join(query.split()).lower()
+
+
+def _refine_cutoff(query_len: int) -> float:
+    """Lowest score that can still reach the threshold after one more character."""
+    if query_len == 0:
+        return 0.0
+    return max(0.0, (config.FUZZY_SCORE_THRESHOLD * (query_len + 1) - 200) / query_len)
+
+
+def _item_text(item: str | HistoryItem) -> str:
+    return item if isinstance(item, str) else item.text
+
+
+def _item_key(item: str | HistoryItem) -> str:
+    return search_key(_item_text(item))
+
+
+def filter_matches(
+    candidates: Sequence[str | HistoryItem],
+    predicate: Callable[[str], bool] | None,
+    limit: int | None = None,
+) -> list[str | HistoryItem]:
+    """Return the candidates whose text satisfies predicate, in order, up to limit."""
+    if predicate is None:
+        return []
+    matches = []
+    for item in candidates:
+        if predicate(_item_text(item)):
+            matches.append(item)
+            if limit is not None and len(matches) >= limit:
+                break
+    return matches
+
+
+def _score_all(query: str, keys: Sequence[str]) -> list[float]:
+    """Score query against every key, in key order.
+
+    Scores at or above _refine_cutoff() are exact. Lower ones are skipped by
+    rapidfuzz and reported as an upper bound just below the cutoff.
+    """
+    from rapidfuzz import fuzz, process
+
+    cutoff = _refine_cutoff(len(query))
+    floor = max(0.0, cutoff - 1e-6)
+    numpy = _numpy() if len(keys) >= CDIST_MIN_ITEMS else None
+    if numpy is not None:
+        scores = process.cdist(
+            [query],
+            keys,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=cutoff,
+            dtype=numpy.float32,
+            workers=-1,
+        )[0]
+        return numpy.maximum(scores, floor).tolist()
+    scores = [floor] * len(keys)
+    for _, score, index in process.extract(
+        query, keys, scorer=fuzz.partial_ratio, limit=None, score_cutoff=cutoff
+    ):
+        scores[index] = score
+    return scores
+
+
+class IncrementalSearch:
+    """Top-K fuzzy search that scores the corpus one chunk per step() call.
+
+    Lets a UI interleave a search over a large history with event handling
+    and abandon it as soon as the query changes. Results are ordered by
+    score, then by position in the corpus.
+
+    Given the scores of a previous query that the new one extends, only items
+    that could still reach the threshold are re-scored. Appending k characters
+    to a query of length L raises an item's partial_ratio by at most
+    (L * score + 200 * k) / (L + k), provided the item is longer than the new
+    query; shorter items are always re-scored. Items not re-scored keep that
+    bound, which stays below the threshold, so results are exact. A repeated
+    query reuses the previous scores as they are. A blank query matches every
+    item, like SearchSnapshot.search().
+    """
+
+    def __init__(
+        self,
+        query: str,
+        keys: Sequence[str],
+        items: Sequence[str],
+        limit: int | None,
+        chunk_size: int | None = 500,
+        prior: tuple[str, list[float]] | None = None,
+        on_complete: Callable[[str, list[float]], None] | None = None,
+    ):
+        self.query = normalize_query(query)
+        self._keys = keys
+        self._items = items
+        self._limit = limit if limit is not None else len(keys)
+        self._chunk_size = chunk_size or max(1, len(keys))
+        self._on_complete = on_complete
+        self._position = 0
+        self._top: list[tuple[float, int]] = []  # Min-heap of (score, -index)
+        # Per item: the exact score, or an upper bound below the threshold
+        self._scores: list[float] = []
+        self._prior = None
+        if prior is not None:
+            prior_query, prior_scores = prior
+            if (
+                prior_query
+                and self.query.startswith(prior_query)
+                and len(prior_scores) == len(keys)
+            ):
+                self._prior = (len(prior_query), prior_scores)
+
+    @property
+    def done(self) -> bool:
+        return self._position >= len(self._keys)
+
+    @property
+    def refined(self) -> bool:
+        """Whether this search re-scores only the survivors of a previous one."""
+        return self._prior is not None
+
+    def step(self) -> bool:
+        """Score the next chunk. Returns True once the whole corpus is scored."""
+        start = self._position
+        chunk = self._keys[start : start + self._chunk_size]
+        self._position += len(chunk)
+        if not self.query:
+            scores = [100.0] * len(chunk)
+        elif self._prior is None:
+            scores = _score_all(self.query, chunk)
+        else:
+            scores = self._refine(start, chunk)
+        self._scores.extend(scores)
+
+        for offset, score in enumerate(scores):
+            if score < config.FUZZY_SCORE_THRESHOLD:
+                continue
+            entry = (score, -(start + offset))
+            if len(self._top) < self._limit:
+                heapq.heappush(self._top, entry)
+            elif entry > self._top[0]:
+                heapq.heapreplace(self._top, entry)
+
+        if self.done and self._on_complete is not None:
+            self._on_complete(self.query, self._scores)
+        return self.done
+
+    def results(self) -> list[str]:
+        """Best matches found so far, best first."""
+        return [self._items[-neg_index] for _, neg_index in sorted(self._top, reverse=True)]
+
+    def _refine(self, start: int, chunk: Sequence[str]) -> list[float]:
+        prior_len, prior_scores = self._prior
+        prior_chunk = prior_scores[start : start + len(chunk)]
+        added = len(self.query) - prior_len
+        if added == 0:
+            return list(prior_chunk)  # Same query: the scores are still exact
+
+        bounds = [(prior_len * score + 200 * added) / (prior_len + added) for score in prior_chunk]
+        query_len = len(self.query)
+        candidates = [
+            i
+            for i, (bound, key) in enumerate(zip(bounds, chunk))
+            if bound >= config.FUZZY_SCORE_THRESHOLD or len(key) <= query_len
+        ]
+        if len(candidates) > len(chunk) // 2:
+            return _score_all(self.query, chunk)  # Pruning would not pay off
+        rescored = _score_all(self.query, [chunk[i] for i in candidates])
+        for i, score in zip(candidates, rescored):
+            bounds[i] = score
+        return bounds
+
+
+class MatchSearch:
+    """Exact or regex search over index candidates, with IncrementalSearch's interface.
+
+    Candidates are checked newest first, chunk_size per step() call, until
+    limit matches are found.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        candidates: Sequence[str | HistoryItem],
+        predicate: Callable[[str], bool] | None,
+        limit: int | None,
+        chunk_size: int | None = 500,
+    ):
+        self.query = query
+        self._candidates = candidates if predicate is not None else ()
+        self._predicate = predicate
+        self._limit = limit
+        self._chunk_size = chunk_size or max(1, len(candidates))
+        self._position = 0
+        self._matches: list[str | HistoryItem] = []
+
+    @property
+    def done(self) -> bool:
+        return self._position >= len(self._candidates) or (
+            self._limit is not None and len(self._matches) >= self._limit
+        )
+
+    @property
+    def refined(self) -> bool:
+        return False
+
+    def step(self) -> bool:
+        """Check the next chunk. Returns True once done."""
+        start = self._position
+        chunk = self._candidates[start : start + self._chunk_size]
+        self._position += len(chunk)
+        remaining = None if self._limit is None else self._limit - len(self._matches)
+        self._matches.extend(filter_matches(chunk, self._predicate, remaining))
+        return self.done
+
+    def results(self) -> list[str | HistoryItem]:
+        """Matches found so far, newest first."""
+        return list(self._matches)
+
+
+class SearchSnapshot:
+    """Immutable view of a SearchEngine's corpus at one point in time.
+
+    Searching a snapshot needs no lock: later mutations of the engine build
+    new corpus tuples instead of changing these. Scores of a completed query
+    are handed back to the engine only if it has not changed since.
+    """
+
+    def __init__(
+        self,
+        engine: SearchEngine,
+        keys: tuple[str, ...],
+        items: tuple[str | HistoryItem, ...],
+        version: int,
+        settings: tuple[int, float],
+    ):
+        self._engine = engine
+        self.keys = keys  # Newest first
+        self.items = items
+        self.version = version
+        self.settings = settings
+
+    @property
+    def stale(self) -> bool:
+        """Whether the key length or threshold setting changed since it was taken."""
+        return self.settings != (config.SEARCH_KEY_LENGTH, config.FUZZY_SCORE_THRESHOLD)
+
+    def search(self, query: str, limit: int | None = None, refine: bool = True) -> list[str]:
+        """Return matching items, best first (newest first when tied).
+
+        With refine=False the previous query's scores are not reused.
+        """
+        if not query or not query.strip():
+            return list(self.items[:limit])
+        search = self.incremental(query, limit, chunk_size=None, refine=refine)
+        search.step()
+        return search.results()
+
+    def incremental(
+        self,
+        query: str,
+        limit: int | None,
+        chunk_size: int | None = 500,
+        refine: bool = True,
+    ) -> IncrementalSearch:
+        """Start a search that is advanced chunk by chunk by the caller."""
+        engine = self._engine
+        version = self.version
+        prior = None
+        last = engine._last_scores
+        if refine and last is not None and last[0] == version:
+            prior = last[1:]
+
+        def remember(completed_query: str, scores: list[float]) -> None:
+            if version == engine._version:
+                engine._last_scores = (version, completed_query, scores)
+
+        return IncrementalSearch(
+            query,
+            self.keys,
+            self.items,
+            limit,
+            chunk_size,
+            prior=prior,
+            on_complete=remember,
+        )
+
+
+class SearchEngine:
+    """Fuzzy search over history items, keyed by item ID.
+
+    Search keys are maintained incrementally with add() and remove(); the
+    newest-first corpus tuples are rebuilt lazily after a mutation, which is
+    cheap compared to normalizing the items again. snapshot() returns them
+    as a SearchSnapshot that can be searched while the engine changes. The
+    scores of the last completed query are kept so that a query extending it
+    only re-scores candidates; any mutation drops them. Keys are recomputed
+    and scores dropped when the key length or threshold setting changes.
+
+    Exact and regex queries are looked up in a trigram index kept up to date
+    by the same add() and remove() calls.
+    """
+
+    def __init__(self):
+        # ID -> (key, item), oldest first
+        self._entries: dict[str, tuple[str, str | HistoryItem]] = {}
+        self._index = TrigramIndex()
+        self._sequence: dict[str, int] = {}  # ID -> position, higher is newer
+        self._next_sequence = 0
+        self._snapshot: SearchSnapshot | None = None
+        self._version = 0  # Bumped on every mutation
+        # (version, query, scores) of the last completed query
+        self._last_scores: tuple[int, str, list[float]] | None = None
+        self._settings = (config.SEARCH_KEY_LENGTH, config.FUZZY_SCORE_THRESHOLD)
+
+    def add(self, key_id: str, item: str | HistoryItem) -> None:
+        """Add an item, or move an existing one to the newest position.
+
+        A new item for an existing ID replaces the old one, e.g. rich text
+        copied again as plain text. Spilled items are matched on their
+        in-memory prefix.
+        """
+        entry = self._entries.pop(key_id, None)
+        if entry is None:
+            entry = (_item_key(item), item)
+            self._index.add(key_id, _item_text(item))
+        elif entry[1] is not item:
+            text = _item_text(item)
+            if text != _item_text(entry[1]):
+                self._index.remove(key_id)
+                self._index.add(key_id, text)
+                entry = (_item_key(item), item)
+            else:
+                entry = (entry[0], item)
+        self._entries[key_id] = entry
+        self._sequence[key_id] = self._next_sequence
+        self._next_sequence += 1
+        self._invalidate()
+
+    def remove(self, key_id: str) -> None:
+        """Remove an item if present."""
+        if self._entries.pop(key_id, None) is not None:
+            self._index.remove(key_id)
+            del self._sequence[key_id]
+            self._invalidate()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+        self._sequence.clear()
+        self._invalidate()
+
+    def lookup(
+        self, query: str
+    ) -> tuple[Sequence[str | HistoryItem], Callable[[str], bool] | None]:
+        """For an exact or regex query, return the candidate items and their test.
+
+        Candidates are newest first; only those passing the test (see
+        filter_matches()) match. The test is None for an invalid regex.
+        """
+        mode, text = parse_query(query)
+        predicate, literals = compile_matcher(mode, text)
+        if predicate is None:
+            return (), None
+        ids = self._index.candidates(literals)
+        if ids is None:
+            return self.snapshot().items, predicate
+        ids = sorted(ids, key=self._sequence.__getitem__, reverse=True)
+        return [self._entries[key_id][1] for key_id in ids], predicate
+
+    def snapshot(self) -> SearchSnapshot:
+        """Return the current corpus, rebuilding it if it changed since the last call."""
+        settings = (config.SEARCH_KEY_LENGTH, config.FUZZY_SCORE_THRESHOLD)
+        if settings != self._settings:
+            if settings[0] != self._settings[0]:
+                for key_id, (_, item) in self._entries.items():
+                    self._entries[key_id] = (_item_key(item), item)
+            self._settings = settings
+            self._invalidate()
+        if self._snapshot is None:
+            entries = tuple(reversed(self._entries.values()))
+            self._snapshot = SearchSnapshot(
+                self,
+                tuple(key for key, _ in entries),
+                tuple(item for _, item in entries),
+                self._version,
+                settings,
+            )
+        return self._snapshot
+
+    def search(self, query: str, limit: int | None = None, refine: bool = True) -> list[str]:
+        """Return matching items, best first (newest first when tied).
+
+        With refine=False the previous query's scores are not reused. Exact
+        and regex matches are ordered newest first.
+        """
+        if parse_query(query)[0] != "fuzzy":
+            candidates, predicate = self.lookup(query)
+            return filter_matches(candidates, predicate, limit)
+        return self.snapshot().search(query, limit, refine)
+
+    def incremental(
+        self,
+        query: str,
+        limit: int | None,
+        chunk_size: int | None = 500,
+        refine: bool = True,
+    ) -> IncrementalSearch | MatchSearch:
+        """Start a search that is advanced chunk by chunk by the caller."""
+        if parse_query(query)[0] != "fuzzy":
+            candidates, predicate = self.lookup(query)
+            return MatchSearch(query, candidates, predicate, limit, chunk_size)
+        return self.snapshot().incremental(query, limit, chunk_size, refine)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key_id: str) -> bool:
+        return key_id in self._entries
+
+    def _invalidate(self) -> None:
+        self._snapshot = None
+        self._version += 1
+        self._last_scores = None
@@ -0,0 +1,272 @@
+"""Compressed binary snapshot format for clipboard history.
+
+Layout (little-endian):
+
+    header      magic "MYCLIPHS", format version (u16), codec (u8), reserved (u8),
+                item count (u32), dictionary size (u32)
+    dictionary  compression dictionary trained on the items, may be empty
+    index       one fixed-size record per item, newest first: item ID (16 bytes),
+                payload offset (u64), payload length (u32), text size in bytes
+                (u64), line count (u32), display line length (u16), flags (u8),
+                whose bits 3-4 hold the kind of item (text if 0)
+    payloads    each item's UTF-8 display line (unless the same as the text)
+                followed by its text, compressed on its own
+
+Items are compressed one by one against the shared dictionary, so reading the
+newest N items only decompresses those. zstd (Python 3.14's compression.zstd)
+is used when available, zlib otherwise; both use a dictionary built from the
+history itself, which is what makes compressing short items worthwhile.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from . import durable
+from .content import KIND_FILES, KIND_IMAGE, KIND_RTF, KIND_TEXT
+from .item import HistoryItem
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+MAGIC = b"MYCLIPHS"
+VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+FLAG_SPILLED = 1
+FLAG_COMPRESSED = 2
+FLAG_LINE_IS_TEXT = 4
+KIND_SHIFT = 3
+KIND_MASK = 3 << KIND_SHIFT
+KINDS = (KIND_TEXT, KIND_IMAGE, KIND_RTF, KIND_FILES)  # By their code in the flags
+
+HEADER = struct.Struct("<8sHBBII")
+INDEX_ENTRY = struct.Struct("<16sQIQIHB")
+
+# Dictionary training: sample at most this many items, this much of each
+DICT_SIZE = 16 * 1024
+DICT_SAMPLES = 1000
+DICT_SAMPLE_BYTES = 4096
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+
+class SnapshotError(Exception):
+    """The snapshot file is not in a format this version can read."""
+
+
+def default_codec() -> int:
+    return CODEC_ZSTD if zstd is not None else CODEC_ZLIB
+
+
+def _train_dict(codec: int, samples: list[bytes]) -> bytes:
+    if codec == CODEC_ZSTD:
+        try:
+            return zstd.train_dict(samples, DICT_SIZE).dict_content
+        except Exception:
+            return b""  # Too few or too small samples to train on
+    if codec == CODEC_ZLIB:
+        # zlib has no trainer; it finds matches in a preset dictionary and
+        # prefers its end, so put the newest samples last.
+        return b"".join(reversed(samples))[-DICT_SIZE:]
+    return b""
+
+
+class _Codec:
+    """Per-item compression against a shared dictionary."""
+
+    def __init__(self, codec: int, dictionary: bytes):
+        if codec == CODEC_ZSTD and zstd is None:
+            raise SnapshotError("Snapshot is zstd-compressed, which this Python lacks")
+        if codec not in (CODEC_NONE, CODEC_ZLIB, CODEC_ZSTD):
+            raise SnapshotError(f"Unknown snapshot codec {codec}")
+        self._codec = codec
+        self._dictionary = dictionary
+        self._zstd_dict = None
+        if codec == CODEC_ZSTD and dictionary:
+            self._zstd_dict = zstd.ZstdDict(dictionary)
+        # Copying a primed zlib decompressor is cheaper than loading the dictionary again
+        self._zlib_decompressor = None
+        if codec == CODEC_ZLIB:
+            if dictionary:
+                self._zlib_decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=dictionary)
+            else:
+                self._zlib_decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._codec == CODEC_ZSTD:
+            return zstd.compress(data, level=ZSTD_LEVEL, zstd_dict=self._zstd_dict)
+        if self._codec == CODEC_ZLIB:
+            if self._dictionary:
+                compressor = zlib.compressobj(
+                    ZLIB_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=self._dictionary
+                )
+            else:
+                compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+            return compressor.compress(data) + compressor.flush()
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._codec == CODEC_ZSTD:
+            return zstd.decompress(data, zstd_dict=self._zstd_dict)
+        if self._codec == CODEC_ZLIB:
+            decompressor = self._zlib_decompressor.copy()
+            return decompressor.decompress(data) + decompressor.flush()
+        return data
+
+
+def write(path: Path, items: list[HistoryItem], codec: int | None = None) -> None:
+    """Write items (newest first) atomically and durably via a temp file and rename."""
+    durable.replace(write_temp(path, items, codec), path)
+
+
+def write_temp(path: Path, items: list[HistoryItem], codec: int | None = None) -> Path:
+    """Write items (newest first) to a synced temp file next to path, and return it.
+
+    Renaming it to path is left to the caller (see durable.replace()), e.g.
+    to do so under a lock.
+    """
+    if codec is None:
+        codec = default_codec()
+    texts = [item.text.encode("utf-8", "surrogatepass") for item in items]
+    dictionary = _train_dict(codec, [data[:DICT_SAMPLE_BYTES] for data in texts[:DICT_SAMPLES]])
+    compressor = _Codec(codec, dictionary)
+
+    data_start = HEADER.size + len(dictionary) + INDEX_ENTRY.size * len(items)
+    index = []
+    payloads = []
+    offset = data_start
+    for item, data in zip(items, texts):
+        flags = FLAG_SPILLED if item.spilled else 0
+        flags |= KINDS.index(item.kind) << KIND_SHIFT
+        if item.line == item.text:
+            flags |= FLAG_LINE_IS_TEXT
+            line = b""
+        else:
+            line = item.line.encode("utf-8", "surrogatepass")
+            data = line + data
+        payload = compressor.compress(data)
+        if len(payload) < len(data):
+            flags |= FLAG_COMPRESSED
+        else:
+            payload = data  # Incompressible, e.g. very short
+        index.append(
+            INDEX_ENTRY.pack(
+                bytes.fromhex(item.key),
+                offset,
+                len(payload),
+                item.size,
+                item.lines,
+                len(line),
+                flags,
+            )
+        )
+        payloads.append(payload)
+        offset += len(payload)
+
+    tmp = durable.temp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, codec, 0, len(items), len(dictionary)))
+        f.write(dictionary)
+        f.writelines(index)
+        f.writelines(payloads)
+        f.flush()
+        durable.fsync(f.fileno())
+    return tmp
+
+
+class SnapshotReader:
+    """Random access to the items of a snapshot through a memory map.
+
+    Opening only parses the header; an item is decoded when it is requested,
+    so the cost of showing the newest few does not grow with the history.
+    Mapped pages are shared with other processes through the page cache.
+    Raises SnapshotError if the file is not a snapshot of a known version.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size < HEADER.size:
+                raise SnapshotError("Truncated snapshot header")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, codec, _, count, dict_size = HEADER.unpack_from(self._map)
+            if magic != MAGIC:
+                raise SnapshotError("Not a history snapshot")
+            if version != VERSION:
+                raise SnapshotError(f"Unsupported snapshot version {version}")
+            self._index_start = HEADER.size + dict_size
+            if file_size < self._index_start + INDEX_ENTRY.size * count:
+                raise SnapshotError("Truncated snapshot index")
+            self._count = count
+            self._codec = _Codec(codec, self._map[HEADER.size : self._index_start])
+            if count:
+                _, offset, length, *_ = self._entry(count - 1)
+                if file_size < offset + length:
+                    raise SnapshotError("Truncated snapshot data")
+        except BaseException:
+            self._map.close()
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def key(self, index: int) -> bytes:
+        """Return the raw 16-byte item ID of the item at index, without decoding it."""
+        start = self._index_start + INDEX_ENTRY.size * index
+        return self._map[start : start + 16]
+
+    def item(self, index: int) -> HistoryItem:
+        """Decode the item at index (0 is the newest)."""
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        digest, offset, length, size, lines, line_length, flags = self._entry(index)
+        with memoryview(self._map) as view:
+            payload = view[offset : offset + length]
+            if flags & FLAG_COMPRESSED:
+                payload = self._codec.decompress(payload)
+            text = str(payload[line_length:], "utf-8", "surrogatepass")
+            if flags & FLAG_LINE_IS_TEXT:
+                line = text
+            else:
+                line = str(payload[:line_length], "utf-8", "surrogatepass")
+            if isinstance(payload, memoryview):
+                payload.release()
+        return HistoryItem(
+            digest.hex(),
+            text,
+            line,
+            lines,
+            size,
+            spilled=bool(flags & FLAG_SPILLED),
+            kind=KINDS[(flags & KIND_MASK) >> KIND_SHIFT],
+        )
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _entry(self, index: int) -> tuple:
+        return INDEX_ENTRY.unpack_from(self._map, self._index_start + INDEX_ENTRY.size * index)
+
+
+def read(path: Path, limit: int | None = None) -> list[HistoryItem]:
+    """Read the newest limit items (all by default), newest first.
+
+    Raises SnapshotError if the file is not a snapshot of a known version.
+    """
+    reader = SnapshotReader(path)
+    try:
+        count = len(reader) if limit is None else min(len(reader), limit)
+        return [reader.item(index) for index in range(count)]
+    finally:
+        reader.close()
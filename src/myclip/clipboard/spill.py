@@ -0,0 +1,60 @@
+"""Spill files for large clipboard history items.
+
+Items larger than max_item_bytes are written to a file named by their item ID.
+Memory, the journal and the snapshot then hold only the first
+SPILL_PREFIX_CHARS characters, enough to build search keys and previews; the
+full text is read back only when needed, e.g. when the item is pasted.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+from . import durable
+
+log = logging.getLogger(__name__)
+
+# Storage location, one file per spilled item
+SPILL_DIR = Path(os.path.expanduser("~/.myclip_spill"))
+
+# Characters of a spilled item kept in memory
+SPILL_PREFIX_CHARS = 4096
+
+
+def write(key: str, text: str) -> None:
+    """Write text to its spill file, unless already there."""
+    path = SPILL_DIR / key
+    if path.exists():
+        return
+    SPILL_DIR.mkdir(parents=True, exist_ok=True)
+    durable.write_bytes(path, text.encode("utf-8", "surrogatepass"))
+
+
+def read(key: str) -> str | None:
+    """Read the full text of a spilled item, or None if its file is gone."""
+    try:
+        return (SPILL_DIR / key).read_bytes().decode("utf-8", "surrogatepass")
+    except OSError as e:
+        log.warning(f"Failed to read spilled item {key}: {e}")
+        return None
+
+
+def discard(key: str) -> None:
+    """Remove the spill file of an item, if any."""
+    try:
+        (SPILL_DIR / key).unlink(missing_ok=True)
+    except OSError as e:
+        log.warning(f"Failed to remove spilled item {key}: {e}")
+
+
+def prune(keep: Iterable[str]) -> None:
+    """Remove spill files of items no longer in history."""
+    if not SPILL_DIR.exists():
+        return
+    keep = set(keep)
+    for path in SPILL_DIR.iterdir():
+        if path.name not in keep:
+            discard(path.name)
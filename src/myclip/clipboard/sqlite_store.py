@@ -0,0 +1,217 @@
+"""SQLite-backed clipboard history with an FTS5 trigram index.
+
+Selected with ``backend = "sqlite"`` in the ``[clipboard]`` config section.
+Items live in one table keyed by a content digest, ordered by a recency
+sequence; an external-content FTS5 table indexes their text so searches
+narrow candidates before fuzzy ranking. The database runs in WAL mode, so the
+popup process can read while the main process writes.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from .digest import digest
+
+# Storage location
+DB_FILE = Path(os.path.expanduser("~/.myclip_history.db"))
+
+# Candidate limits for search: FTS hits plus the most recent items, so fuzzy
+# matches that share no trigram with the query are still found among recent
+# ones. Older items are only found through the index.
+FTS_CANDIDATES = 1000
+RECENT_CANDIDATES = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    digest BLOB NOT NULL UNIQUE,
+    seq INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_seq ON items(seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    text, content='items', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def connect(path: Path | None = None) -> sqlite3.Connection:
+    """Open the history database (DB_FILE by default), creating the schema if needed."""
+    if path is None:
+        path = DB_FILE
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _fts_query(query: str) -> str | None:
+    """Build an FTS5 query matching any query word as a substring.
+
+    The trigram tokenizer cannot match terms shorter than three characters.
+    """
+    terms = [word for word in query.split() if len(word) >= 3]
+    if not terms:
+        return None
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+class SqliteStore:
+    """History storage on SQLite with indexed dedup, trim and search."""
+
+    def __init__(self, max_items: int, path: Path | None = None):
+        self._max_items = max_items
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._count = self._conn.execute("SELECT count(*) FROM items").fetchone()[0]
+        self._data_version = self._get_data_version()
+
+    def import_items(self, items: list[str]) -> None:
+        """Bulk-load items (newest first), e.g. when migrating from the JSON store."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for seq, text in enumerate(reversed(items[: self._max_items]), start=1):
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO items(digest, seq, text) VALUES (?, ?, ?)",
+                        (digest(text), seq, text),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._count = self._conn.execute("SELECT count(*) FROM items").fetchone()[0]
+
+    def add(self, text: str) -> None:
+        """Insert an item or move an existing one to the front, then trim."""
+        key = digest(text)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM items"
+                ).fetchone()[0]
+                cur = self._conn.execute("UPDATE items SET seq = ? WHERE digest = ?", (seq, key))
+                if cur.rowcount == 0:
+                    self._conn.execute(
+                        "INSERT INTO items(digest, seq, text) VALUES (?, ?, ?)", (key, seq, text)
+                    )
+                    self._trim()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._data_version = self._get_data_version()
+
+    def set_max_items(self, max_items: int) -> None:
+        """Change the history limit, dropping the oldest items beyond it."""
+        with self._lock:
+            self._max_items = max_items
+            self._conn.execute(
+                "DELETE FROM items WHERE id IN "
+                "(SELECT id FROM items ORDER BY seq DESC LIMIT -1 OFFSET ?)",
+                (max_items,),
+            )
+            self._count = self._conn.execute("SELECT count(*) FROM items").fetchone()[0]
+
+    def delete(self, item_id: str) -> bool:
+        """Delete an item by ID. Returns True if it existed."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM items WHERE digest = ?", (bytes.fromhex(item_id),)
+            )
+            if cur.rowcount:
+                self._count -= 1
+            return cur.rowcount > 0
+
+    def recent(self, limit: int | None = None) -> list[str]:
+        """Return items newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text FROM items ORDER BY seq DESC LIMIT ?",
+                (-1 if limit is None else limit,),
+            ).fetchall()
+        return [text for (text,) in rows]
+
+    def candidates(self, query: str) -> list[str]:
+        """Return items worth fuzzy-scoring for a query: FTS hits plus recent items.
+
+        Unlike a full scan, this misses fuzzy matches beyond the
+        RECENT_CANDIDATES most recent items that contain no query word of
+        three or more characters, e.g. a misspelling of one of their words.
+        """
+        match = _fts_query(query)
+        with self._lock:
+            rows = []
+            if match is not None:
+                rows = self._conn.execute(
+                    "SELECT items.text FROM items_fts JOIN items ON items.id = items_fts.rowid "
+                    "WHERE items_fts MATCH ? ORDER BY items.seq DESC LIMIT ?",
+                    (match, FTS_CANDIDATES),
+                ).fetchall()
+            rows += self._conn.execute(
+                "SELECT text FROM items ORDER BY seq DESC LIMIT ?", (RECENT_CANDIDATES,)
+            ).fetchall()
+        return list(dict.fromkeys(text for (text,) in rows))
+
+    def clear(self) -> None:
+        """Delete all items."""
+        with self._lock:
+            self._conn.execute("DELETE FROM items")
+            self._count = 0
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM items").fetchone()[0]
+
+    def _get_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _trim(self) -> None:
+        """Drop the oldest items beyond max_items. Called inside a transaction."""
+        if self._get_data_version() != self._data_version:
+            # Another process (the popup) changed the table; recount
+            self._count = self._conn.execute("SELECT count(*) FROM items").fetchone()[0]
+        else:
+            self._count += 1
+        excess = self._count - self._max_items
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM items WHERE id IN (SELECT id FROM items ORDER BY seq LIMIT ?)",
+                (excess,),
+            )
+            self._count = self._max_items
+
+
+def load_items(limit: int | None = None) -> list[str]:
+    """Load items newest first (for use in subprocess)."""
+    store = SqliteStore(max_items=0)
+    try:
+        return store.recent(limit)
+    finally:
+        store.close()
+
+
+def delete_item(item_id: str) -> bool:
+    """Delete an item by ID (for use in subprocess)."""
+    store = SqliteStore(max_items=0)
+    try:
+        return store.delete(item_id)
+    finally:
+        store.close()
@@ -0,0 +1,201 @@
+"""Trigram index for exact substring and regex search.
+
+A query starting with EXACT_PREFIX matches items containing the rest of it;
+one starting with REGEX_PREFIX matches items the rest matches as a regular
+expression. Both ignore case. The index maps every three-character substring
+of an item's (case-folded) text to the items containing it, so a lookup only
+checks the items that contain all trigrams of the substring, or of the
+literal runs a regex requires.
+
+Only the first INDEX_MAX_CHARS characters of an item are indexed, which
+bounds the memory of the index; longer items are always checked. Items are
+indexed on the first lookup after they were added, so adding stays cheap
+for users who never search by substring.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable
+
+EXACT_PREFIX = "'"
+REGEX_PREFIX = "/"
+
+# Characters of each item that are indexed
+INDEX_MAX_CHARS = 4096
+
+# Regex characters that end a literal run, and those that make the preceding
+# character optional or repeatable
+_REGEX_SPECIAL = set(".^$*+?{}[]()|\\")
+_REGEX_QUANTIFIERS = set("*?{")
+
+
+def parse_query(query: str) -> tuple[str, str]:
+    """Split a query into its mode ("fuzzy", "exact" or "regex") and its text."""
+    if query.startswith(EXACT_PREFIX):
+        return "exact", query[len(EXACT_PREFIX) :]
+    if query.startswith(REGEX_PREFIX):
+        return "regex", query[len(REGEX_PREFIX) :]
+    return "fuzzy", query
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the trigrams of text, which must already be case-folded."""
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def required_literals(pattern: str) -> list[str]:
+    """Return ASCII literal runs that every match of pattern must contain.
+
+    Conservative: groups, character classes and anything after a top-level
+    alternation give no literals, so the result may be empty but never
+    contains a run a match could lack.
+    """
+    if "|" in pattern or "(?" in pattern:
+        return []  # Alternations, and inline flags such as verbose mode
+    runs = []
+    run = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char in _REGEX_QUANTIFIERS or char == "+":
+            # The previous character may be absent (or repeated, for +)
+            if char != "+":
+                run = run[:-1]
+            runs.append(run)
+            run = ""
+            if char == "{":
+                end = pattern.find("}", i)
+                i = len(pattern) if end < 0 else end
+        elif char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 1
+            if escaped.isascii() and not escaped.isalnum():
+                run += escaped
+            else:
+                runs.append(run)  # A class like \d, or a backreference
+                run = ""
+        elif char in "([":
+            runs.append(run)
+            run = ""
+            i = _skip_group(pattern, i)
+        elif char in _REGEX_SPECIAL or not char.isascii():
+            runs.append(run)
+            run = ""
+        else:
+            run += char
+        i += 1
+    runs.append(run)
+    return [run.casefold() for run in runs if len(run) >= 3]
+
+
+def _skip_group(pattern: str, start: int) -> int:
+    """Return the index of the bracket closing the group or class opened at start."""
+    if pattern[start] == "[":
+        i = start + 1
+        if pattern[i : i + 1] == "^":
+            i += 1
+        i += 1  # A "]" right after the opening bracket is a literal
+        while i < len(pattern) and pattern[i] != "]":
+            i += 2 if pattern[i] == "\\" else 1
+        return i
+    depth = 0
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(pattern)
+
+
+class TrigramIndex:
+    """Incrementally maintained trigram -> item ID postings."""
+
+    def __init__(self):
+        self._postings: dict[str, set[str]] = {}
+        self._item_trigrams: dict[str, set[str]] = {}
+        self._unindexed: set[str] = set()  # Items longer than INDEX_MAX_CHARS
+        self._pending: dict[str, str] = {}  # Added since the last lookup
+
+    def add(self, key_id: str, text: str) -> None:
+        """Queue an item's text for indexing, unless already indexed."""
+        if key_id not in self._item_trigrams:
+            self._pending[key_id] = text
+
+    def _index(self, key_id: str, text: str) -> None:
+        if key_id in self._item_trigrams:
+            return
+        item_trigrams = trigrams(text[:INDEX_MAX_CHARS].casefold())
+        self._item_trigrams[key_id] = item_trigrams
+        for trigram in item_trigrams:
+            postings = self._postings.get(trigram)
+            if postings is None:
+                self._postings[trigram] = {key_id}
+            else:
+                postings.add(key_id)
+        if len(text) > INDEX_MAX_CHARS:
+            self._unindexed.add(key_id)
+
+    def remove(self, key_id: str) -> None:
+        """Remove an item from the index if present."""
+        if self._pending.pop(key_id, None) is not None:
+            return
+        item_trigrams = self._item_trigrams.pop(key_id, None)
+        if item_trigrams is None:
+            return
+        for trigram in item_trigrams:
+            postings = self._postings[trigram]
+            postings.discard(key_id)
+            if not postings:
+                del self._postings[trigram]
+        self._unindexed.discard(key_id)
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._item_trigrams.clear()
+        self._unindexed.clear()
+        self._pending.clear()
+
+    def candidates(self, literals: Iterable[str]) -> set[str] | None:
+        """Return the IDs of items that may contain all literals (case-folded).
+
+        None means the literals are too short to narrow the search, so every
+        item is a candidate.
+        """
+        needed = set()
+        for literal in literals:
+            needed |= trigrams(literal)
+        if not needed:
+            return None
+        pending, self._pending = self._pending, {}
+        for key_id, text in pending.items():
+            self._index(key_id, text)
+        postings = sorted((self._postings.get(t, set()) for t in needed), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result | self._unindexed
+
+
+def compile_matcher(mode: str, text: str):
+    """Return a predicate on item text for an exact or regex query, and its literals.
+
+    The predicate is None for an invalid regex, which matches nothing.
+    """
+    if mode == "exact":
+        needle = text.casefold()
+        return (lambda haystack: needle in haystack.casefold()), [needle]
+    try:
+        regex = re.compile(text, re.IGNORECASE)
+    except re.error:
+        return None, []
+    return (lambda haystack: regex.search(haystack) is not None), required_literals(text)
@@ -1,22 +1,82 @@
 """Configuration constants for MyClip.
 
 Values are loaded from ~/.config/myclip/config.toml with fallback defaults.
+reload() refreshes them in place whenever the file changes, so code that
+should follow live changes reads them as ``config.NAME`` at use time. The
+file is read when the first setting is, not on import.
 """
 
+from pathlib import Path
+
 from . import user_config
 
-# Clipboard monitoring
-POLL_INTERVAL_SECONDS = user_config.get("clipboard", "poll_interval", 1.0)
-MAX_HISTORY_ITEMS = user_config.get("clipboard", "max_history_items", 100)
+# Trace records go next to the app log unless [trace] path says otherwise
+DEFAULT_TRACE_PATH = Path.home() / "Library/Logs/MyClip.trace.jsonl"
+
+_loaded = False
+
+
+def reload(_config: dict | None = None) -> None:
+    """Refresh the settings below from the (cached) user config."""
+    global MIN_POLL_INTERVAL_SECONDS, MAX_POLL_INTERVAL_SECONDS, MAX_HISTORY_ITEMS
+    global MAX_TOTAL_BYTES, MAX_ITEM_BYTES, FLUSH_INTERVAL_MS
+    global HISTORY_BACKEND, POPUP_WIDTH, POPUP_HEIGHT, ITEM_PREVIEW_LENGTH
+    global FUZZY_SCORE_THRESHOLD, SEARCH_KEY_LENGTH, HOTKEY_MODIFIERS, HOTKEY_KEY
+    global ARCHIVE_ENABLED, ARCHIVE_MAX_AGE_DAYS, ARCHIVE_MAX_BYTES
+    global TRACE_ENABLED, TRACE_PATH, _loaded
+
+    # Clipboard monitoring
+    # Poll quickly after activity, backing off to the maximum while idle. The
+    # minimum falls back to the single poll_interval of older config files,
+    # unless it is the 1.0 they were all created with.
+    legacy_poll_interval = user_config.get("clipboard", "poll_interval", 1.0)
+    MIN_POLL_INTERVAL_SECONDS = user_config.get(
+        "clipboard",
+        "min_poll_interval",
+        0.05 if legacy_poll_interval == 1.0 else legacy_poll_interval,
+    )
+    MAX_POLL_INTERVAL_SECONDS = user_config.get("clipboard", "max_poll_interval", 1.0)
+    MAX_HISTORY_ITEMS = user_config.get("clipboard", "max_history_items", 100)
+    # Byte budget for the whole history; larger items are kept on disk, not in memory
+    MAX_TOTAL_BYTES = user_config.get("clipboard", "max_total_bytes", 100 * 1024 * 1024)
+    MAX_ITEM_BYTES = user_config.get("clipboard", "max_item_bytes", 64 * 1024)
+    HISTORY_BACKEND = user_config.get("clipboard", "backend", "json")
+    # History changes are written to disk in batches at most this often
+    FLUSH_INTERVAL_MS = user_config.get("clipboard", "flush_interval_ms", 200)
+
+    # Archive of items dropped from history, searched when history has too few
+    # matches; 0 disables the age or size limit
+    ARCHIVE_ENABLED = user_config.get("archive", "enabled", True)
+    ARCHIVE_MAX_AGE_DAYS = user_config.get("archive", "max_age_days", 0)
+    ARCHIVE_MAX_BYTES = user_config.get("archive", "max_bytes", 1024 * 1024 * 1024)
+
+    # UI settings
+    POPUP_WIDTH = user_config.get("popup", "width", 650)
+    POPUP_HEIGHT = user_config.get("popup", "height", 400)
+    ITEM_PREVIEW_LENGTH = user_config.get("popup", "item_preview_length", 80)
+
+    # Search settings
+    FUZZY_SCORE_THRESHOLD = user_config.get("search", "fuzzy_score_threshold", 60)
+    SEARCH_KEY_LENGTH = user_config.get("search", "key_length", 256)
+
+    # Tracing of popup latency and history operations (see trace.py)
+    TRACE_ENABLED = user_config.get("trace", "enabled", True)
+    TRACE_PATH = Path(user_config.get("trace", "path", "") or DEFAULT_TRACE_PATH).expanduser()
+
+    # Hotkey settings
+    HOTKEY_MODIFIERS = user_config.get("hotkey", "modifiers", "cmd+ctrl")
+    HOTKEY_KEY = user_config.get("hotkey", "key", "p")
+    _loaded = True
+
 
-# UI settings
-POPUP_WIDTH = user_config.get("popup", "width", 650)
-POPUP_HEIGHT = user_config.get("popup", "height", 400)
-ITEM_PREVIEW_LENGTH = user_config.get("popup", "item_preview_length", 80)
+def __getattr__(name: str):
+    # Only called for names not set yet, i.e. before the first reload()
+    if not _loaded:
+        reload()
+        if name in globals():
+            return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Search settings
-FUZZY_SCORE_THRESHOLD = user_config.get("search", "fuzzy_score_threshold", 60)
 
-# Hotkey settings
-HOTKEY_MODIFIERS = user_config.get("hotkey", "modifiers", "cmd+ctrl")
-HOTKEY_KEY = user_config.get("hotkey", "key", "p")
+# Registered first, so other subscribers already see the new values
+user_config.subscribe(reload)
@@ -0,0 +1,280 @@
+"""Event loop that owns the app's background work.
+
+One asyncio loop, running in its own thread next to the macOS main thread,
+polls the clipboard, schedules history flushes, watches the config file and
+talks to the popup worker. Hotkey presses and menu clicks are handed to it
+from their threads. Blocking clipboard, disk and process work runs on a
+single I/O thread, so it never holds up the loop and is done in order: a
+poll before the flush that follows it, everything before stop() returns.
+
+Nothing here needs macOS: with a fake clipboard backend, popup and hotkey
+source the core runs headless, e.g. in tests on Linux.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config, trace, user_config
+from .clipboard.backends import ClipboardBackend
+from .clipboard.history import ClipboardHistory
+from .clipboard.monitor import ClipboardMonitor, PollScheduler
+
+log = logging.getLogger(__name__)
+
+# Seconds between checks of the config file for changes
+CONFIG_CHECK_INTERVAL = 2.0
+
+
+class PopupWorker:
+    """Warm popup process, hidden until told to show over its stdin.
+
+    The popup runs in a subprocess to avoid GUI conflicts with rumps. A show
+    command carries the trace ID and start time of the hotkey press, so the
+    popup can trace its stages as part of it.
+    """
+
+    def __init__(self, args: list[str]):
+        self._args = args
+        self._process: subprocess.Popen | None = None
+
+    def start(self, trace_id: str | None = None) -> None:
+        """Start the worker process, which waits hidden for commands."""
+        with trace.span("popup.spawn", trace=trace_id):
+            self._process = subprocess.Popen(
+                self._args,
+                stdin=subprocess.PIPE,
+                env={**os.environ, "MYCLIP_POPUP": "1"},
+            )
+
+    def show(self, trace_id: str | None = None, started: float | None = None) -> None:
+        """Show the popup, restarting the worker if it died."""
+        for _ in range(2):
+            if self._process is None or self._process.poll() is not None:
+                self.start(trace_id)
+            command = "show\n"
+            if trace_id is not None:
+                command = f"show {trace_id} {started!r} {time.monotonic()!r}\n"
+            try:
+                self._process.stdin.write(command.encode())
+                self._process.stdin.flush()
+                return
+            except OSError as e:
+                log.warning(f"Popup worker unavailable, restarting: {e}")
+                self._process.kill()
+
+    def stop(self) -> None:
+        """Ask the worker to exit, killing it if it does not."""
+        process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.write(b"quit\n")
+            process.stdin.close()
+            process.wait(timeout=2.0)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
+
+class Core:
+    """Runs clipboard polling, persistence, popup IPC and hotkey dispatch on one loop.
+
+    start() and stop() are called from the main thread; show_popup(), wake()
+    and set_poll_intervals() may be called from any thread. hotkeys, if
+    given, is called with the show_popup callback and must return an object
+    with start() and stop() (like HotkeyManager). It is called in start(),
+    once polling runs, so the clipboard is monitored while it loads.
+    """
+
+    def __init__(
+        self,
+        history: ClipboardHistory,
+        popup: PopupWorker,
+        backend: ClipboardBackend | None = None,
+        hotkeys: Callable[[Callable[[], None]], object] | None = None,
+        scheduler: PollScheduler | None = None,
+        watch_config: bool = True,
+    ):
+        self._history = history
+        self._popup = popup
+        self._monitor = ClipboardMonitor(history, backend, scheduler)
+        self._hotkey_factory = hotkeys
+        self._hotkeys = None
+        self._watch_config = watch_config
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="myclip-io")
+        self._tasks: list[asyncio.Task] = []
+        self._wake: asyncio.Event | None = None
+        self._flush_timer: asyncio.TimerHandle | None = None
+        self._flushing: asyncio.Future | None = None
+        self._last_flush = 0.0  # time.monotonic() of the last flush
+        self._stopping = False
+        self._monitoring = threading.Event()
+        self._first_poll = 0.0  # time.monotonic() of the first poll
+
+    @property
+    def monitor(self) -> ClipboardMonitor:
+        return self._monitor
+
+    def start(self) -> None:
+        """Start the loop thread, the popup worker and hotkey listening."""
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="myclip-core")
+        self._thread.start()
+        ready.wait()
+        self._history.set_flush_scheduler(self._request_flush)
+        self._call(lambda: self._loop.run_in_executor(self._io, self._popup.start))
+        if self._hotkey_factory is not None:
+            self._hotkeys = self._hotkey_factory(self.show_popup)
+            self._hotkeys.start()
+
+    def stop(self) -> None:
+        """Shut down in order: hotkeys, polling, popup, history writes, loop."""
+        if self._thread is None:
+            return
+        if self._hotkeys is not None:
+            self._hotkeys.stop()
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        try:
+            future.result(timeout=10.0)
+        except Exception as e:
+            log.error(f"Core shutdown failed: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2.0)
+        self._thread = None
+        self._history.set_flush_scheduler(None)
+        self._history.close()
+
+    def wait_monitoring(self, timeout: float | None = None) -> float | None:
+        """Wait for the first clipboard poll. Returns its time.monotonic(), None on timeout."""
+        return self._first_poll if self._monitoring.wait(timeout) else None
+
+    def show_popup(self) -> None:
+        """Show the popup once the latest copy is on disk.
+
+        Called right from the hotkey's event tap, so the trace of the popup's
+        latency starts here.
+        """
+        trace_id = trace.new_trace()
+        started = time.monotonic()
+        self._call(lambda: self._loop.create_task(self._show_popup(trace_id, started)))
+
+    def wake(self) -> None:
+        """Poll the clipboard now and at the fastest rate for a while."""
+        self._monitor.wake()
+        self._call(self._wake_poller)
+
+    def set_poll_intervals(self, min_interval: float, max_interval: float) -> None:
+        """Change the poll interval bounds, taking effect with the next poll."""
+        self._monitor.set_poll_intervals(min_interval, max_interval)
+        self._call(self._wake_poller)
+
+    def _call(self, callback: Callable[[], object]) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(callback)
+
+    def _run(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._tasks.append(loop.create_task(self._poll_clipboard()))
+        if self._watch_config:
+            self._tasks.append(loop.create_task(self._watch_config_file()))
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    def _wake_poller(self) -> None:
+        self._wake.set()
+
+    async def _poll_clipboard(self) -> None:
+        try:
+            await self._loop.run_in_executor(self._io, self._monitor.prime)
+        finally:
+            self._first_poll = time.monotonic()
+            self._monitoring.set()
+        while True:
+            # Adding a copy to history may write its payload or spill file
+            delay = await self._loop.run_in_executor(self._io, self._monitor.step)
+            # Not wait_for(): before Python 3.12 it loses a cancel that comes with a wake
+            try:
+                async with asyncio.timeout(delay):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _watch_config_file(self) -> None:
+        while True:
+            await asyncio.sleep(CONFIG_CHECK_INTERVAL)
+            user_config.reload_if_changed()
+
+    async def _show_popup(self, trace_id: str, started: float) -> None:
+        trace.record("core.dispatch", started, trace=trace_id)
+        # The user is about to paste; catch a copy made just before the hotkey
+        with trace.span("core.poll", trace=trace_id):
+            self._monitor.wake()
+            await self._loop.run_in_executor(self._io, self._monitor.step)
+            self._wake.set()
+        # The popup reads history from disk
+        with trace.span("core.flush", trace=trace_id):
+            await self._flush()
+        with trace.span("core.send_show", trace=trace_id):
+            # May restart the worker; writes to its stdin pipe
+            await self._loop.run_in_executor(self._io, self._popup.show, trace_id, started)
+
+    def _request_flush(self) -> None:
+        """Flush scheduler for the history journal; called from any thread."""
+        self._call(self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        if self._stopping or self._flush_timer is not None or self._flushing is not None:
+            return
+        # Let records accumulate until FLUSH_INTERVAL_MS after the last flush
+        delay = max(0.0, self._last_flush + config.FLUSH_INTERVAL_MS / 1000 - time.monotonic())
+        self._flush_timer = self._loop.call_later(delay, self._flush_now)
+
+    def _flush_now(self) -> None:
+        self._flush_timer = None
+        self._loop.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        if self._flushing is None:
+            self._flushing = self._loop.run_in_executor(self._io, self._history.flush)
+        flushing = self._flushing
+        try:
+            await flushing
+        except Exception as e:
+            log.warning(f"History flush failed: {e}")
+        finally:
+            if self._flushing is flushing:
+                self._flushing = None
+                self._last_flush = time.monotonic()
+        if self._history.stats().get("queue_depth"):
+            self._schedule_flush()  # Appended during the flush
+
+    async def _shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._stopping = True
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        await self._loop.run_in_executor(self._io, self._popup.stop)
+        await self._flush()
+        self._io.shutdown(wait=True)
@@ -1,5 +1,12 @@
 """Global hotkey management."""
 
-from .manager import HotkeyManager
-
 __all__ = ["HotkeyManager"]
+
+
+def __getattr__(name: str):
+    # Imported on first use: loading Quartz is a large part of the app's startup
+    if name == "HotkeyManager":
+        from .manager import HotkeyManager
+
+        return HotkeyManager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
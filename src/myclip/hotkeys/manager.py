@@ -22,6 +22,7 @@ class HotkeyManager:
         self._on_hotkey = on_hotkey
         self._tap = None
         self._run_loop_source = None
+        self._run_loop = None
         self._thread: threading.Thread | None = None
         self._running = False
         self._hotkey_held = False  # Track if hotkey is currently held down
@@ -40,6 +41,8 @@ class HotkeyManager:
         self._running = False
         if self._tap:
             Quartz.CGEventTapEnable(self._tap, False)
+        if self._run_loop is not None:
+            Quartz.CFRunLoopStop(self._run_loop)
         if self._thread:
             self._thread.join(timeout=1.0)
             self._thread = None
@@ -99,8 +102,9 @@ class HotkeyManager:
         )
 
         # Add to run loop
+        self._run_loop = Quartz.CFRunLoopGetCurrent()
         Quartz.CFRunLoopAddSource(
-            Quartz.CFRunLoopGetCurrent(),
+            self._run_loop,
             self._run_loop_source,
             Quartz.kCFRunLoopCommonModes,
         )
@@ -108,6 +112,7 @@ class HotkeyManager:
         # Enable the tap
         Quartz.CGEventTapEnable(self._tap, True)
 
-        # Run the loop
+        # Run the loop until stop() stops it. The timeout only covers a stop()
+        # that came before the loop was entered; events wake it immediately.
         while self._running:
-            Quartz.CFRunLoopRunInMode(Quartz.kCFRunLoopDefaultMode, 0.5, False)
+            Quartz.CFRunLoopRunInMode(Quartz.kCFRunLoopDefaultMode, 60.0, False)
@@ -0,0 +1,168 @@
+"""Timing of the main app's start.
+
+The app marks the end of each phase of its start in a Phases object; the
+phases are logged as startup.* trace stages on every start, so
+``myclip --trace-report --stage startup`` shows them across launches:
+
+    imports     importing the app's modules
+    setup       logging and the config file
+    history     loading the clipboard history
+    monitoring  until the first clipboard poll
+    hotkeys     starting the popup worker and the hotkey listener
+    menu_bar    creating the menu bar icon
+
+``myclip --startup-profile`` starts the app up to the menu bar icon without
+running its event loop, prints the phases and the time spent importing each
+package, and quits.
+
+This module is imported before the rest of the app, so that its imports
+can be timed; it only imports a few standard modules itself.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+
+
+class Phases:
+    """The end times of the phases of a start, in order, on the time.monotonic() clock."""
+
+    def __init__(self, started: float | None = None):
+        self.started = time.monotonic() if started is None else started
+        self.marks: list[tuple[str, float]] = []
+
+    def mark(self, name: str, at: float | None = None) -> None:
+        """End phase name now, or at the given time."""
+        self.marks.append((name, time.monotonic() if at is None else at))
+
+    def durations(self) -> list[tuple[str, float, float]]:
+        """Name, milliseconds and milliseconds since the start of each phase."""
+        rows = []
+        previous = self.started
+        for name, end in self.marks:
+            rows.append((name, (end - previous) * 1000, (end - self.started) * 1000))
+            previous = end
+        return rows
+
+    def record(self) -> None:
+        """Log each phase as a startup.<name> trace stage, and all as startup.total."""
+        from . import trace
+
+        previous = self.started
+        for name, end in self.marks:
+            trace.record(f"startup.{name}", previous, end)
+            previous = end
+        trace.record("startup.total", self.started, previous)
+
+
+class ImportTimer:
+    """Times the loading of each module imported while installed.
+
+    A module's total time includes the modules it imports; its own time
+    does not, like the two columns of ``python -X importtime``.
+    """
+
+    def __init__(self):
+        self.modules: dict[str, tuple[float, float]] = {}  # Name -> (total, own) seconds
+        self._nested = threading.local()
+
+    def install(self) -> None:
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        """Find the module with the other finders and time its loader."""
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def _exec_module(self, loader, module) -> None:
+        stack = getattr(self._nested, "stack", None)
+        if stack is None:
+            stack = self._nested.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.modules[module.__name__] = (elapsed, elapsed - nested)
+
+    def packages(self) -> list[tuple[str, float]]:
+        """Own seconds per top-level package (per module for myclip), slowest first."""
+        totals: dict[str, float] = {}
+        for name, (_, own) in self.modules.items():
+            group = name if name.startswith("myclip.") else name.partition(".")[0]
+            totals[group] = totals.get(group, 0.0) + own
+        return sorted(totals.items(), key=lambda pair: pair[1], reverse=True)
+
+
+class _TimedLoader:
+    """Wraps a loader to time exec_module(); anything else goes to the loader."""
+
+    def __init__(self, loader, timer: ImportTimer):
+        self._loader = loader
+        self._timer = timer
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self._timer._exec_module(self._loader, module)
+
+    def __getattr__(self, name: str):
+        return getattr(self._loader, name)
+
+
+def report(phases: Phases, timer: ImportTimer | None = None, top: int = 15) -> str:
+    """Return a table of the phases, and of the slowest imports if timed."""
+    lines = [f"{'phase':<20} {'ms':>9} {'since start':>12}"]
+    for name, ms, since in phases.durations():
+        lines.append(f"{name:<20} {ms:>9.1f} {since:>12.1f}")
+    if timer is not None and timer.modules:
+        packages = timer.packages()
+        total = sum(own for _, own in packages)
+        lines.append("")
+        lines.append(f"{'import':<32} {'ms':>9}   ({len(timer.modules)} modules)")
+        for name, own in packages[:top]:
+            lines.append(f"{name:<32} {own * 1000:>9.1f}")
+        if len(packages) > top:
+            rest = sum(own for _, own in packages[top:])
+            lines.append(f"{f'({len(packages) - top} more)':<32} {rest * 1000:>9.1f}")
+        lines.append(f"{'total':<32} {total * 1000:>9.1f}")
+    return "\n".join(lines)
+
+
+def profile() -> None:
+    """Start the app up to the menu bar icon, print the startup breakdown and quit."""
+    phases = Phases()
+    timer = ImportTimer()
+    timer.install()
+    try:
+        from .app import App
+
+        phases.mark("imports")
+        app = App(phases)
+        try:
+            app.start()
+        finally:
+            app.stop()
+    finally:
+        timer.uninstall()
+    print(report(phases, timer))
@@ -0,0 +1,184 @@
+"""Tracing spans for the hotkey-to-popup path and the history hot paths.
+
+span() times a block and record() logs a stage whose start was taken
+earlier, e.g. in another process. Records are JSON lines with the stage
+name, its start on the time.monotonic() clock (seconds, shared by all
+processes on macOS), its duration in milliseconds, the process ID and,
+for the stages of one popup, a trace ID:
+
+    {"name": "popup.load_history", "start": 5123.4567, "ms": 1.9, "pid": 123,
+     "trace": "7b-4", "items": 100}
+
+Recording only appends to a buffer; a background thread writes it every
+FLUSH_INTERVAL seconds with one append, so the app and the popup share the
+file without interleaving lines. The file is rotated at MAX_FILE_BYTES.
+
+Summarize it with ``python -m myclip.trace`` (or ``myclip --trace-report``),
+which prints p50/p95/p99 per stage.
+"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import config
+
+log = logging.getLogger(__name__)
+
+# Seconds between writes of buffered records
+FLUSH_INTERVAL = 1.0
+# Records kept while the file cannot be written; later ones are dropped
+MAX_BUFFERED = 10000
+# The file is renamed to *.1 (replacing the previous one) beyond this size
+MAX_FILE_BYTES = 10 * 1024 * 1024
+
+_buffer: list[tuple] = []
+_lock = threading.Lock()
+_writer: threading.Thread | None = None
+_trace_ids = itertools.count(1)
+
+
+def trace_path() -> Path:
+    return config.TRACE_PATH
+
+
+def new_trace() -> str:
+    """Return an ID tying together the stages of one operation, across processes."""
+    return f"{os.getpid():x}-{next(_trace_ids)}"
+
+
+def record(
+    name: str, start: float, end: float | None = None, trace: str | None = None, **fields
+) -> None:
+    """Log a stage that ran from start to end (now by default), both time.monotonic()."""
+    if not config.TRACE_ENABLED:
+        return
+    if end is None:
+        end = time.monotonic()
+    global _writer
+    with _lock:
+        if len(_buffer) < MAX_BUFFERED:
+            _buffer.append((name, start, end, trace, os.getpid(), fields))
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="myclip-trace", daemon=True)
+            _writer.start()
+
+
+@contextmanager
+def span(name: str, trace: str | None = None, **fields) -> Iterator[dict]:
+    """Time the enclosed block as stage name.
+
+    Yields the fields, so the block can add some, e.g. a result count.
+    """
+    if not config.TRACE_ENABLED:
+        yield fields
+        return
+    start = time.monotonic()
+    try:
+        yield fields
+    finally:
+        record(name, start, trace=trace, **fields)
+
+
+def flush() -> None:
+    """Write buffered records now."""
+    with _lock:
+        batch = _buffer[:]
+        _buffer.clear()
+    if not batch:
+        return
+    lines = []
+    for name, start, end, trace, pid, fields in batch:
+        entry = {"name": name, "start": round(start, 6), "ms": round((end - start) * 1000, 3)}
+        entry["pid"] = pid
+        if trace is not None:
+            entry["trace"] = trace
+        entry.update(fields)
+        lines.append(json.dumps(entry) + "\n")
+    path = trace_path()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size > MAX_FILE_BYTES:
+            os.replace(path, path.with_name(path.name + ".1"))
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, "".join(lines).encode("utf-8"))
+        finally:
+            os.close(fd)
+    except OSError as e:
+        log.warning(f"Failed to write trace records to {path}: {e}")
+
+
+def _write_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+atexit.register(flush)
+
+
+def read_records(path: Path) -> list[dict]:
+    """Read the records of a trace file and of its rotated predecessor, oldest first."""
+    records = []
+    for candidate in (path.with_name(path.name + ".1"), path):
+        try:
+            with open(candidate, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+    return records
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def report(records: list[dict], prefix: str = "") -> str:
+    """Return a table of count and p50/p95/p99/max milliseconds per stage."""
+    durations: dict[str, list[float]] = {}
+    for entry in records:
+        name = entry.get("name")
+        if isinstance(name, str) and name.startswith(prefix) and "ms" in entry:
+            durations.setdefault(name, []).append(entry["ms"])
+    if not durations:
+        return "No trace records."
+    lines = [f"{'stage':<28} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+    for name in sorted(durations):
+        values = sorted(durations[name])
+        lines.append(
+            f"{name:<28} {len(values):>7} {percentile(values, 0.5):>9.2f}"
+            f" {percentile(values, 0.95):>9.2f} {percentile(values, 0.99):>9.2f}"
+            f" {values[-1]:>9.2f}"
+        )
+    lines.append("(milliseconds)")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse  # Only needed here, while this module is on the app's startup path
+
+    parser = argparse.ArgumentParser(description="Summarize MyClip trace records per stage.")
+    parser.add_argument("path", nargs="?", type=Path, help=f"default: {trace_path()}")
+    parser.add_argument("--stage", default="", help="only stages starting with this prefix")
+    args = parser.parse_args(argv)
+    print(report(read_records(args.path or trace_path()), args.stage))
+
+
+if __name__ == "__main__":
+    main()
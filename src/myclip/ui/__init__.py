@@ -1,5 +1,12 @@
 """User interface components."""
 
-from .tray import TrayIcon
-
 __all__ = ["TrayIcon"]
+
+
+def __getattr__(name: str):
+    # Imported on first use, so the text helpers work without rumps (headless)
+    if name == "TrayIcon":
+        from .tray import TrayIcon
+
+        return TrayIcon
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
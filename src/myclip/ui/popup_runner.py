@@ -1,22 +1,44 @@
-"""Standalone popup runner for subprocess execution."""
+"""Standalone popup runner for subprocess execution.
+
+Run with --persistent to keep a warm, hidden popup that is shown by writing
+"show" lines to its stdin, instead of starting a new process per popup.
+"""
 
 from __future__ import annotations
 
+import os
+import sys
 import time
+import tkinter
 
 import customtkinter as ctk
-import pyperclip
-from AppKit import NSApplicationActivateIgnoringOtherApps, NSWorkspace
-
-from ..clipboard.history import delete_history_item, load_history_readonly, search_items
-from ..config import ITEM_PREVIEW_LENGTH, POPUP_HEIGHT, POPUP_WIDTH
+from AppKit import NSApplication, NSApplicationActivateIgnoringOtherApps, NSWorkspace
+from PIL import Image
+
+from .. import config, trace, user_config
+from ..clipboard import blobs
+from ..clipboard.archive import Archive, ArchiveSearch
+from ..clipboard.backends import default_backend
+from ..clipboard.content import KIND_IMAGE
+from ..clipboard.history import delete_history_item, load_history_readonly
+from ..clipboard.item import HistoryItem
+from ..clipboard.journal import HistoryView
+from ..clipboard.search import SearchEngine
+from ..config import POPUP_HEIGHT, POPUP_WIDTH
+from .text import format_preview, truncate_text
 
 # UI Constants
 FONT_FAMILY = "Menlo"
 ITEM_ROW_HEIGHT = 20
+ROW_PITCH = ITEM_ROW_HEIGHT + 2  # button height + padding
 SEARCH_HEIGHT = 28
-PREVIEW_MAX_CHARS = 500
-PREVIEW_MAX_LINES = 15
+LIST_BASE_HEIGHT = SEARCH_HEIGHT + 35  # search + margins
+# Row widgets are pooled: only as many as fit the tallest popup are created
+ROW_POOL_SIZE = max(1, (POPUP_HEIGHT - LIST_BASE_HEIGHT) // ROW_PITCH)
+RECENT_ITEMS_SHOWN = 10  # Items listed while the search field is empty
+SEARCH_RESULT_LIMIT = 50  # Best matches listed for a query
+SEARCH_CHUNK_MS = 8  # Time budget per search slice before yielding to Tk
+THUMBNAILS_CACHED = 200  # Images of image items kept between renders
 
 # Color palette for cycling through entries (light mode, dark mode)
 COLOR_PALETTE = [
@@ -29,33 +51,22 @@ COLOR_PALETTE = [
 SELECTED_COLOR = ("white", "gray95")  # High contrast for visibility
 
 
-def truncate_text(text: str, max_len: int) -> str:
-    """Truncate text for display, collapsing whitespace."""
-    text = " ".join(text.split())
-    if len(text) > max_len:
-        return text[: max_len - 3] + "..."
-    return text
-
-
-def format_preview(text: str) -> str:
-    """Format text for preview panel, limiting length and lines."""
-    preview = text[:PREVIEW_MAX_CHARS]
-    if len(text) > PREVIEW_MAX_CHARS:
-        preview += "..."
+def run_popup(persistent: bool = False) -> None:
+    """Run the popup window.
 
-    lines = preview.split("\n")[:PREVIEW_MAX_LINES]
-    if len(text.split("\n")) > PREVIEW_MAX_LINES:
-        lines.append("...")
-
-    return "\n".join(lines)
-
-
-def run_popup() -> None:
-    """Run the popup window."""
+    With persistent=True the window is built once and stays hidden until a
+    "show" command arrives on stdin; closing hides it again. Otherwise the
+    popup is shown immediately and the function returns when it closes.
+    """
     workspace = NSWorkspace.sharedWorkspace()
-    previous_app = workspace.frontmostApplication()
+    previous_app = None if persistent else workspace.frontmostApplication()
 
-    recent_items = load_history_readonly()[:10]
+    clipboard = default_backend()
+    all_items = HistoryView([])  # Full history, decoded lazily, searched when typing
+    engine = SearchEngine()
+    engine_pending = 0  # Oldest items of all_items not yet added to the engine
+    archive = Archive()  # Searched when the history has too few matches
+    recent_items: list[HistoryItem] = []  # Shown when the search field is empty
 
     # Set up CustomTkinter
     ctk.set_appearance_mode("system")
@@ -64,19 +75,6 @@ def run_popup() -> None:
     root = ctk.CTk()
     root.withdraw()
     root.title("")  # Empty title for cleaner look
-
-    # Calculate dynamic height based on number of entries
-    row_height = ITEM_ROW_HEIGHT + 2  # button height + padding
-    base_height = SEARCH_HEIGHT + 35  # search + margins
-    dynamic_height = min(POPUP_HEIGHT, base_height + len(recent_items) * row_height)
-
-    # Center window on screen, positioned higher to leave room for preview below
-    root.update_idletasks()
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
-    x = (screen_width - POPUP_WIDTH) // 2
-    y = (screen_height - dynamic_height) // 5
-    root.geometry(f"{POPUP_WIDTH}x{dynamic_height}+{x}+{y}")
     root.attributes("-topmost", True)
 
     # Configure grid
@@ -91,17 +89,60 @@ def run_popup() -> None:
 
     # State
     selected_index = [0]
-    item_buttons: list[ctk.CTkButton] = []
+    item_buttons: list[ctk.CTkButton] = []  # Row pool, bound to visible items
     delete_buttons: list[ctk.CTkButton] = []
-    current_items: list[str] = recent_items.copy()
+    row_bindings: list[tuple | None] = []  # What each pooled row currently shows
+    current_items: list[HistoryItem] = []
+    scroll_offset = 0  # Index of the item shown in the first row
+    visible_rows = ROW_POOL_SIZE
     preview_window: ctk.CTkToplevel | None = None
     preview_label: ctk.CTkLabel | None = None
+    preview_image: ctk.CTkLabel | None = None
+    # Item ID -> (row image, preview image) from the thumbnail cache, None if missing
+    thumbnails: dict[str, tuple[ctk.CTkImage, ctk.CTkImage] | None] = {}
     search_after_id: str | None = None  # For debouncing search
+    search_generation = 0  # Bumped on each query so stale searches stop
+    command_buffer = b""  # Partial command line read from stdin
+
+    def place_window() -> None:
+        nonlocal visible_rows
+        # Calculate dynamic height based on number of entries
+        dynamic_height = min(POPUP_HEIGHT, LIST_BASE_HEIGHT + len(recent_items) * ROW_PITCH)
+        visible_rows = max(1, min(ROW_POOL_SIZE, len(recent_items)))
+
+        # Center window on screen, positioned higher to leave room for preview below
+        root.update_idletasks()
+        screen_width = root.winfo_screenwidth()
+        screen_height = root.winfo_screenheight()
+        x = (screen_width - POPUP_WIDTH) // 2
+        y = (screen_height - dynamic_height) // 5
+        root.geometry(f"{POPUP_WIDTH}x{dynamic_height}+{x}+{y}")
+
+    def thumbnail(item: HistoryItem) -> tuple[ctk.CTkImage, ctk.CTkImage] | None:
+        """Row and preview images of an image item, from its precomputed thumbnail."""
+        if item.kind != KIND_IMAGE:
+            return None
+        if item.key not in thumbnails:
+            if len(thumbnails) >= THUMBNAILS_CACHED:
+                thumbnails.clear()
+            try:
+                with Image.open(blobs.thumbnail_path(item.key)) as image:
+                    image.load()
+            except OSError:
+                thumbnails[item.key] = None  # Not made (yet), or evicted from the cache
+                return None
+            width, height = image.size
+            row_height = ITEM_ROW_HEIGHT - 4
+            thumbnails[item.key] = (
+                ctk.CTkImage(image, size=(max(1, width * row_height // height), row_height)),
+                ctk.CTkImage(image, size=(width, height)),
+            )
+        return thumbnails[item.key]
 
     # --- Preview panel functions ---
 
-    def show_preview(text: str, button: ctk.CTkButton | None = None) -> None:
-        nonlocal preview_window, preview_label
+    def show_preview(item: HistoryItem, button: ctk.CTkButton | None = None) -> None:
+        nonlocal preview_window, preview_label, preview_image
 
         # Create window once, reuse it
         if preview_window is None or not preview_window.winfo_exists() or preview_label is None:
@@ -123,9 +164,17 @@ def run_popup() -> None:
                 pady=6,
             )
             preview_label.pack()
+            preview_image = ctk.CTkLabel(preview_window, text="", padx=8, pady=6)
 
         # Update content
-        preview_label.configure(text=format_preview(text))
+        # Even a spilled item's prefix is longer than the preview, so no file read
+        preview_label.configure(text=format_preview(item.text, item.lines))
+        images = thumbnail(item)
+        if images is not None:
+            preview_image.configure(image=images[1])
+            preview_image.pack()
+        else:
+            preview_image.pack_forget()
 
         # Position to the right of popup, aligned with selected item
         root.update_idletasks()
@@ -138,7 +187,7 @@ def run_popup() -> None:
         preview_window.lift()
 
     def hide_preview() -> None:
-        nonlocal preview_window, preview_label
+        nonlocal preview_window, preview_label, preview_image
         if preview_window:
             try:
                 preview_window.destroy()
@@ -146,6 +195,7 @@ def run_popup() -> None:
                 pass
             preview_window = None
             preview_label = None
+            preview_image = None
 
     # --- UI Components ---
 
@@ -160,88 +210,278 @@ def run_popup() -> None:
     search_entry.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="ew")
     search_entry._entry.configure(insertwidth=2, insertofftime=0)  # Visible cursor
 
-    items_frame = ctk.CTkScrollableFrame(root, corner_radius=0)
+    items_frame = ctk.CTkFrame(root, corner_radius=0)
     items_frame.grid(row=1, column=0, padx=10, pady=(5, 10), sticky="nsew")
     items_frame.grid_columnconfigure(0, weight=1)
     items_frame.grid_columnconfigure(1, weight=0)
 
+    # --- Virtualized item list ---
+
+    def render_rows() -> None:
+        """Bind the visible slice of current_items to the row pool.
+
+        Only rows whose text or colour changed are reconfigured, so the cost
+        is bounded by the pool size whatever the number of results.
+        """
+        for slot in range(ROW_POOL_SIZE):
+            index = scroll_offset + slot
+            button = item_buttons[slot]
+            del_btn = delete_buttons[slot]
+            if slot >= visible_rows or index >= len(current_items):
+                if row_bindings[slot] is not None:
+                    button.grid_remove()
+                    del_btn.grid_remove()
+                    row_bindings[slot] = None
+                continue
+
+            is_selected = index == selected_index[0]
+            color = SELECTED_COLOR if is_selected else COLOR_PALETTE[index % len(COLOR_PALETTE)]
+            text_color = ("black", "black") if is_selected else ("gray10", "gray90")
+            binding = (current_items[index], color)
+            if row_bindings[slot] != binding:
+                if row_bindings[slot] is None:
+                    button.grid()
+                    del_btn.grid()
+                images = thumbnail(current_items[index])
+                button.configure(
+                    text=truncate_text(current_items[index].line, config.ITEM_PREVIEW_LENGTH),
+                    image=images[0] if images is not None else None,
+                    fg_color=color,
+                    text_color=text_color,
+                )
+                row_bindings[slot] = binding
+
+        total = len(current_items)
+        if total > visible_rows:
+            scrollbar.set(scroll_offset / total, (scroll_offset + visible_rows) / total)
+            scrollbar.grid()
+        else:
+            scrollbar.grid_remove()
+
+        slot = selected_index[0] - scroll_offset
+        if 0 <= selected_index[0] < total and 0 <= slot < visible_rows:
+            show_preview(current_items[selected_index[0]], item_buttons[slot])
+
+    def scroll_to(offset: int) -> None:
+        nonlocal scroll_offset
+        scroll_offset = max(0, min(offset, len(current_items) - visible_rows))
+        render_rows()
+
+    def on_scrollbar(*args) -> None:
+        if args[0] == "moveto":
+            scroll_to(int(float(args[1]) * len(current_items)))
+        elif args[0] == "scroll":
+            amount = int(args[1]) * (visible_rows if args[2] == "pages" else 1)
+            scroll_to(scroll_offset + amount)
+
+    def on_mouse_wheel(event) -> None:
+        scroll_to(scroll_offset + (-1 if event.delta > 0 else 1))
+
+    for slot in range(ROW_POOL_SIZE):
+        button = ctk.CTkButton(
+            items_frame,
+            text="",
+            anchor="w",
+            font=mono_font,
+            height=ITEM_ROW_HEIGHT,
+            corner_radius=0,
+            hover_color=("gray75", "gray25"),
+            command=lambda s=slot: select_item(scroll_offset + s),
+        )
+        button.grid(row=slot, column=0, padx=(4, 0), pady=1, sticky="ew")
+        button.grid_remove()
+        button.bind("<MouseWheel>", on_mouse_wheel)
+        item_buttons.append(button)
+
+        del_btn = ctk.CTkButton(
+            items_frame,
+            text="×",
+            width=22,
+            height=ITEM_ROW_HEIGHT,
+            font=delete_font,
+            fg_color="transparent",
+            hover_color=("gray85", "gray20"),
+            text_color=("gray70", "gray40"),
+            command=lambda s=slot: delete_item(scroll_offset + s),
+        )
+        del_btn.grid(row=slot, column=1, padx=(0, 4), pady=1)
+        del_btn.grid_remove()
+        delete_buttons.append(del_btn)
+        row_bindings.append(None)
+
+    scrollbar = ctk.CTkScrollbar(items_frame, command=on_scrollbar)
+    scrollbar.grid(row=0, column=2, rowspan=ROW_POOL_SIZE, sticky="ns")
+    scrollbar.grid_remove()
+    items_frame.bind("<MouseWheel>", on_mouse_wheel)
+
     # --- Item management functions ---
 
     def update_selection_highlight() -> None:
-        for i, button in enumerate(item_buttons):
-            is_selected = i == selected_index[0]
-            color = SELECTED_COLOR if is_selected else COLOR_PALETTE[i % len(COLOR_PALETTE)]
-            text_color = ("black", "black") if is_selected else ("gray10", "gray90")
-            button.configure(fg_color=color, text_color=text_color)
-        if 0 <= selected_index[0] < len(current_items):
-            show_preview(current_items[selected_index[0]], item_buttons[selected_index[0]])
+        # Scroll just enough to keep the selected item visible
+        if selected_index[0] < scroll_offset:
+            scroll_to(selected_index[0])
+        elif selected_index[0] >= scroll_offset + visible_rows:
+            scroll_to(selected_index[0] - visible_rows + 1)
+        else:
+            render_rows()
 
     def select_item(index: int) -> None:
         if 0 <= index < len(current_items):
-            pyperclip.copy(current_items[index])
-            hide_preview()
-            root.quit()
+            clipboard.write_content(current_items[index].content())
+            close_popup()
 
     def delete_item(index: int) -> None:
-        nonlocal recent_items
+        nonlocal recent_items, engine_pending
         if 0 <= index < len(current_items):
-            item = current_items[index]
-            delete_history_item(item)
-            if item in recent_items:
-                recent_items.remove(item)
-            query = search_var.get()
-            items = search_items(query, recent_items) if query.strip() else recent_items
-            selected_index[0] = min(selected_index[0], max(0, len(items) - 1))
-            update_items_list(items)
+            key = current_items[index].key
+            delete_history_item(key)
+            engine.remove(key)
+            position = all_items.discard(key)
+            if position is not None and position < engine_pending:
+                engine_pending -= 1
+            recent_items = all_items[:RECENT_ITEMS_SHOWN]
+            run_search(search_var.get(), keep_selection=True)
             search_entry.focus_set()
 
-    def update_items_list(items: list[str]) -> None:
-        nonlocal current_items
-        current_items = items
-
-        for btn in item_buttons:
-            btn.destroy()
-        for btn in delete_buttons:
-            btn.destroy()
-        item_buttons.clear()
-        delete_buttons.clear()
+    def run_search(query: str, keep_selection: bool = False) -> None:
+        """Search the full history in time-bounded slices between Tk events."""
+        nonlocal search_generation
+        search_generation += 1
+        generation = search_generation
+        started = time.monotonic()
+
+        def show_results(items: list[HistoryItem]) -> None:
+            if query.strip():
+                trace.record("popup.search", started, query_len=len(query), results=len(items))
+            if keep_selection:
+                selected_index[0] = min(selected_index[0], max(0, len(items) - 1))
+            else:
+                selected_index[0] = 0
+            update_items_list(items)
 
-        for i, item in enumerate(items):
-            is_selected = i == selected_index[0]
-            color = SELECTED_COLOR if is_selected else COLOR_PALETTE[i % len(COLOR_PALETTE)]
-            text_color = ("black", "black") if is_selected else ("gray10", "gray90")
+        if not query.strip():
+            show_results(recent_items)
+            return
+
+        search = None
+        archive_search = None
+
+        def search_slice() -> None:
+            nonlocal search, archive_search
+            if generation != search_generation:
+                return  # The query changed; abandon this search
+            deadline = time.perf_counter() + SEARCH_CHUNK_MS / 1000
+            if not fill_engine(deadline):
+                root.after(1, search_slice)
+                return
+            if search is None:
+                search = engine.incremental(query, SEARCH_RESULT_LIMIT)
+            while not search.done and not search.step():
+                if time.perf_counter() >= deadline:
+                    root.after(1, search_slice)
+                    return
+            results = search.results()
+            if config.ARCHIVE_ENABLED and len(results) < SEARCH_RESULT_LIMIT:
+                # Too few matches in the history: add some from the archive
+                if archive_search is None:
+                    limit = SEARCH_RESULT_LIMIT - len(results)
+                    archive_search = ArchiveSearch(archive, query, limit, engine)
+                while not archive_search.step():
+                    if time.perf_counter() >= deadline:
+                        root.after(1, search_slice)
+                        return
+                results = results + archive_search.results()
+            show_results(results)
+
+        search_slice()
+
+    def fill_engine(deadline: float) -> bool:
+        """Decode and index history items, oldest first, until the deadline.
+
+        Runs on the first query after opening, so just showing the popup never
+        decodes more than the visible items. Returns True once all are indexed.
+        """
+        nonlocal engine_pending
+        while engine_pending > 0:
+            engine_pending -= 1
+            item = all_items[engine_pending]
+            engine.add(item.key, item)
+            if engine_pending % 256 == 0 and time.perf_counter() >= deadline:
+                return engine_pending == 0
+        return True
+
+    def update_items_list(items: list[HistoryItem]) -> None:
+        nonlocal current_items, scroll_offset
+        current_items = items
+        scroll_offset = max(0, min(scroll_offset, len(items) - visible_rows))
+        update_selection_highlight()
+
+    # --- Show / hide ---
+
+    def open_popup(trace_id: str | None = None, started: float | None = None) -> None:
+        """Show the popup. started is the time.monotonic() of the hotkey press, if known."""
+        nonlocal previous_app, all_items, recent_items, engine_pending
+        if persistent:
+            previous_app = workspace.frontmostApplication()
+        user_config.reload_if_changed()
+        with trace.span("popup.load_history", trace=trace_id) as fields:
+            all_items.close()
+            all_items = load_history_readonly()
+            recent_items = all_items[:RECENT_ITEMS_SHOWN]
+            fields["items"] = len(all_items)
+        engine.clear()
+        thumbnails.clear()  # Thumbnails are made in the background, so some may be new
+        engine_pending = len(all_items)
+        if search_var.get():
+            search_var.set("")
+        place_window()
+
+        # Populate items before showing window
+        with trace.span("popup.update_items", trace=trace_id):
+            run_search("")
+            root.update_idletasks()
+
+        # Show window and preview together
+        with trace.span("popup.deiconify", trace=trace_id):
+            root.deiconify()
+            root.lift()
+            if persistent:
+                NSApplication.sharedApplication().activateIgnoringOtherApps_(True)
+            root.focus_force()
+            search_entry.focus_set()
+            root.update_idletasks()
+        if started is not None:
+            trace.record("hotkey_to_popup", started, trace=trace_id)
 
-            button = ctk.CTkButton(
-                items_frame,
-                text=truncate_text(item, ITEM_PREVIEW_LENGTH),
-                anchor="w",
-                font=mono_font,
-                height=ITEM_ROW_HEIGHT,
-                corner_radius=0,
-                fg_color=color,
-                hover_color=("gray75", "gray25"),
-                text_color=text_color,
-                command=lambda idx=i: select_item(idx),
-            )
-            button.grid(row=i, column=0, padx=(4, 0), pady=1, sticky="ew")
-            item_buttons.append(button)
-
-            del_btn = ctk.CTkButton(
-                items_frame,
-                text="×",
-                width=22,
-                height=ITEM_ROW_HEIGHT,
-                font=delete_font,
-                fg_color="transparent",
-                hover_color=("gray85", "gray20"),
-                text_color=("gray70", "gray40"),
-                command=lambda idx=i: delete_item(idx),
-            )
-            del_btn.grid(row=i, column=1, padx=(0, 4), pady=1)
-            delete_buttons.append(del_btn)
+    def close_popup() -> None:
+        hide_preview()
+        if persistent:
+            root.withdraw()
+            root.after(100, restore_previous_app)
+        else:
+            root.quit()
 
-        if 0 <= selected_index[0] < len(current_items):
-            show_preview(current_items[selected_index[0]], item_buttons[selected_index[0]])
+    def on_command(fd, mask) -> None:
+        nonlocal command_buffer
+        data = os.read(fd, 4096)
+        if not data:
+            # The app closed our stdin: it has exited
+            root.quit()
+            return
+        command_buffer += data
+        while b"\n" in command_buffer:
+            line, command_buffer = command_buffer.split(b"\n", 1)
+            command, *args = line.decode().split() or [""]
+            if command == "show":
+                if len(args) == 3:
+                    # Traced: the hotkey press's trace ID and time, and when this was sent
+                    trace_id, started, sent = args[0], float(args[1]), float(args[2])
+                    trace.record("popup.ipc", sent, trace=trace_id)
+                    open_popup(trace_id, started)
+                else:
+                    open_popup()
+            elif command == "quit":
+                root.quit()
 
     # --- Event handlers ---
 
@@ -254,18 +494,14 @@ def run_popup() -> None:
         def do_search():
             nonlocal search_after_id
             search_after_id = None
-            query = search_var.get()
-            items = search_items(query, recent_items) if query.strip() else recent_items
-            selected_index[0] = 0
-            update_items_list(items)
+            run_search(search_var.get())
         search_after_id = root.after(10, do_search)
 
     def on_enter(event) -> None:
         select_item(selected_index[0])
 
     def on_escape(event) -> None:
-        hide_preview()
-        root.quit()
+        close_popup()
 
     def on_arrow_up(event) -> str:
         if selected_index[0] > 0:
@@ -274,14 +510,13 @@ def run_popup() -> None:
         return "break"
 
     def on_arrow_down(event) -> str:
-        if selected_index[0] < len(item_buttons) - 1:
+        if selected_index[0] < len(current_items) - 1:
             selected_index[0] += 1
             update_selection_highlight()
         return "break"
 
     def restore_previous_app() -> None:
         if previous_app:
-            time.sleep(0.1)
             previous_app.activateWithOptions_(NSApplicationActivateIgnoringOtherApps)
 
     def on_delete_word(event) -> str:
@@ -348,23 +583,20 @@ def run_popup() -> None:
     search_entry.bind("<Control-p>", on_arrow_up)
     search_entry.bind("<Control-n>", on_arrow_down)
     root.bind("<Escape>", on_escape)
-    root.protocol("WM_DELETE_WINDOW", root.quit)
-
-    # Populate items before showing window
-    update_items_list(recent_items)
-    root.update_idletasks()
+    root.protocol("WM_DELETE_WINDOW", close_popup)
 
-    # Show window and preview together
-    root.deiconify()
-    root.lift()
-    root.focus_force()
-    search_entry.focus_set()
+    if persistent:
+        root.tk.createfilehandler(sys.stdin.fileno(), tkinter.READABLE, on_command)
+    else:
+        open_popup()
 
     # Run event loop
     root.mainloop()
     root.destroy()
-    restore_previous_app()
+    if not persistent:
+        time.sleep(0.1)
+        restore_previous_app()
 
 
 if __name__ == "__main__":
-    run_popup()
+    run_popup(persistent="--persistent" in sys.argv)
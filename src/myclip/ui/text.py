@@ -0,0 +1,37 @@
+"""Text formatting for the popup's list rows and preview panel."""
+
+PREVIEW_MAX_CHARS = 500
+PREVIEW_MAX_LINES = 15
+
+
+def truncate_text(text: str, max_len: int) -> str:
+    """Truncate text for display, collapsing whitespace.
+
+    Only the start of text is scanned unless it is mostly whitespace, so the
+    cost does not grow with the size of the item.
+    """
+    scan = max_len * 4
+    collapsed = " ".join(text[:scan].split())
+    if len(text) > scan and len(collapsed) <= max_len:
+        collapsed = " ".join(text.split())
+    if len(collapsed) > max_len:
+        return collapsed[: max_len - 3] + "..."
+    return collapsed
+
+
+def format_preview(text: str, line_count: int | None = None) -> str:
+    """Format text for preview panel, limiting length and lines.
+
+    line_count is the number of lines in text, counted if not given.
+    """
+    preview = text[:PREVIEW_MAX_CHARS]
+    if len(text) > PREVIEW_MAX_CHARS:
+        preview += "..."
+
+    if line_count is None:
+        line_count = text.count("\n") + 1
+    lines = preview.split("\n")[:PREVIEW_MAX_LINES]
+    if line_count > PREVIEW_MAX_LINES:
+        lines.append("...")
+
+    return "\n".join(lines)
@@ -1,10 +1,16 @@
 """User configuration file management.
 
 Creates and loads user configuration from ~/.config/myclip/config.toml
+
+The parsed file is cached: get() only parses it on first use, and
+reload_if_changed() parses it again if its mtime or size changed since.
+Callbacks registered with subscribe() run after such a reload.
 """
 
 import logging
+import threading
 import tomllib
+from collections.abc import Callable
 from pathlib import Path
 
 log = logging.getLogger(__name__)
@@ -17,8 +23,18 @@ DEFAULT_CONFIG = """\
 # Edit this file to customize settings. Delete to reset to defaults.
 
 [clipboard]
-poll_interval = 1.0  # Seconds between clipboard checks
+min_poll_interval = 0.05  # Seconds between clipboard checks right after activity
+max_poll_interval = 1.0  # Checks back off up to this many seconds while idle
 max_history_items = 100  # Maximum items to store in history
+max_total_bytes = 104857600  # Maximum total size of history (100 MB)
+max_item_bytes = 65536  # Larger items are kept on disk instead of in memory
+flush_interval_ms = 200  # History changes are written to disk at most this often
+backend = "json"  # History storage: "json" or "sqlite" (for very large histories)
+
+[archive]
+enabled = true  # Keep items dropped from history in compressed daily files
+max_age_days = 0  # Remove archived days older than this (0 = keep forever)
+max_bytes = 1073741824  # Remove the oldest days beyond this size (1 GB, 0 = no limit)
 
 [popup]
 width = 650  # Popup window width in pixels
@@ -27,6 +43,11 @@ item_preview_length = 80  # Max characters shown per item in list
 
 [search]
 fuzzy_score_threshold = 60  # Minimum fuzzy match score (0-100)
+key_length = 256  # Characters of each item (from the start) matched by search
+
+[trace]
+enabled = true  # Record popup latency and history timings for `myclip --trace-report`
+path = ""  # Trace file (default: ~/Library/Logs/MyClip.trace.jsonl)
 
 [hotkey]
 # Modifiers: cmd, ctrl, alt, shift (separated by +)
@@ -43,15 +64,46 @@ def ensure_config_exists() -> None:
         log.info(f"Created default config at {CONFIG_FILE}")
 
 
-def load_config() -> dict:
-    """Load configuration from user config file."""
-    ensure_config_exists()
+_cache: dict | None = None
+_cache_stamp: tuple[int, int] | None = None  # (mtime_ns, size) of the parsed file
+_cache_lock = threading.Lock()
+_subscribers: list[Callable[[dict], None]] = []
+
+
+def _file_stamp() -> tuple[int, int] | None:
     try:
-        with open(CONFIG_FILE, "rb") as f:
-            return tomllib.load(f)
-    except Exception as e:
-        log.warning(f"Failed to load config from {CONFIG_FILE}: {e}")
-        return {}
+        stat = CONFIG_FILE.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load_if_changed() -> tuple[dict, bool]:
+    """Return the config and whether it was (re)parsed by this call."""
+    global _cache, _cache_stamp
+    stamp = _file_stamp()
+    if stamp is None:
+        ensure_config_exists()
+        stamp = _file_stamp()
+    with _cache_lock:
+        if _cache is not None and stamp == _cache_stamp:
+            return _cache, False
+        try:
+            with open(CONFIG_FILE, "rb") as f:
+                config = tomllib.load(f)
+        except Exception as e:
+            log.warning(f"Failed to load config from {CONFIG_FILE}: {e}")
+            config = {} if _cache is None else _cache
+        _cache, _cache_stamp = config, stamp
+        return config, True
+
+
+def load_config() -> dict:
+    """Load configuration from user config file, cached until reload_if_changed()."""
+    config = _cache
+    if config is not None:
+        return config
+    return _load_if_changed()[0]
 
 
 def get(section: str, key: str, default):
@@ -60,6 +112,29 @@ def get(section: str, key: str, default):
     return config.get(section, {}).get(key, default)
 
 
+def subscribe(callback: Callable[[dict], None]) -> None:
+    """Call callback with the new config whenever the file is reloaded."""
+    _subscribers.append(callback)
+
+
+def reload_if_changed() -> bool:
+    """Re-parse the config file if it changed and notify subscribers.
+
+    Returns True if it was reloaded.
+    """
+    had_cache = _cache is not None
+    config, reloaded = _load_if_changed()
+    if not reloaded or not had_cache:
+        return False
+    log.info(f"Reloaded config from {CONFIG_FILE}")
+    for callback in list(_subscribers):
+        try:
+            callback(config)
+        except Exception as e:
+            log.error(f"Config change handler failed: {e}")
+    return True
+
+
 def set(section: str, key: str, value) -> bool:
     """Update a config value in the config file.
 
@@ -0,0 +1,36 @@
+"""Shared fixtures: each test gets its own home directory for history files."""
+
+import os
+import tempfile
+
+# Paths are computed from HOME on import, and the user config is read from it:
+# never touch the real one
+os.environ["HOME"] = tempfile.mkdtemp(prefix="myclip-tests-")
+
+import pytest  # noqa: E402
+
+from myclip import config  # noqa: E402
+from myclip.clipboard import archive, blobs, journal, spill, sqlite_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    """Point all history, spill, blob, archive and database files into tmp_path."""
+    history_file = tmp_path / ".myclip_history.json"
+    monkeypatch.setattr(journal, "HISTORY_FILE", history_file)
+    monkeypatch.setattr(journal, "SNAPSHOT_FILE", history_file.with_suffix(".bin"))
+    monkeypatch.setattr(journal, "JOURNAL_FILE", history_file.with_suffix(".journal"))
+    monkeypatch.setattr(journal, "COMPACTING_FILE", history_file.with_suffix(".journal.old"))
+    monkeypatch.setattr(journal, "LOCK_FILE", history_file.with_suffix(".lock"))
+    monkeypatch.setattr(
+        journal, "UNREADABLE_SNAPSHOT_FILE", history_file.with_suffix(".bin.unreadable")
+    )
+    monkeypatch.setattr(spill, "SPILL_DIR", tmp_path / ".myclip_spill")
+    monkeypatch.setattr(blobs, "BLOB_DIR", tmp_path / ".myclip_blobs")
+    monkeypatch.setattr(blobs, "THUMBNAIL_DIR", tmp_path / ".myclip_blobs" / "thumbnails")
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / ".myclip_archive")
+    monkeypatch.setattr(archive, "DELETED_FILE", tmp_path / ".myclip_archive" / "deleted.jsonl")
+    monkeypatch.setattr(sqlite_store, "DB_FILE", tmp_path / ".myclip_history.db")
+    monkeypatch.setattr(config, "TRACE_ENABLED", False)
+    monkeypatch.setattr(config, "HISTORY_BACKEND", "json")
+    return tmp_path
@@ -0,0 +1,161 @@
+"""Core run headless: a fake popup and hotkeys, and the in-memory clipboard."""
+
+import os
+import threading
+import time
+
+import pytest
+
+from myclip import core, user_config
+from myclip.clipboard import ClipboardHistory, journal
+from myclip.clipboard.backends import MemoryBackend
+from myclip.clipboard.monitor import PollScheduler
+
+TIMEOUT = 5.0
+
+
+def wait_until(condition) -> None:
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class FakePopup:
+    """Records the commands the core sends, and the history on disk at each show."""
+
+    def __init__(self):
+        self.commands = []
+        self.threads = set()  # Names of the threads commands were sent from
+        self.shown = threading.Event()
+        self.history_at_show = None
+
+    def start(self, trace_id=None):
+        self._record("start")
+
+    def show(self, trace_id=None, started=None):
+        self._record("show")
+        self.history_at_show = [item.text for item in journal.load_items()]
+        self.shown.set()
+
+    def stop(self):
+        self._record("stop")
+
+    def _record(self, command):
+        self.commands.append(command)
+        self.threads.add(threading.current_thread().name.split("_")[0])
+
+
+class FakeHotkeys:
+    def __init__(self, callback):
+        self.callback = callback
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+@pytest.fixture
+def backend():
+    return MemoryBackend("copied before start")
+
+
+@pytest.fixture
+def popup():
+    return FakePopup()
+
+
+@pytest.fixture
+def make_core(backend, popup):
+    cores = []
+
+    def make(**kwargs):
+        history = ClipboardHistory(backend="json")
+        # Slow polling: only the show (or a wake) polls during a test
+        kwargs.setdefault("scheduler", PollScheduler(30.0, 30.0))
+        kwargs.setdefault("watch_config", False)
+        instance = core.Core(history, popup, backend, **kwargs)
+        cores.append(instance)
+        return instance
+
+    yield make
+    for instance in cores:
+        instance.stop()
+
+
+def test_copy_is_on_disk_before_the_popup_shows(make_core, backend, popup):
+    hotkeys = []
+
+    def listen(callback):
+        hotkeys.append(FakeHotkeys(callback))
+        return hotkeys[0]
+
+    app = make_core(hotkeys=listen)
+    app.start()
+    assert app.wait_monitoring(TIMEOUT) is not None
+    assert hotkeys[0].running
+
+    backend.write_text("copied just before the hotkey")
+    hotkeys[0].callback()
+    assert popup.shown.wait(TIMEOUT)
+    assert popup.history_at_show == ["copied just before the hotkey"]
+
+    app.stop()
+    assert not hotkeys[0].running
+    assert popup.commands == ["start", "show", "stop"]
+    assert popup.threads == {"myclip-io"}  # Never blocking the loop
+
+
+def test_clipboard_is_read_off_the_loop(make_core, backend):
+    app = make_core()
+    threads = []
+    read_content = backend.read_content
+
+    def record_thread():
+        threads.append(threading.current_thread().name)
+        return read_content()
+
+    backend.read_content = record_thread
+    app.start()
+    app.wait_monitoring(TIMEOUT)
+    backend.write_text("hello")
+    app.wake()
+    wait_until(lambda: app.monitor.stats()["hits"])
+    app.stop()
+    assert threads and all(name.startswith("myclip-io") for name in threads)
+    assert [item.text for item in journal.load_items()] == ["hello"]
+
+
+def test_stop_writes_copies_not_yet_flushed(make_core, backend):
+    app = make_core(scheduler=PollScheduler(0.01, 0.01))
+    app.start()
+    app.wait_monitoring(TIMEOUT)
+    backend.write_text("last copy")
+    wait_until(lambda: app.monitor.stats()["hits"])
+    app.stop()
+    assert [item.text for item in journal.load_items()] == ["last copy"]
+
+
+def test_config_changes_are_picked_up(make_core, tmp_path, monkeypatch):
+    config_file = tmp_path / "config.toml"
+    config_file.write_text("[clipboard]\nmax_history_items = 10\n")
+    monkeypatch.setattr(user_config, "CONFIG_DIR", tmp_path)
+    monkeypatch.setattr(user_config, "CONFIG_FILE", config_file)
+    monkeypatch.setattr(user_config, "_cache", None)
+    monkeypatch.setattr(user_config, "_cache_stamp", None)
+    monkeypatch.setattr(user_config, "_subscribers", [])
+    monkeypatch.setattr(core, "CONFIG_CHECK_INTERVAL", 0.01)
+    user_config.load_config()
+    reloaded = threading.Event()
+    user_config.subscribe(lambda _config: reloaded.set())
+
+    app = make_core(watch_config=True)
+    app.start()
+    config_file.write_text("[clipboard]\nmax_history_items = 20\n")
+    stat = config_file.stat()
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))  # Coarse mtimes
+    assert reloaded.wait(TIMEOUT)
+    assert user_config.get("clipboard", "max_history_items", None) == 20
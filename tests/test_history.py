@@ -0,0 +1,173 @@
+"""ClipboardHistory: limits, persistence and changes made by other processes.
+
+Two ClipboardHistory instances (or one and the module functions the popup
+uses) stand in for the app and popup processes: they only share the files.
+"""
+
+import pytest
+
+from myclip import config
+from myclip.clipboard import ClipboardHistory, archive, journal
+from myclip.clipboard.content import KIND_RTF, KIND_TEXT, ClipboardContent
+from myclip.clipboard.digest import item_id
+from myclip.clipboard.history import delete_history_item, load_history_readonly
+
+
+@pytest.fixture(autouse=True)
+def manual_compaction(monkeypatch):
+    monkeypatch.setattr(journal, "COMPACT_AFTER_RECORDS", 10**9)
+
+
+@pytest.fixture
+def app():
+    history = ClipboardHistory(backend="json")
+    yield history
+    history.close()
+
+
+def texts(items) -> list[str]:
+    return [item.text for item in items]
+
+
+def test_delete_in_the_popup_is_merged(app):
+    for text in ["a", "b", "c"]:
+        app.add(text)
+    app.flush()
+    assert delete_history_item(item_id("b"))
+    assert texts(app.get_all()) == ["c", "a"]
+    assert [item.text for item in app.search("b")] == []
+    app.add("d")
+    app.close()
+    assert texts(journal.load_items()) == ["d", "c", "a"]
+
+
+def test_delete_of_a_compacted_item_is_merged(app):
+    for text in ["a", "b", "c"]:
+        app.add(text)
+    app.flush()
+    app._journal.compact()
+    assert delete_history_item(item_id("a"))
+    assert not delete_history_item(item_id("a"))
+    assert texts(app.get_all()) == ["c", "b"]
+    view = load_history_readonly()
+    assert texts(view) == ["c", "b"]
+    view.close()
+
+
+def test_adds_of_another_process_are_merged(app):
+    app.add("from app")
+    app.flush()
+    other = ClipboardHistory(backend="json")
+    other.add("from other")
+    other.close()
+    assert texts(app.get_all()) == ["from other", "from app"]
+    assert texts(app.search("other")) == ["from other"]
+    app.add("again")
+    assert len(app) == 3
+
+
+def test_changes_compacted_away_cause_a_reload(app):
+    app.add("from app")
+    app.flush()
+    other = ClipboardHistory(backend="json")
+    for i in range(5):
+        other.add(f"other {i}")
+    other.flush()
+    other._journal.compact()  # The app never saw these records in the journal
+    other.close()
+    assert texts(app.get_all()) == [f"other {i}" for i in reversed(range(5))] + ["from app"]
+
+
+def test_concurrent_adds_are_both_kept(app):
+    other = ClipboardHistory(backend="json")
+    app.add("app 1")
+    other.add("other 1")
+    app.flush()
+    other.flush()
+    app.add("app 2")
+    app.flush()
+    other.close()
+    assert texts(app.get_all()) == ["app 2", "other 1", "app 1"]
+    app.close()
+    assert texts(journal.load_items()) == ["app 2", "other 1", "app 1"]
+
+
+def test_snapshots_stay_as_they_were_handed_out(app):
+    app.add("apple")
+    before = app.get_all()
+    assert texts(app.search("apple")) == ["apple"]
+    app.add("banana")
+    app.add("apple")
+    assert texts(before) == ["apple"]
+    assert texts(app.get_all()) == ["apple", "banana"]
+    assert texts(app.search("banana")) == ["banana"]
+    assert len(app) == 2
+
+
+def test_limits_apply_to_snapshots(monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_ENABLED", False)  # Search would find them there
+    app = ClipboardHistory(backend="json")
+    for text in ["apple", "banana", "cherry", "damson", "elderberry"]:
+        app.add(text)
+    assert texts(app.search("apple")) == ["apple"]
+    app.set_limits(3)
+    assert texts(app.get_all()) == ["elderberry", "damson", "cherry"]
+    assert len(app) == 3
+    assert texts(app.search("banana")) == []
+    app.close()
+
+
+def archived_texts() -> list[str]:
+    return [item.text for path in archive.segments() for item, _ in archive.read_segment(path)]
+
+
+def test_limit_lowered_between_runs_archives_the_excess():
+    history = ClipboardHistory(max_items=5, backend="json", max_item_bytes=1024)
+    history.add("spilled " * 1000)
+    for text in ["apple", "banana", "cherry", "damson"]:
+        history.add(text)
+    history.close()
+    assert archived_texts() == []
+
+    history = ClipboardHistory(max_items=3, backend="json", max_item_bytes=1024)
+    assert texts(history.get_all()) == ["damson", "cherry", "banana"]
+    history.close()
+    # The spill file is only pruned once the archive holds the full text
+    assert archived_texts() == ["spilled " * 1000, "apple"]
+    assert texts(journal.load_items()) == ["damson", "cherry", "banana"]
+
+
+def test_items_beyond_the_limit_are_archived_once():
+    history = ClipboardHistory(max_items=3, backend="json")
+    for text in ["apple", "banana", "cherry", "damson", "elderberry"]:
+        history.add(text)
+    history.close()
+    for _ in range(2):
+        ClipboardHistory(max_items=3, backend="json").close()
+    assert archived_texts() == ["apple", "banana"]
+    assert texts(journal.load_items()) == ["elderberry", "damson", "cherry"]
+
+
+def test_rich_and_plain_copies_of_a_text_are_one_item(app):
+    app.add(ClipboardContent(KIND_RTF, "hello", b"{\\rtf1 {\\b hello}}"))
+    app.add("hello")
+    assert [item.kind for item in app.get_all()] == [KIND_TEXT]
+    assert app.get_all()[0].content() == ClipboardContent(KIND_TEXT, "hello")
+
+    app.add(ClipboardContent(KIND_RTF, "hello", b"{\\rtf1 {\\i hello}}"))
+    app.add(ClipboardContent(KIND_RTF, "other", b"{\\rtf1 other}"))
+    app.add(ClipboardContent(KIND_RTF, "hello", b"{\\rtf1 {\\b hello}}"))
+    assert texts(app.get_all()) == ["hello", "other"]
+    assert app.get_all()[0].content().data == b"{\\rtf1 {\\b hello}}"
+    app.close()
+    assert [(item.text, item.kind) for item in journal.load_items()] == [
+        ("hello", KIND_RTF),
+        ("other", KIND_RTF),
+    ]
+
+
+def test_search_finds_the_newest_copy_of_a_text(app):
+    app.add(ClipboardContent(KIND_RTF, "hello world", b"{\\rtf1 {\\b hello world}}"))
+    app.add("hello world")
+    for query in ["hello", "'hello", "/hel+o"]:
+        assert [item.kind for item in app.search(query)] == [KIND_TEXT], query
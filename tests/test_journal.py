@@ -0,0 +1,188 @@
+"""Journal replay, lazy views, compaction and recovery from bad snapshots."""
+
+import random
+import threading
+
+import pytest
+
+from myclip.clipboard import ClipboardHistory, journal, snapshot
+from myclip.clipboard.digest import item_id
+from myclip.clipboard.item import HistoryItem
+from myclip.clipboard.journal import HistoryJournal
+
+
+@pytest.fixture(autouse=True)
+def manual_compaction(monkeypatch):
+    """Compact only when a test says so."""
+    monkeypatch.setattr(journal, "COMPACT_AFTER_RECORDS", 10**9)
+
+
+def add(text: str) -> dict:
+    return journal.add_record(HistoryItem.from_text(text))
+
+
+def delete(text: str) -> dict:
+    return {"op": "delete", "id": item_id(text)}
+
+
+def write_history(records: list[dict], compact_after: int | None = None) -> None:
+    """Journal records, folding the first compact_after of them into the snapshot."""
+    writer = HistoryJournal(max_items=1000)
+    writer.load()
+    for position, record in enumerate(records):
+        if position == compact_after:
+            writer.flush()
+            writer.compact()
+        writer.append(record)
+    writer.close()
+
+
+def random_records(rng: random.Random, count: int) -> list[dict]:
+    texts = [f"text {i}" for i in range(30)]
+    records = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.75:
+            records.append(add(rng.choice(texts)))
+        elif roll < 0.98:
+            records.append(delete(rng.choice(texts)))
+        else:
+            records.append({"op": "clear"})
+    return records
+
+
+def keys(items) -> list[str]:
+    return [item.key for item in items]
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("max_items", [None, 1, 5, 20])
+def test_view_matches_load_items(seed, max_items):
+    rng = random.Random(seed)
+    write_history(random_records(rng, 120), compact_after=rng.randint(0, 120))
+    view = journal.load_view(max_items)
+    try:
+        assert keys(view) == keys(journal.load_items(max_items))
+        assert [item.text for item in view[:3]] == [
+            item.text for item in journal.load_items(max_items)[:3]
+        ]
+    finally:
+        view.close()
+
+
+def test_view_discard_finds_journal_and_snapshot_items():
+    write_history([add(f"item {i}") for i in range(10)], compact_after=5)
+    view = journal.load_view()
+    try:
+        assert view.discard(item_id("item 8")) == 1  # From the journal
+        assert view.discard(item_id("item 2")) == 6  # From the snapshot
+        assert view.discard(item_id("missing")) is None
+        assert [item.text for item in view][:3] == ["item 9", "item 7", "item 6"]
+        assert len(view) == 8
+    finally:
+        view.close()
+
+
+def test_reader_racing_a_compaction_sees_every_item(monkeypatch):
+    writer = HistoryJournal(max_items=1000)
+    writer.load()
+    for i in range(40):
+        writer.append(add(f"item {i}"))
+    writer.flush()
+    writer.compact()
+    for i in range(40, 90):
+        writer.append(add(f"item {i}"))
+    writer.flush()
+
+    # Compact right after the reader opened the old snapshot, before it reads
+    # the journals; it must not switch the files under the reader
+    open_reader = snapshot.SnapshotReader
+    compactions = []
+
+    def open_then_compact(path):
+        reader = open_reader(path)
+        if not compactions:
+            compactions.append(threading.Thread(target=writer.compact))
+            compactions[0].start()
+            compactions[0].join(timeout=0.5)
+        return reader
+
+    monkeypatch.setattr(snapshot, "SnapshotReader", open_then_compact)
+    view = journal.load_view()
+    try:
+        assert len(view) == 90
+        assert [item.text for item in (view[0], view[50], view[89])] == [
+            "item 89",
+            "item 39",
+            "item 0",
+        ]
+    finally:
+        view.close()
+    compactions[0].join()
+    assert not journal.COMPACTING_FILE.exists()
+    assert len(journal.load_items()) == 90
+    writer.close()
+
+
+def test_compaction_keeps_journaled_changes():
+    records = [add(f"item {i}") for i in range(30)] + [delete("item 3"), {"op": "clear"}]
+    records += [add("after clear"), add("item 7")]
+    write_history(records)
+    before = keys(journal.load_items())
+    writer = HistoryJournal(max_items=1000)
+    writer.load()
+    writer.compact()
+    writer.close()
+    assert not journal.JOURNAL_FILE.exists()
+    assert keys(journal.load_items()) == before == [item_id("item 7"), item_id("after clear")]
+
+
+def test_unreadable_snapshot_is_kept_aside():
+    write_history([add(f"item {i}") for i in range(10)], compact_after=8)
+    journal.SNAPSHOT_FILE.write_bytes(b"garbage" * 100)
+
+    view = journal.load_view()
+    assert [item.text for item in view] == ["item 9", "item 8"]
+    view.close()
+
+    history = ClipboardHistory(backend="json")
+    assert [item.text for item in history.get_all()] == ["item 9", "item 8"]
+    assert journal.UNREADABLE_SNAPSHOT_FILE.read_bytes() == b"garbage" * 100
+    history.add("new")
+    history.close()
+    assert [item.text for item in journal.load_items()] == ["new", "item 9", "item 8"]
+
+
+def test_compaction_never_replaces_an_unreadable_snapshot():
+    write_history([add("a"), add("b")], compact_after=1)
+    newer = bytearray(journal.SNAPSHOT_FILE.read_bytes())
+    newer[8:10] = (snapshot.VERSION + 1).to_bytes(2, "little")  # E.g. from a newer version
+    journal.SNAPSHOT_FILE.write_bytes(bytes(newer))
+    writer = HistoryJournal(max_items=1000)
+    with pytest.raises(snapshot.SnapshotError):
+        writer.compact()
+    assert journal.SNAPSHOT_FILE.read_bytes() == bytes(newer)
+
+
+def test_flush_reads_the_journal_only_after_appends_of_others(monkeypatch):
+    writer = HistoryJournal(max_items=1000)
+    writer.load()
+    reads = []
+    read_journal = journal.read_journal
+
+    def counting_read(path):
+        reads.append(path)
+        return read_journal(path)
+
+    monkeypatch.setattr(journal, "read_journal", counting_read)
+    for i in range(5):
+        writer.append(add(f"item {i}"))
+        writer.flush()
+    assert reads == []
+
+    journal.append_record(add("from another process"))
+    writer.append(add("item 5"))
+    writer.flush()
+    assert reads
+    assert [record["text"] for record in writer.sync()] == ["from another process"]
+    writer.close()
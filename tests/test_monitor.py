@@ -0,0 +1,101 @@
+"""ClipboardMonitor polling against the in-memory backend."""
+
+import pytest
+
+from myclip.clipboard import ClipboardHistory
+from myclip.clipboard.backends import MemoryBackend
+from myclip.clipboard.monitor import ClipboardMonitor, PollScheduler
+
+
+@pytest.fixture
+def history():
+    history = ClipboardHistory(max_items=3, backend="json", max_item_bytes=1024)
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def backend():
+    return MemoryBackend("copied before start")
+
+
+@pytest.fixture
+def monitor(history, backend):
+    monitor = ClipboardMonitor(history, backend, PollScheduler(0.05, 0.4))
+    monitor.prime()
+    return monitor
+
+
+def texts(history):
+    return [item.text for item in history.get_all()]
+
+
+def test_content_present_at_start_is_not_added(history, monitor):
+    monitor.step()
+    assert len(history) == 0
+
+
+def test_new_copy_is_added(history, backend, monitor):
+    backend.write_text("hello")
+    monitor.step()
+    assert texts(history) == ["hello"]
+
+
+def test_unchanged_clipboard_is_only_probed(backend, monitor):
+    backend.write_text("hello")
+    monitor.step()
+    reads = backend.reads
+    for _ in range(5):
+        monitor.step()
+    assert backend.reads == reads
+
+
+def test_same_content_written_again_is_not_added_twice(history, backend, monitor):
+    backend.write_text("hello")
+    monitor.step()
+    backend.write_text("hello")  # New change token, same content
+    monitor.step()
+    assert texts(history) == ["hello"]
+    assert monitor.stats()["hits"] == 1
+
+
+def test_copying_an_older_item_again_moves_it_to_the_top(history, backend, monitor):
+    for text in ["a", "b", "a"]:
+        backend.write_text(text)
+        monitor.step()
+    assert texts(history) == ["a", "b"]
+
+
+def test_blank_copies_are_ignored(history, backend, monitor):
+    backend.write_text("   \n")
+    monitor.step()
+    assert len(history) == 0
+
+
+def test_history_is_capped_at_max_items(history, backend, monitor):
+    for i in range(5):
+        backend.write_text(f"item {i}")
+        monitor.step()
+    assert texts(history) == ["item 4", "item 3", "item 2"]
+
+
+def test_large_copy_is_spilled_but_kept_in_full(history, backend, monitor):
+    text = "x" * 5000
+    backend.write_text(text)
+    monitor.step()
+    (item,) = history.get_all()
+    assert item.spilled
+    assert item.full_text() == text
+
+
+def test_counters_and_backoff(backend, monitor):
+    assert monitor.step() == 0.05
+    assert monitor.step() == 0.1
+    backend.write_text("hello")
+    assert monitor.step() == 0.05  # Activity resets the interval
+    assert monitor.step() == 0.1
+    assert monitor.step() == 0.2
+    assert monitor.step() == 0.4
+    assert monitor.step() == 0.4
+    stats = monitor.stats()
+    assert (stats["polls"], stats["hits"]) == (7, 1)
@@ -0,0 +1,121 @@
+"""Fuzzy search: ranking, the threshold, blank queries and refining scores."""
+
+import random
+
+import pytest
+from rapidfuzz import fuzz
+
+from myclip import config
+from myclip.clipboard import search, search_items
+from myclip.clipboard.search import SearchEngine
+
+WORDS = [
+    "apple", "banana", "cherry", "damson", "elderberry", "fig", "grape", "hazelnut",
+    "invoice", "journal", "kernel", "lambda", "meeting", "notes", "offset", "python",
+    "query", "release", "server", "ticket", "update", "version", "window", "yield",
+]  # fmt: skip
+
+
+def corpus(rng: random.Random, size: int) -> list[str]:
+    return [" ".join(rng.choices(WORDS, k=rng.randint(1, 12))) for _ in range(size)]
+
+
+def engine_of(texts: list[str]) -> SearchEngine:
+    engine = SearchEngine()
+    for position, text in enumerate(texts):
+        engine.add(str(position), text)
+    return engine
+
+
+def typed_queries(rng: random.Random, count: int) -> list[str]:
+    """Queries as typed: mostly extending the previous one, sometimes erasing."""
+    queries = []
+    query = ""
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.7:
+            query += rng.choice("abcdefghijklmnoprstuvwy  ")
+        elif roll < 0.9:
+            query = query[:-1]
+        else:
+            query = rng.choice(WORDS)[: rng.randint(1, 4)]
+        queries.append(query)
+    return queries
+
+
+@pytest.mark.parametrize("query", ["", "   ", "\t\n"])
+def test_blank_query_matches_everything_newest_first(query):
+    engine = engine_of(["apple", "banana", "cherry"])
+    assert engine.search(query) == ["cherry", "banana", "apple"]
+    incremental = engine.incremental(query, limit=2, chunk_size=1)
+    while not incremental.step():
+        pass
+    assert incremental.results() == ["cherry", "banana"]
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("cdist_min_items", [5000, 1])
+def test_refined_results_match_a_full_scan(monkeypatch, seed, cdist_min_items):
+    monkeypatch.setattr(search, "CDIST_MIN_ITEMS", cdist_min_items)
+    rng = random.Random(seed)
+    engine = engine_of(corpus(rng, 400))
+    refined = 0
+    for query in typed_queries(rng, 60):
+        incremental = engine.incremental(query, limit=20, chunk_size=64)
+        refined += incremental.refined
+        while not incremental.step():
+            pass
+        assert incremental.results() == engine.search(query, 20, refine=False), query
+    assert refined > 10
+
+
+QUERIES = ["apple", "app", "serv", "python notes", "relase", "ticket update", "zzz", "a"]
+
+
+@pytest.mark.parametrize("cdist_min_items", [5000, 1])
+@pytest.mark.parametrize("limit", [None, 1, 10])
+def test_ranking_matches_search_items(monkeypatch, cdist_min_items, limit):
+    # Lowercase single-spaced texts, whose search keys are the texts themselves
+    monkeypatch.setattr(search, "CDIST_MIN_ITEMS", cdist_min_items)
+    texts = corpus(random.Random(7), 300)
+    engine = engine_of(texts)
+    newest_first = texts[::-1]
+    for query in QUERIES:
+        expected = search_items(query, newest_first, limit)
+        assert engine.search(query, limit) == expected, query
+        chunked = engine.incremental(query, limit, chunk_size=37, refine=False)
+        while not chunked.step():
+            pass
+        assert chunked.results() == expected, query
+
+
+def test_results_are_those_reaching_the_threshold_best_first():
+    texts = corpus(random.Random(3), 200)
+    engine = engine_of(texts)
+    for query in QUERIES:
+        results = engine.search(query)
+        scores = [fuzz.partial_ratio(query, text) for text in results]
+        assert all(score >= config.FUZZY_SCORE_THRESHOLD for score in scores)
+        assert scores == sorted(scores, reverse=True)
+        missed = [text for text in texts if text not in results]
+        threshold = config.FUZZY_SCORE_THRESHOLD
+        assert all(fuzz.partial_ratio(query, text) < threshold for text in missed)
+
+
+def test_ties_are_ordered_newest_first():
+    engine = engine_of(["apple pie", "banana", "apple tart", "apple"])
+    assert engine.search("apple") == ["apple", "apple tart", "apple pie"]
+    engine.add("0", "apple pie")  # Copied again
+    assert engine.search("apple") == ["apple pie", "apple", "apple tart"]
+
+
+def test_case_and_whitespace_are_ignored():
+    engine = engine_of(["Hello   World", "something else"])
+    assert engine.search("HELLO  world") == ["Hello   World"]
+
+
+def test_threshold_setting_applies_to_the_next_search(monkeypatch):
+    engine = engine_of(["apple", "ample"])
+    assert engine.search("apple") == ["apple", "ample"]  # partial_ratio 80
+    monkeypatch.setattr(config, "FUZZY_SCORE_THRESHOLD", 90)
+    assert engine.search("apple") == ["apple"]
@@ -0,0 +1,79 @@
+"""Encoding and decoding of history snapshots."""
+
+import pytest
+
+from myclip.clipboard import snapshot
+from myclip.clipboard.content import KIND_FILES, KIND_IMAGE, KIND_RTF
+from myclip.clipboard.item import HistoryItem
+
+CODECS = [snapshot.CODEC_NONE, snapshot.CODEC_ZLIB]
+if snapshot.zstd is not None:
+    CODECS.append(snapshot.CODEC_ZSTD)
+
+
+def sample_items() -> list[HistoryItem]:
+    items = [HistoryItem.from_text(f"item {i} " + "lorem ipsum " * (i % 7)) for i in range(50)]
+    items.append(HistoryItem.from_text("line one\n  line two\n\nline four"))
+    items.append(HistoryItem.from_text("emoji 📋 and a lone surrogate \ud800"))
+    items.append(HistoryItem.from_text("long " * 20000))
+    items.append(HistoryItem("ab" * 16, "spilled prefix", "spilled prefix", 3, 10**6, True))
+    items.append(HistoryItem("cd" * 16, "Image 10×20", "Image 10×20", 1, 123, kind=KIND_IMAGE))
+    items.append(HistoryItem("ef" * 16, "bold text", "bold text", 1, 9, kind=KIND_RTF))
+    files = HistoryItem("01" * 16, "/tmp/a.txt\n/tmp/b.txt", "a.txt, b.txt", 2, 21)
+    files.kind = KIND_FILES
+    items.append(files)
+    return items
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip(tmp_path, codec):
+    path = tmp_path / "history.bin"
+    items = sample_items()
+    snapshot.write(path, items, codec)
+    assert [item.to_dict() for item in snapshot.read(path)] == [
+        item.to_dict() for item in items
+    ]
+    assert not path.with_suffix(".bin.tmp").exists()
+
+
+def test_empty_round_trip(tmp_path):
+    path = tmp_path / "history.bin"
+    snapshot.write(path, [])
+    assert snapshot.read(path) == []
+
+
+def test_reader_decodes_items_on_access(tmp_path):
+    path = tmp_path / "history.bin"
+    items = sample_items()
+    snapshot.write(path, items)
+    reader = snapshot.SnapshotReader(path)
+    try:
+        assert len(reader) == len(items)
+        for position in (len(items) - 1, 0, 7):
+            assert reader.key(position) == bytes.fromhex(items[position].key)
+            assert reader.item(position).to_dict() == items[position].to_dict()
+    finally:
+        reader.close()
+    assert [item.key for item in snapshot.read(path, limit=3)] == [
+        item.key for item in items[:3]
+    ]
+
+
+def test_unreadable_files_raise_snapshot_error(tmp_path):
+    path = tmp_path / "history.bin"
+    snapshot.write(path, sample_items())
+    data = path.read_bytes()
+
+    path.write_bytes(b"not a snapshot at all, just some text")
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read(path)
+
+    path.write_bytes(data[: snapshot.HEADER.size + 10])
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read(path)
+
+    newer = bytearray(data)
+    newer[8:10] = (snapshot.VERSION + 1).to_bytes(2, "little")
+    path.write_bytes(bytes(newer))
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.read(path)
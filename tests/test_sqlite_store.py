@@ -0,0 +1,91 @@
+"""The SQLite history backend: WAL, dedup and trim, deletes, search candidates, migration."""
+
+import pytest
+
+from myclip.clipboard import ClipboardHistory, sqlite_store
+from myclip.clipboard.digest import item_id
+from myclip.clipboard.sqlite_store import SqliteStore
+
+
+@pytest.fixture
+def store():
+    store = SqliteStore(max_items=3)
+    yield store
+    store.close()
+
+
+def test_database_runs_in_wal_mode(store):
+    conn = sqlite_store.connect()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        conn.close()
+
+
+def test_adds_move_duplicates_to_the_front_and_trim_the_oldest(store):
+    for text in ["apple", "banana", "apple", "cherry"]:
+        store.add(text)
+    assert store.recent() == ["cherry", "apple", "banana"]
+    store.add("damson")
+    assert store.recent() == ["damson", "cherry", "apple"]
+    assert len(store) == 3
+    store.set_max_items(2)
+    assert store.recent() == ["damson", "cherry"]
+
+
+def test_delete_by_item_id(store):
+    store.add("apple")
+    store.add("banana")
+    assert store.delete(item_id("apple"))
+    assert not store.delete(item_id("apple"))
+    assert store.recent() == ["banana"]
+    store.add("cherry")
+    store.add("damson")
+    assert store.recent() == ["damson", "cherry", "banana"]
+
+
+def test_deletes_of_another_process_count_towards_the_limit(store):
+    for text in ["apple", "banana", "cherry"]:
+        store.add(text)
+    assert sqlite_store.delete_item(item_id("banana"))  # From the popup
+    store.add("damson")
+    assert store.recent() == ["damson", "cherry", "apple"]
+    assert sqlite_store.load_items(2) == ["damson", "cherry"]
+
+
+def test_candidates_are_index_hits_plus_recent_items(monkeypatch):
+    monkeypatch.setattr(sqlite_store, "RECENT_CANDIDATES", 2)
+    store = SqliteStore(max_items=100)
+    for text in ["old invoice", "old ticket", "recent one", "recent two"]:
+        store.add(text)
+    # Words of three or more characters are looked up in the index, in any item
+    assert store.candidates("invoice") == ["old invoice", "recent two", "recent one"]
+    assert store.candidates("INVOICE ticket") == [
+        "old ticket",
+        "old invoice",
+        "recent two",
+        "recent one",
+    ]
+    # Shorter ones cannot be: only the recent items are candidates
+    assert store.candidates("in") == ["recent two", "recent one"]
+    # Nor can a misspelling: older items that only match fuzzily are missed
+    assert store.candidates("invioce") == ["recent two", "recent one"]
+    store.close()
+
+
+def test_json_history_is_imported_into_a_new_database():
+    history = ClipboardHistory(max_items=10, backend="json")
+    for text in ["apple", "banana", "cherry"]:
+        history.add(text)
+    history.close()
+
+    history = ClipboardHistory(max_items=2, backend="sqlite")
+    assert [item.text for item in history.get_all()] == ["cherry", "banana"]
+    history.add("damson")
+    assert [item.text for item in history.search("dam")] == ["damson"]
+    assert [item.text for item in history.search("'err")] == ["cherry"]
+    history.close()
+
+    history = ClipboardHistory(max_items=2, backend="sqlite")  # Not imported again
+    assert [item.text for item in history.get_all()] == ["damson", "cherry"]
+    history.close()
@@ -0,0 +1,79 @@
+"""Startup phases and import timing, and their report."""
+
+import sys
+
+import pytest
+
+from myclip import config, startup, trace
+
+
+def synthetic_phases() -> startup.Phases:
+    phases = startup.Phases(started=100.0)
+    phases.mark("imports", 100.25)
+    phases.mark("setup", 100.26)
+    phases.mark("history", 100.3)
+    return phases
+
+
+def test_phase_durations_and_report():
+    phases = synthetic_phases()
+    assert [(name, round(ms, 3), round(since, 3)) for name, ms, since in phases.durations()] == [
+        ("imports", 250.0, 250.0),
+        ("setup", 10.0, 260.0),
+        ("history", 40.0, 300.0),
+    ]
+    assert startup.report(phases).splitlines() == [
+        "phase                       ms  since start",
+        "imports                  250.0        250.0",
+        "setup                     10.0        260.0",
+        "history                   40.0        300.0",
+    ]
+
+
+def test_phases_are_recorded_as_trace_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRACE_ENABLED", True)
+    monkeypatch.setattr(config, "TRACE_PATH", tmp_path / "trace.jsonl")
+    synthetic_phases().record()
+    trace.flush()
+    records = trace.read_records(tmp_path / "trace.jsonl")
+    assert [(entry["name"], entry["ms"]) for entry in records] == [
+        ("startup.imports", 250.0),
+        ("startup.setup", 10.0),
+        ("startup.history", 40.0),
+        ("startup.total", 300.0),
+    ]
+
+
+@pytest.fixture
+def packages(tmp_path, monkeypatch):
+    """Two throwaway packages: outer imports inner, which takes a while to load."""
+    (tmp_path / "timed_outer").mkdir()
+    (tmp_path / "timed_outer" / "__init__.py").write_text("import timed_inner\nVALUE = 1\n")
+    (tmp_path / "timed_inner.py").write_text("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield
+    for name in ("timed_outer", "timed_inner"):
+        sys.modules.pop(name, None)
+
+
+def test_import_timer_times_each_module(packages):
+    timer = startup.ImportTimer()
+    timer.install()
+    try:
+        import timed_outer
+    finally:
+        timer.uninstall()
+    assert timer not in sys.meta_path
+    assert timed_outer.VALUE == 1
+
+    outer_total, outer_own = timer.modules["timed_outer"]
+    inner_total, inner_own = timer.modules["timed_inner"]
+    assert inner_own == inner_total >= 0.05
+    assert outer_total >= inner_total
+    assert outer_own < 0.05  # The inner import counts only towards the total
+    assert [name for name, _ in timer.packages()][0] == "timed_inner"
+
+    lines = startup.report(synthetic_phases(), timer, top=1).splitlines()
+    assert lines[5].split()[:2] == ["import", "ms"]
+    assert lines[6].split()[0] == "timed_inner"
+    assert lines[-1].split()[0] == "total"
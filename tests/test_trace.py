@@ -0,0 +1,91 @@
+"""Trace records: spans written to the file, percentiles and the per-stage report."""
+
+import json
+
+import pytest
+
+from myclip import config, trace
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(config, "TRACE_ENABLED", True)
+    monkeypatch.setattr(config, "TRACE_PATH", path)
+    trace.flush()  # Nothing left over from other tests
+    path.unlink(missing_ok=True)
+    return path
+
+
+def test_spans_and_records_are_written_as_json_lines(trace_file):
+    trace_id = trace.new_trace()
+    with trace.span("history.search", trace=trace_id, query_len=3) as fields:
+        fields["results"] = 7
+    trace.record("core.dispatch", 10.0, 10.0025)
+    trace.flush()
+
+    lines = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["history.search", "core.dispatch"]
+    assert lines[0]["trace"] == trace_id
+    assert (lines[0]["query_len"], lines[0]["results"]) == (3, 7)
+    assert lines[0]["ms"] >= 0
+    assert lines[1]["ms"] == 2.5
+    assert "trace" not in lines[1]
+    assert trace.read_records(trace_file) == lines
+
+
+def test_nothing_is_recorded_when_disabled(trace_file, monkeypatch):
+    monkeypatch.setattr(config, "TRACE_ENABLED", False)
+    with trace.span("history.add"):
+        pass
+    trace.record("core.dispatch", 1.0, 2.0)
+    trace.flush()
+    assert not trace_file.exists()
+
+
+def test_rotated_file_is_read_first(trace_file, monkeypatch):
+    monkeypatch.setattr(trace, "MAX_FILE_BYTES", 10)
+    trace.record("first", 1.0, 1.001)
+    trace.flush()
+    trace.record("second", 2.0, 2.001)
+    trace.flush()  # Rotates the first file
+    assert trace_file.with_name("trace.jsonl.1").exists()
+    assert [entry["name"] for entry in trace.read_records(trace_file)] == ["first", "second"]
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert trace.percentile(values, 0.5) == 50.0
+    assert trace.percentile(values, 0.95) == 95.0
+    assert trace.percentile(values, 0.99) == 99.0
+    assert trace.percentile([4.0], 0.99) == 4.0
+    assert trace.percentile([1.0, 2.0], 0.01) == 1.0
+
+
+def test_report_has_a_row_per_stage(trace_file):
+    trace_file.write_text(
+        "".join(
+            json.dumps({"name": name, "start": 0.0, "ms": ms, "pid": 1}) + "\n"
+            for name, ms in [("popup.show", 3.0), ("core.flush", 1.0), ("popup.show", 5.0)]
+        )
+        + "not json\n"
+    )
+    records = trace.read_records(trace_file)
+    assert trace.report(records).splitlines() == [
+        "stage                          count       p50       p95       p99       max",
+        "core.flush                         1      1.00      1.00      1.00      1.00",
+        "popup.show                         2      3.00      5.00      5.00      5.00",
+        "(milliseconds)",
+    ]
+    assert [line.split()[0] for line in trace.report(records, "popup.").splitlines()[1:-1]] == [
+        "popup.show"
+    ]
+    assert trace.report(records, "archive.") == "No trace records."
+
+
+def test_main_prints_the_report(trace_file, capsys):
+    trace.record("journal.flush", 1.0, 1.004)
+    trace.flush()
+    trace.main([str(trace_file), "--stage", "journal."])
+    output = capsys.readouterr().out
+    assert output.splitlines()[1].split() == ["journal.flush", "1", "4.00", "4.00", "4.00", "4.00"]
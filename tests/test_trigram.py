@@ -0,0 +1,107 @@
+"""Literal extraction from regexes and trigram lookups against a brute-force scan."""
+
+import random
+import re
+
+import pytest
+
+from myclip.clipboard import trigram
+from myclip.clipboard.search import SearchEngine
+from myclip.clipboard.trigram import TrigramIndex, required_literals
+
+
+@pytest.mark.parametrize(
+    "pattern, literals",
+    [
+        ("Hello", ["hello"]),
+        ("foo|bar", []),
+        ("(?x) foo bar", []),
+        ("colou?r", ["colo"]),
+        ("abc*def", ["def"]),
+        ("abc+def", ["abc", "def"]),
+        ("ab(cd)?efg", ["efg"]),
+        ("(foo|bar)baz", []),  # Any alternation, to be safe
+        ("[abc]def[^x]ghi", ["def", "ghi"]),
+        ("x[]abc]yzw", ["yzw"]),
+        (r"foo\.bar", ["foo.bar"]),
+        (r"\d+ items", [" items"]),
+        (r"\bword\b", ["word"]),
+        ("a{2,3}bcd", ["bcd"]),
+        ("héllo world", ["llo world"]),
+        ("ab.cd", []),
+    ],
+)
+def test_required_literals(pattern, literals):
+    assert required_literals(pattern) == literals
+
+
+PIECES = [
+    "a", "b", "c", "ab", "abc", "bca", "x", " ", "-", ".", r"\.", r"\d", r"\w", r"\s",
+    "[ab]", "[^a]", "[a-c]", "(ab)", "(a|bc)", "(?:ca)", "?", "*", "+", "{1,2}", "|", "^", "$",
+]  # fmt: skip
+
+
+@pytest.fixture(autouse=True)
+def short_index_prefix(monkeypatch):
+    """Keep texts beyond the indexed prefix short, so regexes scan them fast."""
+    monkeypatch.setattr(trigram, "INDEX_MAX_CHARS", 64)
+
+
+def random_texts(rng: random.Random, count: int) -> list[str]:
+    texts = ["".join(rng.choices("abcABCx .-12", k=rng.randint(0, 20))) for _ in range(count)]
+    # Matching only beyond the indexed prefix
+    texts.append("x" * 64 + "bca-ab.c")
+    texts.append("-" * 64 + "a1")
+    return texts
+
+
+def brute_force(pattern: str, texts: list[str]) -> list[str]:
+    regex = re.compile(pattern, re.IGNORECASE)
+    return [text for text in reversed(texts) if regex.search(text)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_regex_candidates_include_every_match(seed):
+    rng = random.Random(seed)
+    texts = random_texts(rng, 300)
+    engine = SearchEngine()
+    for position, text in enumerate(texts):
+        engine.add(str(position), text)
+    checked = 0
+    for _ in range(400):
+        pattern = "".join(rng.choices(PIECES, k=rng.randint(1, 6)))
+        try:
+            expected = brute_force(pattern, texts)
+        except re.error:
+            continue
+        assert engine.search("/" + pattern) == expected, pattern
+        checked += 1
+    assert checked > 200
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_exact_candidates_include_every_match(seed):
+    rng = random.Random(seed)
+    texts = random_texts(rng, 300)
+    engine = SearchEngine()
+    for position, text in enumerate(texts):
+        engine.add(str(position), text)
+    for _ in range(200):
+        source = rng.choice(texts)
+        start = rng.randrange(len(source) + 1)
+        needle = source[start : start + rng.randint(1, 6)]
+        if rng.random() < 0.3:
+            needle = needle.swapcase()
+        expected = [text for text in reversed(texts) if needle.casefold() in text.casefold()]
+        assert engine.search("'" + needle) == expected, needle
+
+
+def test_index_follows_removals():
+    index = TrigramIndex()
+    index.add("1", "Hello world")
+    index.add("2", "hello there")
+    assert index.candidates(["hello"]) == {"1", "2"}
+    index.remove("1")
+    index.add("3", "say HELLO")
+    assert index.candidates(["hello"]) == {"2", "3"}
+    assert index.candidates(["lo"]) is None  # Too short to narrow the search
@@ -0,0 +1,71 @@
+"""Config file caching and change notification."""
+
+import os
+
+import pytest
+
+from myclip import config, user_config
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    path = tmp_path / "config.toml"
+    path.write_text("[clipboard]\nmax_history_items = 10\n")
+    monkeypatch.setattr(user_config, "CONFIG_DIR", tmp_path)
+    monkeypatch.setattr(user_config, "CONFIG_FILE", path)
+    monkeypatch.setattr(user_config, "_cache", None)
+    monkeypatch.setattr(user_config, "_cache_stamp", None)
+    monkeypatch.setattr(user_config, "_subscribers", [])
+    return path
+
+
+def rewrite(path, text):
+    path.write_text(text)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))  # Coarse mtimes
+
+
+def test_missing_file_is_created_with_defaults(config_file):
+    config_file.unlink()
+    assert user_config.get("clipboard", "max_history_items", None) == 100
+    assert config_file.read_text() == user_config.DEFAULT_CONFIG
+
+
+def test_get_reads_the_cache_until_reload(config_file):
+    assert user_config.get("clipboard", "max_history_items", None) == 10
+    rewrite(config_file, "[clipboard]\nmax_history_items = 20\n")
+    assert user_config.get("clipboard", "max_history_items", None) == 10
+
+
+def test_reload_notifies_subscribers_of_a_change(config_file):
+    user_config.load_config()
+    seen = []
+    user_config.subscribe(seen.append)
+    assert not user_config.reload_if_changed()
+    rewrite(config_file, "[clipboard]\nmax_history_items = 20\n")
+    user_config.get("clipboard", "max_history_items", None)  # Must not swallow the change
+    assert user_config.reload_if_changed()
+    assert seen == [{"clipboard": {"max_history_items": 20}}]
+    assert user_config.get("clipboard", "max_history_items", None) == 20
+    assert not user_config.reload_if_changed()
+
+
+@pytest.mark.parametrize(
+    "clipboard, expected",
+    [
+        ("", 0.05),
+        ("poll_interval = 1.0\n", 0.05),  # Written to every config file by older versions
+        ("poll_interval = 0.5\n", 0.5),
+        ("poll_interval = 0.5\nmin_poll_interval = 0.1\n", 0.1),
+        ("poll_interval = 1.0\nmin_poll_interval = 1.0\n", 1.0),
+    ],
+)
+def test_min_poll_interval_follows_a_changed_legacy_poll_interval(
+    config_file, monkeypatch, clipboard, expected
+):
+    for name in dir(config):
+        if name.isupper():
+            monkeypatch.setattr(config, name, getattr(config, name))  # Restored afterwards
+    config_file.write_text("[clipboard]\n" + clipboard)
+    config.reload()
+    assert config.MIN_POLL_INTERVAL_SECONDS == expected